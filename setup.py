@@ -1,15 +1,22 @@
 """
 setup.py for PyPi
 """
+import re
 from setuptools import setup
 
 with open('README.rst') as readme_file:
     README = readme_file.read()
 
+# Read the version without importing xbundle and its dependencies.
+with open('xbundle/__init__.py') as init_file:
+    VERSION = re.search(
+        r"^__version__ = '([^']+)'", init_file.read(), re.M).group(1)
+
 setup(
     name='xbundle',
-    version="0.3.1",
+    version=VERSION,
     packages=['xbundle'],
+    py_modules=['xbundle_outline'],
     scripts=['bin/xbundle_convert'],
     author='MIT ODL Engineering',
     author_email='odl-engineering@mit.edu',
@@ -108,3 +108,20 @@ EMPTY_XBUNDLE = """<?xml version="1.0"?>
   <course />
 </xbundle>
 """
+
+
+STABLE_URLS_COURSE = """
+<course semester="2013_Spring" course="mitx.01">
+  <chapter display_name="Intro">
+    <sequential display_name="Overview">
+      <html display_name="Welcome">hello world</html>
+      <problem display_name="Check">
+        <p>What is 1 + 1?</p>
+      </problem>
+      <vertical display_name="Unit">
+        <html display_name="Notes">some notes</html>
+      </vertical>
+    </sequential>
+  </chapter>
+</course>
+"""
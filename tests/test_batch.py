@@ -0,0 +1,102 @@
+"""
+Tests for resumable batch conversions.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import json
+from shutil import rmtree, copytree, copy
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from xbundle.batch import Journal, find_jobs, run_batch
+
+
+class TestBatch(TestCase):
+    """
+    Tests for run_batch and its journal.
+    """
+    def setUp(self):
+        self.tempdir = mkdtemp()
+        self.input = os.path.join(self.tempdir, "input")
+        self.output = os.path.join(self.tempdir, "output")
+        self.journal = os.path.join(self.output, "journal.jsonl")
+        os.makedirs(self.input)
+        copytree(
+            os.path.join("input_testdata", "mitx.01"),
+            os.path.join(self.input, "good"))
+        copytree(
+            os.path.join("input_testdata", "mitx.01"),
+            os.path.join(self.input, "bad"))
+        with open(os.path.join(self.input, "bad", "course.xml"), "w") as bad:
+            bad.write("<course")
+        copy(
+            os.path.join("input_testdata", "content-devops-0001.out.xml"),
+            os.path.join(self.input, "bundle.xml"))
+
+    def tearDown(self):
+        rmtree(self.tempdir)
+
+    def run_batch(self):
+        """
+        Run the batch, and return the status of each output by name.
+        """
+        results = run_batch(
+            find_jobs(self.input, self.output), self.journal, keep_urls=True)
+        return dict(
+            (os.path.basename(result['output']), result['status'])
+            for result in results
+        )
+
+    def test_resume(self):
+        """
+        Only failed, changed or missing courses are converted again.
+        """
+        self.assertEqual(self.run_batch(), {
+            'bad.xml': 'error', 'bundle': 'ok', 'good.xml': 'ok'})
+        self.assertEqual(
+            sorted(os.listdir(self.output)),
+            ['bundle', 'good.xml', 'journal.jsonl'])
+        self.assertTrue(os.path.exists(
+            os.path.join(self.output, "bundle", "0.001", "course.xml")))
+
+        self.assertEqual(self.run_batch(), {
+            'bad.xml': 'error', 'bundle': 'skipped', 'good.xml': 'skipped'})
+
+        copy(
+            os.path.join("input_testdata", "mitx.01", "course.xml"),
+            os.path.join(self.input, "bad", "course.xml"))
+        with open(os.path.join(self.input, "good", "about", "new.html"),
+                  "w") as about:
+            about.write("new")
+        rmtree(os.path.join(self.output, "bundle"))
+        self.assertEqual(self.run_batch(), {
+            'bad.xml': 'ok', 'bundle': 'ok', 'good.xml': 'ok'})
+        with open(os.path.join(self.output, "good.xml")) as good:
+            self.assertIn('new.html', good.read())
+
+        # Different options convert everything again.
+        results = run_batch(find_jobs(self.input, self.output), self.journal)
+        self.assertEqual(
+            [result['status'] for result in results], ['ok'] * 3)
+
+        with open(self.journal) as journal:
+            records = [json.loads(line) for line in journal]
+        self.assertEqual(len(records), 10)
+        self.assertEqual(
+            set(records[0]),
+            {'input', 'output', 'hash', 'options', 'status', 'started',
+             'seconds', 'error'})
+
+    def test_truncated_journal(self):
+        """
+        A record cut short by a crash is ignored.
+        """
+        self.run_batch()
+        with open(self.journal, 'a') as journal:
+            journal.write('{"input": "x", "sta')
+        self.assertEqual(len(Journal(self.journal).latest), 3)
+        self.assertEqual(self.run_batch(), {
+            'bad.xml': 'error', 'bundle': 'skipped', 'good.xml': 'skipped'})
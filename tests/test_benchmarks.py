@@ -0,0 +1,95 @@
+"""
+Performance budgets.
+
+The budgets are generous so that they only fail on real regressions,
+not on a slow test machine.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import sys
+import json
+import subprocess
+from unittest import TestCase
+
+import xbundle
+
+IMPORT_BUDGET = 0.5  # seconds
+
+# Modules which importing xbundle must not pull in.
+LAZY_MODULES = ('glob', 'hashlib', 'pkg_resources', 'subprocess')
+
+
+def run_python(code, *args):
+    """
+    Run code in a fresh interpreter and return its output.
+    """
+    return subprocess.check_output(
+        [sys.executable, '-c', code] + list(args),
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    ).decode('utf-8')
+
+
+class TestBenchmarks(TestCase):
+    """
+    Performance budgets.
+    """
+    def test_import_time(self):
+        """
+        Importing xbundle stays cheap and leaves logging alone.
+        """
+        result = json.loads(run_python(
+            "import json, logging, sys, time\n"
+            "start = time.time()\n"
+            "import xbundle\n"
+            "elapsed = time.time() - start\n"
+            "print(json.dumps({\n"
+            "    'elapsed': elapsed,\n"
+            "    'loaded': [name for name in sys.argv[1:]\n"
+            "               if name in sys.modules],\n"
+            "    'root_handlers': len(logging.getLogger().handlers),\n"
+            "}))\n",
+            *LAZY_MODULES
+        ))
+        self.assertLess(result['elapsed'], IMPORT_BUDGET)
+        self.assertEqual(result['loaded'], [])
+        self.assertEqual(result['root_handlers'], 0)
+
+    def test_cli_version(self):
+        """
+        xbundle_convert --version doesn't need package metadata.
+        """
+        output = run_python(
+            "import sys\n"
+            "sys.modules['pkg_resources'] = None  # fail if imported\n"
+            "sys.argv = ['xbundle_convert', '--version']\n"
+            "exec(open('bin/xbundle_convert').read())\n"
+        )
+        self.assertEqual(output.strip(), xbundle.__version__)
+
+    def test_outline_reader(self):
+        """
+        Reading a JSON outline loads neither xbundle nor lxml.
+        """
+        output = run_python(
+            "import sys\n"
+            "from xbundle_outline import load_json, iter_nodes\n"
+            "print(sorted(name for name in ('xbundle', 'lxml', 'lxml.etree')\n"
+            "             if name in sys.modules))\n"
+        )
+        self.assertEqual(output.strip(), '[]')
+
+    def test_batch_imports(self):
+        """
+        Batches and catalogs don't load the conversion service.
+        """
+        output = run_python(
+            "import sys\n"
+            "import xbundle.batch, xbundle.catalog\n"
+            "print(sorted(name for name in ('xbundle.server', 'socket',\n"
+            "                               'multiprocessing')\n"
+            "             if name in sys.modules))\n"
+        )
+        self.assertEqual(output.strip(), '[]')
@@ -0,0 +1,90 @@
+"""
+Tests for the SQLite catalog of courses.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+from shutil import rmtree, copytree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from xbundle.catalog import Catalog
+
+DEVOPS = os.path.join("input_testdata", "content-devops-0001")
+MITX = os.path.join("input_testdata", "mitx.01")
+
+
+class TestCatalog(TestCase):
+    """
+    Tests for Catalog.
+    """
+    def setUp(self):
+        self.tempdir = mkdtemp()
+        self.devops = os.path.join(self.tempdir, 'devops')
+        copytree(DEVOPS, self.devops)
+        self.catalog = Catalog(os.path.join(self.tempdir, 'catalog.db'))
+
+    def tearDown(self):
+        self.catalog.close()
+        rmtree(self.tempdir)
+
+    def test_queries(self):
+        """
+        Courses can be queried by element tag, attribute and semester.
+        """
+        ingested, skipped, failed = self.catalog.ingest_all(
+            [self.devops, MITX])
+        self.assertEqual(len(ingested), 2)
+        self.assertEqual((skipped, failed), ([], []))
+
+        self.assertEqual(
+            self.catalog.courses_with('optionresponse'),
+            [os.path.abspath(self.devops)])
+        self.assertEqual(self.catalog.courses_with('no_such_tag'), [])
+        self.assertEqual(
+            self.catalog.find('video', semester='2015_Summer'),
+            # Random looking url_names are not kept.
+            [(os.path.abspath(self.devops), 'video', None, 'Video')])
+        self.assertEqual(
+            self.catalog.find('video', semester='2013_Spring'), [])
+        self.assertEqual(
+            len(self.catalog.find(sub='OEoXaMPEzfM', display_name='Video')),
+            1)
+        policies = self.catalog.db.execute(
+            'SELECT DISTINCT name FROM policies ORDER BY name').fetchall()
+        self.assertEqual(policies, [('grading_policy',), ('policy',)])
+
+        plan = ' '.join(str(row) for row in self.catalog.db.execute(
+            'EXPLAIN QUERY PLAN SELECT course_id FROM elements '
+            'WHERE tag = ?', ('video',)))
+        self.assertIn('elements_tag', plan)
+
+    def test_incremental(self):
+        """
+        Only changed courses are ingested again, replacing what they had.
+        """
+        self.catalog.ingest(self.devops)
+        count = self.catalog.db.execute(
+            'SELECT COUNT(*) FROM elements').fetchone()[0]
+        self.assertFalse(self.catalog.ingest(self.devops))
+
+        video = os.path.join(
+            self.devops, 'video', '9e2221cda24447cb8518fb9bea1f500e.xml')
+        with open(video, 'w') as output:
+            output.write('<video display_name="Other"/>')
+        self.assertTrue(self.catalog.ingest(self.devops))
+        self.assertEqual(
+            self.catalog.db.execute(
+                'SELECT COUNT(*) FROM elements').fetchone()[0],
+            count)
+        self.assertEqual(
+            [row[3] for row in self.catalog.find('video')], ['Other'])
+
+        self.catalog.remove(self.devops)
+        for table in ('courses', 'elements', 'attributes', 'policies'):
+            self.assertEqual(
+                self.catalog.db.execute(
+                    'SELECT COUNT(*) FROM ' + table).fetchone()[0],
+                0)
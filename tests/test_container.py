@@ -0,0 +1,106 @@
+"""
+Tests for containers of many xbundles.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from xbundle import XBundle
+from xbundle.container import XBundleContainer
+from tests.util import clean_xml
+
+
+class TestContainer(TestCase):
+    """
+    Tests for XBundleContainer.
+    """
+    def setUp(self):
+        self.tempdir = mkdtemp()
+        self.filename = os.path.join(self.tempdir, "library.xbundles")
+        self.bundles = {}
+        for course in ("mitx.01", "content-devops-0001"):
+            bundle = XBundle()
+            bundle.import_from_directory(
+                os.path.join("input_testdata", course))
+            self.bundles[course] = str(bundle)
+        with XBundleContainer(self.filename) as container:
+            for course in sorted(self.bundles):
+                container.add(self.bundles[course].encode('utf-8'))
+
+    def tearDown(self):
+        rmtree(self.tempdir)
+
+    def test_load(self):
+        """
+        Load one course out of the container.
+        """
+        bundle = XBundle()
+        bundle.load(self.filename, course_id="mitx.01")
+        self.assertEqual(
+            clean_xml(str(bundle)), clean_xml(self.bundles["mitx.01"]))
+
+        bundle = XBundle()
+        bundle.load(self.filename, course_id="0.001", semester="2015_Summer")
+        self.assertEqual(
+            clean_xml(str(bundle)),
+            clean_xml(self.bundles["content-devops-0001"]))
+
+        with self.assertRaises(KeyError):
+            bundle.load(self.filename, course_id="0.001", semester="x")
+
+    def test_keys(self):
+        """
+        Courses are indexed by course id and semester.
+        """
+        with XBundleContainer(self.filename) as container:
+            self.assertEqual(
+                container.keys(),
+                [("0.001", "2015_Summer"), ("mitx.01", "2013_Spring")])
+
+    def test_add_replace(self):
+        """
+        Adding is refused for a course already there; replacing appends
+        a new version which takes precedence.
+        """
+        bundle = XBundle()
+        bundle.load(self.filename, course_id="mitx.01")
+        with XBundleContainer(self.filename) as container:
+            with self.assertRaises(KeyError):
+                container.add(bundle)
+            size = os.path.getsize(self.filename)
+
+            bundle.course.find('chapter').set('display_name', 'Replaced')
+            container.replace(bundle)
+            self.assertGreater(os.path.getsize(self.filename), size)
+            self.assertEqual(len(container.keys()), 2)
+
+            with self.assertRaises(KeyError):
+                container.replace(bundle, course_id="other")
+
+        reloaded = XBundle()
+        reloaded.load(self.filename, course_id="mitx.01")
+        self.assertEqual(
+            reloaded.course.find('chapter').get('display_name'), 'Replaced')
+
+    def test_not_a_container(self):
+        """
+        Other files are not mistaken for containers.
+        """
+        with self.assertRaises(ValueError):
+            XBundleContainer(
+                os.path.join("input_testdata", "content-devops-0001.out.xml"))
+
+    def test_missing_container(self):
+        """
+        Loading from a container which doesn't exist doesn't create it.
+        """
+        filename = os.path.join(self.tempdir, "missing.xbundles")
+        with self.assertRaises(IOError):
+            XBundle().load(filename, course_id="mitx.01")
+        self.assertFalse(os.path.exists(filename))
+        self.assertFalse(os.path.exists(filename + ".idx"))
@@ -0,0 +1,134 @@
+"""
+Tests for running many conversions at once with one Converter.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import threading
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from xbundle.converter import Converter
+from tests.test_import_export import _read_tree
+
+COURSES = [
+    os.path.join("input_testdata", "content-devops-0001"),
+    os.path.join("input_testdata", "mitx.01"),
+]
+THREADS = 8
+ROUNDS = 3
+
+
+class TestConverter(TestCase):
+    """
+    Tests for Converter, shared between threads.
+    """
+    def setUp(self):
+        self.tempdir = mkdtemp()
+        self.converter = Converter(keep_urls=True, stable_urls=True)
+
+    def tearDown(self):
+        rmtree(self.tempdir)
+
+    def hammer(self, work):
+        """
+        Run work(thread, round) ROUNDS times in each of THREADS threads,
+        all at once, and re-raise the first error any of them met.
+        """
+        errors = []
+        start = threading.Event()
+
+        def run(thread):
+            """
+            Wait for the other threads, then work.
+            """
+            start.wait()
+            try:
+                for round_ in range(ROUNDS):
+                    work(thread, round_)
+            except Exception as err:  # pylint: disable=broad-except
+                errors.append(err)
+
+        threads = [
+            threading.Thread(target=run, args=(thread,))
+            for thread in range(THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+    def test_concurrent_conversions(self):
+        """
+        Conversions run at the same time give the same results as one at
+        a time, both ways.
+        """
+        expected = {}
+        for idx, course in enumerate(COURSES):
+            output = os.path.join(self.tempdir, 'expected{0}.xml'.format(idx))
+            self.converter.convert(course, output)
+            with open(output, 'rb') as xbundle:
+                expected[course] = xbundle.read()
+            outdir = os.path.join(self.tempdir, 'expected{0}'.format(idx))
+            self.converter.convert(output, outdir)
+            expected[output] = _read_tree(outdir)
+
+        results = {}
+
+        def work(thread, round_):
+            """
+            Convert a course to an xbundle and back.
+            """
+            idx = (thread + round_) % len(COURSES)
+            name = os.path.join(
+                self.tempdir, '{0}-{1}'.format(thread, round_))
+            self.converter.convert(COURSES[idx], name + '.xml')
+            self.converter.convert(name + '.xml', name)
+            with open(name + '.xml', 'rb') as xbundle:
+                results[name] = (idx, xbundle.read(), _read_tree(name))
+
+        self.hammer(work)
+        self.assertEqual(len(results), THREADS * ROUNDS)
+        for idx, xbundle, tree in results.values():
+            self.assertEqual(xbundle, expected[COURSES[idx]])
+            self.assertEqual(tree, expected[os.path.join(
+                self.tempdir, 'expected{0}.xml'.format(idx))])
+
+    def test_shared_bundle(self):
+        """
+        One imported course can be exported by many threads at once, and
+        is left unchanged.
+        """
+        source = self.converter.import_directory(COURSES[0])
+        before = str(source)
+        outdir = os.path.join(self.tempdir, 'expected')
+        self.converter.export_directory(source, outdir)
+        expected = _read_tree(outdir)
+
+        def work(thread, round_):
+            """
+            Export the shared course.
+            """
+            outdir = os.path.join(
+                self.tempdir, '{0}-{1}'.format(thread, round_))
+            self.converter.export_directory(source, outdir)
+            self.assertEqual(_read_tree(outdir), expected)
+
+        self.hammer(work)
+        self.assertEqual(str(source), before)
+
+    def test_options(self):
+        """
+        Unknown options fail when the Converter is made, and per-run
+        options are refused.
+        """
+        with self.assertRaises(TypeError):
+            Converter(no_such_option=True)
+        with self.assertRaises(TypeError):
+            Converter(cancel=None)
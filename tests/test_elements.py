@@ -0,0 +1,107 @@
+"""
+Tests for the element index of an XBundle.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+from unittest import TestCase
+
+from lxml import etree
+
+from xbundle import XBundle
+
+
+class TestElementIndex(TestCase):
+    """
+    Tests for XBundle.elements.
+    """
+    def setUp(self):
+        self.bundle = XBundle(keep_urls=True)
+        self.bundle.import_from_directory(
+            os.path.join("input_testdata", "mitx.01"))
+
+    def test_queries(self):
+        """
+        Elements are found by url_name, tag and display_name.
+        """
+        elements = self.bundle.elements
+        chapter = self.bundle.course.find('chapter')
+        self.assertIs(elements.get('Intro_chapter'), chapter)
+        self.assertIs(elements.get('Intro_chapter', tag='chapter'), chapter)
+        self.assertIsNone(elements.get('Intro_chapter', tag='html'))
+        self.assertIsNone(elements.get('missing'))
+        self.assertEqual(
+            list(elements.iter('html')), list(self.bundle.course.iter('html')))
+        self.assertEqual(
+            [elem.tag for elem in elements.iter(display_name='Overview')],
+            ['sequential'])
+        with self.assertRaises(ValueError):
+            list(elements.iter())
+
+        # The same index is kept until the course changes.
+        self.assertIs(self.bundle.elements, elements)
+        self.bundle.set_course(etree.fromstring(
+            '<course semester="x"><chapter url_name="c"/></course>'))
+        self.assertIsNot(self.bundle.elements, elements)
+        self.assertEqual(self.bundle.elements.get('c').tag, 'chapter')
+
+    def test_edits(self):
+        """
+        Edits through the index keep it up to date.
+        """
+        elements = self.bundle.elements
+        html = elements.get('Overview_text_html')
+        new = etree.fromstring(
+            '<problem url_name_orig="p1" display_name="P"><p/></problem>')
+        elements.replace(html, new)
+        self.assertIsNone(elements.get('Overview_text_html'))
+        self.assertEqual(list(elements.iter('html')), [])
+        self.assertIs(elements.get('p1'), new)
+        self.assertEqual(list(elements.iter('p')), [new[0]])
+
+        elements.set(new, 'url_name_orig', 'p2')
+        self.assertIsNone(elements.get('p1'))
+        self.assertIs(elements.get('p2'), new)
+
+        sequential = new.getparent()
+        extra = etree.Element('html', display_name='P')
+        elements.insert(sequential, extra, 0)
+        self.assertEqual(list(elements.iter(display_name='P')), [new, extra])
+        self.assertEqual(
+            list(elements.iter('html', display_name='P')), [extra])
+
+        elements.remove(new)
+        self.assertIsNone(elements.get('p2'))
+        self.assertEqual(list(sequential), [extra])
+
+    def test_outside_edits(self):
+        """
+        Elements changed behind the index's back are not returned.
+        """
+        elements = self.bundle.elements
+        chapter = elements.get('Intro_chapter')
+        chapter.set('url_name_orig', 'Other')
+        self.assertIsNone(elements.get('Intro_chapter'))
+        html = next(elements.iter('html'))
+        html.getparent().remove(html)
+        self.assertEqual(list(elements.iter('html')), [])
+
+        self.bundle.reindex()
+        self.assertIs(self.bundle.elements.get('Other'), chapter)
+
+    def test_add_descriptors(self):
+        """
+        The url_names given out on export are indexed.
+        """
+        bundle = XBundle(force_studio_format=True)
+        bundle.import_from_directory(
+            os.path.join("input_testdata", "mitx.01"))
+        elements = bundle.elements
+        self.assertEqual(list(elements.iter('vertical')), [])
+        bundle.add_descriptors(bundle.course)
+        vertical = next(elements.iter('vertical'))
+        self.assertIs(elements.get(vertical.get('url_name')), vertical)
+        html = bundle.course.find('.//html')
+        self.assertIs(elements.get(html.get('url_name')), html)
@@ -0,0 +1,133 @@
+"""
+Tests for Merkle fingerprints of course elements.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from lxml import etree
+
+from xbundle import XBundle
+from xbundle.fingerprint import Fingerprints
+from tests.util import file_from_string
+
+
+def import_course(name="content-devops-0001"):
+    """
+    Import a course from the test data.
+    """
+    bundle = XBundle(keep_urls=True)
+    bundle.import_from_directory(os.path.join("input_testdata", name))
+    return bundle
+
+
+class TestFingerprints(TestCase):
+    """
+    Tests for XBundle.fingerprints.
+    """
+    def setUp(self):
+        self.bundle = import_course()
+        self.other = import_course()
+
+    def test_same_content(self):
+        """
+        The same course has the same fingerprint, however formatted.
+        """
+        digest = self.bundle.fingerprints.digest()
+        self.assertEqual(self.other.fingerprints.digest(), digest)
+        reloaded = XBundle()
+        reloaded.load(file_from_string(str(self.bundle)))
+        self.assertEqual(reloaded.fingerprints.digest(), digest)
+        self.assertEqual(
+            self.bundle.fingerprints.diff(reloaded.fingerprints), [])
+
+        self.bundle.fingerprints.annotate()
+        self.assertIsNotNone(self.bundle.course.get('fingerprint'))
+        self.assertEqual(Fingerprints(self.bundle.course).digest(), digest)
+
+    def test_edits(self):
+        """
+        An edit recomputes only the digests of the element and its
+        ancestors.
+        """
+        fingerprints = self.bundle.fingerprints
+        digest = fingerprints.digest()
+        cached = len(fingerprints.cache)
+        self.assertEqual(cached, len(list(self.bundle.course.iter(
+            etree.Element))))
+
+        problem = next(self.bundle.elements.iter('problem'))
+        depth = len(list(problem.iterancestors())) + 1
+        self.bundle.elements.set(problem, 'weight', '2')
+        self.assertEqual(len(fingerprints.cache), cached - depth)
+        self.assertNotEqual(fingerprints.digest(), digest)
+        self.assertEqual(len(fingerprints.cache), cached)
+
+        # Direct edits are reported with changed().
+        problem.attrib.pop('weight')
+        self.bundle.changed(problem)
+        self.assertEqual(fingerprints.digest(), digest)
+
+    def test_diff(self):
+        """
+        diff reports what was added, removed or changed.
+        """
+        elements = self.other.elements
+        problem = next(elements.iter('problem'))
+        elements.set(problem, 'weight', '2')
+        html = next(elements.iter('html'))
+        parent = html.getparent()
+        parent.remove(html)
+        self.other.changed(parent)
+        chapter = next(elements.iter('chapter'))
+        elements.insert(
+            chapter, etree.Element('sequential', display_name='New'))
+
+        changes = self.other.fingerprints.diff(self.bundle.fingerprints)
+        self.assertEqual(
+            [kind for kind, _ in changes], ['removed', 'changed', 'added'])
+        self.assertTrue(changes[0][1].endswith('/html[0]'))
+        self.assertTrue(changes[1][1].endswith('/problem[0]'))
+        self.assertEqual(changes[2][1], 'course/chapter[0]/sequential[1]')
+
+    def test_removed_order(self):
+        """
+        Removed elements are reported in their old document order.
+        """
+        old = Fingerprints(etree.XML(
+            '<course><z/><html url_name="b"/><a/><html url_name="a"/>'
+            '</course>'))
+        new = Fingerprints(etree.XML('<course><a/></course>'))
+        expected = [
+            ('removed', 'course/z[0]'),
+            ('removed', 'course/html[b]'),
+            ('removed', 'course/html[a]'),
+        ]
+        self.assertEqual(new.diff(old), expected)
+        self.assertEqual(new.diff(old.paths()), expected)
+
+    def test_sidecar(self):
+        """
+        Fingerprints saved earlier are compared with the current ones.
+        """
+        tempdir = mkdtemp()
+        try:
+            sidecar = os.path.join(tempdir, "fingerprints.json")
+            self.bundle.fingerprints.save(sidecar)
+            old = Fingerprints.load(sidecar)
+            self.assertEqual(self.bundle.fingerprints.diff(old), [])
+
+            problem = next(self.bundle.elements.iter('problem'))
+            self.bundle.elements.set(problem, 'weight', '2')
+            changes = self.bundle.fingerprints.diff(old)
+            self.assertEqual(len(changes), 1)
+            self.assertEqual(changes[0][0], 'changed')
+            self.assertEqual(changes[0][1], self.bundle.fingerprints.diff(
+                self.other.fingerprints)[0][1])
+        finally:
+            rmtree(tempdir)
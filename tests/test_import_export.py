@@ -12,7 +12,8 @@ from subprocess import check_call
 from tempfile import mkdtemp
 from unittest import TestCase
 
-from xbundle import XBundle
+from xbundle import XBundle, normalize_directory
+from xbundle.storage import MemoryStorage
 from tests.util import clean_xml, file_from_string
 from tests.data import expected as expected_data, input as input_data
 
@@ -31,6 +32,17 @@ def _normalize_xml(dirname):
                 f.write(s)
 
 
+def _read_tree(dirname):
+    """Return a dict mapping each file in a directory to its content."""
+    tree = {}
+    for dname, _, files in os.walk(dirname):
+        for fname in files:
+            fpath = os.path.join(dname, fname)
+            with open(fpath, 'rb') as f:
+                tree[os.path.relpath(fpath, dirname)] = f.read()
+    return tree
+
+
 class TestImportExport(TestCase):
     """
     Test that data is retained after an import/export or export/import cycle.
@@ -224,3 +236,216 @@ class TestImportExport(TestCase):
                     self.assertTrue(filename.endswith(".xml"))
         finally:
             rmtree(tempdir)
+
+    def test_keep_static(self):
+        """
+        Test that static files are carried from import to export.
+        """
+        path = os.path.join('input_testdata', 'content-devops-0001')
+        bundle = XBundle(keep_static=True)
+        bundle.import_from_directory(path)
+
+        static = bundle.metadata.find('static')
+        self.assertEqual(static.get('root'), os.path.abspath(path))
+        filenames = [sfile.get('filename') for sfile in static]
+        self.assertIn('static/boot.js', filenames)
+        self.assertIn('assets/assets.xml', filenames)
+        self.assertIn('lti/3ebec7a811574990bf21219685bc1f99.xml', filenames)
+
+        # The manifest survives a save and load.
+        reloaded = XBundle(keep_static=True)
+        reloaded.load(file_from_string(str(bundle)))
+
+        tempdir = mkdtemp()
+        try:
+            reloaded.export_to_directory(tempdir)
+            for filename in filenames:
+                with open(os.path.join(path, filename), 'rb') as src, \
+                        open(os.path.join(tempdir, '0.001', filename),
+                             'rb') as dst:
+                    self.assertEqual(src.read(), dst.read())
+
+            # Without keep_static, the files are not copied.
+            plain = XBundle()
+            plain.load(file_from_string(str(bundle)))
+            plain.export_to_directory(os.path.join(tempdir, 'plain'))
+            self.assertFalse(os.path.exists(
+                os.path.join(tempdir, 'plain', '0.001', 'static')))
+        finally:
+            rmtree(tempdir)
+
+    def test_static_outside(self):
+        """
+        Test that static files outside of their root, or of the export
+        directory, are not copied.
+        """
+        tempdir = mkdtemp()
+        try:
+            root = os.path.join(tempdir, 'root')
+            os.makedirs(os.path.join(root, 'static'))
+            for name in ('secret', os.path.join('root', 'secret'),
+                         os.path.join('root', 'static', 'ok.js')):
+                with open(os.path.join(tempdir, name), 'w') as out:
+                    out.write(name)
+            bundle = XBundle(keep_static=True)
+            bundle.load(file_from_string(
+                '<xbundle><metadata><static root="{0}">'
+                '<file filename="../secret"/>'
+                '<file filename="static/../../root/secret"/>'
+                '<file filename="static/ok.js"/>'
+                '</static></metadata>'
+                '<course semester="s" org="o" course="c"/></xbundle>'.format(
+                    root)))
+            exdir = os.path.join(tempdir, 'out', 'deeper')
+            bundle.export_to_directory(exdir)
+            self.assertFalse(os.path.exists(os.path.join(exdir, 'secret')))
+            self.assertFalse(os.path.exists(
+                os.path.join(exdir, 'root', 'secret')))
+            self.assertTrue(os.path.exists(
+                os.path.join(exdir, 'c', 'static', 'ok.js')))
+        finally:
+            rmtree(tempdir)
+
+    def test_repeated_export(self):
+        """
+        Test that exporting and saving leave the bundle as it was.
+        """
+        for options in ({}, {'keep_urls': True, 'force_studio_format': True}):
+            bundle = XBundle(**options)
+            bundle.load(file_from_string(
+                expected_data.KEEP_URLS_FORCE_STUDIO_FORMAT))
+            saved = str(bundle)
+            course = bundle.course
+            tempdir = mkdtemp()
+            try:
+                trees = []
+                for name in ('first', 'second'):
+                    bundle.export_to_directory(os.path.join(tempdir, name))
+                    trees.append(_read_tree(os.path.join(tempdir, name)))
+                    self.assertEqual(str(bundle), saved)
+                self.assertTrue(trees[0])
+                self.assertEqual(trees[0], trees[1])
+                self.assertIs(bundle.course, course)
+            finally:
+                rmtree(tempdir)
+
+    def test_passthrough(self):
+        """
+        Test that html and problem files are carried through verbatim.
+        """
+        path = os.path.join('input_testdata', 'content-devops-0001')
+        bundle = XBundle(
+            keep_urls=True, keep_studio_urls=True, passthrough=True)
+        bundle.import_from_directory(path)
+        for tag in ('html', 'problem'):
+            elems = bundle.course.findall('.//' + tag)
+            self.assertTrue(elems)
+            for elem in elems:
+                self.assertEqual(len(elem), 0)
+                self.assertTrue(elem.get('xbundle_raw').startswith(tag))
+        # Attributes are still read from the root of problem files.
+        self.assertEqual(
+            bundle.course.find('.//problem').get('display_name'),
+            'Jasmine tests: JS Input problem edition (same origin)')
+
+        reloaded = XBundle(keep_urls=True, keep_studio_urls=True)
+        reloaded.load(file_from_string(str(bundle)))
+        tempdir = mkdtemp()
+        try:
+            reloaded.export_to_directory(tempdir)
+            original = _read_tree(path)
+            exported = _read_tree(os.path.join(tempdir, '0.001'))
+            inline = 'problem/ee774cd923524aefa4235fd63c5d9b59.xml'
+            bodies = [
+                name for name in original
+                if name.startswith('html/') and name.endswith('.html') or
+                name.startswith('problem/') and name in exported and
+                name != inline
+            ]
+            self.assertEqual(len(bodies), 19)
+            for name in bodies:
+                self.assertEqual(original[name], exported[name])
+            # Old style problems, with a filename, are exported inline,
+            # with the attributes of the descriptor pointing to them.
+            external = original[
+                'problem/external_dir/external_dir-external.xml']
+            self.assertEqual(
+                exported[inline].split(b'>', 1)[1],
+                external.split(b'>', 1)[1])
+            self.assertEqual(
+                etree.fromstring(exported[inline]).get('display_name'),
+                'Flow control')
+        finally:
+            rmtree(tempdir)
+
+    def test_passthrough_attributes(self):
+        """
+        Test that a problem passed through is exported with the attributes
+        of its element, from its descriptor or edited since, as it is
+        without passthrough.
+        """
+        files = {
+            'course.xml': b'<course url_name="2014" org="MITx" course="d"/>',
+            'course/2014.xml': (
+                b'<course><chapter display_name="Ch"><sequential>'
+                b'<problem url_name="p1" weight="3" display_name="Override"/>'
+                b'<problem url_name="p2"/>'
+                b'</sequential></chapter></course>'),
+            'problem/p1.xml': (
+                b'<problem display_name="orig" markdown="null">\n'
+                b'  <p>Body</p>\n</problem>\n'),
+            'problem/p2.xml': (
+                b'<problem display_name="same">\n  <p>Two</p>\n</problem>\n'),
+        }
+        exported = []
+        for passthrough in (False, True):
+            bundle = XBundle(
+                keep_urls=True, passthrough=passthrough,
+                storage=MemoryStorage(dict(files)))
+            bundle.import_from_directory('.')
+            bundle.export_to_directory('out')
+            exported.append(bundle.storage.files)
+        plain, raw = [
+            dict((name.rsplit('/', 1)[-1], etree.fromstring(data))
+                 for name, data in tree.items() if '/problem/' in name)
+            for tree in exported]
+        self.assertEqual(raw['p1.xml'].get('weight'), '3')
+        self.assertEqual(raw['p1.xml'].get('display_name'), 'Override')
+        for name in ('p1.xml', 'p2.xml'):
+            self.assertEqual(
+                dict(plain[name].attrib), dict(raw[name].attrib))
+        p1_file = [
+            data for name, data in exported[1].items()
+            if name.endswith('/problem/p1.xml')][0]
+        self.assertTrue(p1_file.endswith(b'>\n  <p>Body</p>\n</problem>\n'))
+        # Unchanged files are still written verbatim.
+        self.assertIn(files['problem/p2.xml'], exported[1].values())
+
+    def test_normalize_directory(self):
+        """
+        Test that normalize_directory writes the same files as an import
+        followed by an export.
+        """
+        for course, options in [
+                ('mitx.01', {}),
+                ('sections', {}),
+                ('content-devops-0001', {'force_studio_format': True}),
+                ('content-devops-0001', {'keep_urls': True}),
+                ('content-devops-0001', {'passthrough': True}),
+        ]:
+            path = os.path.join('input_testdata', course)
+            tempdir = mkdtemp()
+            try:
+                expected_dir = os.path.join(tempdir, 'expected')
+                bundle = XBundle(**options)
+                bundle.import_from_directory(path)
+                bundle.export_to_directory(expected_dir)
+
+                normalized_dir = os.path.join(tempdir, 'normalized')
+                normalize_directory(path, normalized_dir, **options)
+
+                expected = _read_tree(expected_dir)
+                self.assertTrue(expected)
+                self.assertEqual(expected, _read_tree(normalized_dir))
+            finally:
+                rmtree(tempdir)
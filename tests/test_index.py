@@ -0,0 +1,116 @@
+"""
+Tests for the sidecar index of xbundle files.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import re
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from lxml import etree
+
+from xbundle import XBundle
+from xbundle.index import index_filename, load_fragment, read_index
+from tests.util import clean_xml
+
+
+class TestIndex(TestCase):
+    """
+    Tests for saving with an index and loading fragments.
+    """
+    def setUp(self):
+        self.tempdir = mkdtemp()
+        self.filename = os.path.join(self.tempdir, "xbundle.xml")
+        self.bundle = XBundle(keep_urls=True)
+        self.bundle.import_from_directory(
+            os.path.join("input_testdata", "mitx.01"))
+        self.bundle.save(self.filename, index=True)
+
+    def tearDown(self):
+        rmtree(self.tempdir)
+
+    def test_fragments(self):
+        """
+        Each indexed element parses to the same XML as in the whole file.
+        """
+        self.assertTrue(os.path.exists(index_filename(self.filename)))
+        whole = etree.parse(self.filename).getroot()
+        entries = read_index(self.filename)
+        self.assertEqual(
+            [entry['path'] for entry in entries],
+            [
+                "metadata", "metadata/policies[0]", "metadata/about[0]",
+                "metadata/about[0]/file[0]", "course",
+                "course/chapter[0]", "course/chapter[0]/sequential[0]",
+            ])
+        for entry in entries:
+            # Paths count from 0, XPath from 1.
+            expected = whole.xpath(re.sub(
+                r'\[(\d+)\]',
+                lambda match: '[{0}]'.format(int(match.group(1)) + 1),
+                entry['path']))[0]
+            self.assertEqual(
+                clean_xml(etree.tostring(
+                    load_fragment(self.filename, path=entry['path']))),
+                clean_xml(etree.tostring(expected)))
+
+    def test_compact_xml(self):
+        """
+        Elements are indexed in XML without any whitespace between tags,
+        empty ones included.
+        """
+        with open(self.filename, 'wb') as output:
+            output.write(
+                b'<xbundle><metadata/><course semester="s"><chapter>'
+                b'<sequential display_name="q"/></chapter><chapter>'
+                b'<sequential display_name="a/>b"></sequential>'
+                b'<sequential display_name="r"><html>x/></html></sequential>'
+                b'</chapter></course></xbundle>')
+        self.assertEqual(
+            load_fragment(self.filename, tag='sequential').get(
+                'display_name'), 'q')
+        self.assertEqual(
+            len(load_fragment(self.filename, path='course/chapter[1]')), 2)
+        self.assertEqual(
+            load_fragment(self.filename, path='course/chapter[1]/'
+                          'sequential[1]')[0].text, 'x/>')
+        self.assertEqual(
+            load_fragment(self.filename, path='metadata').tag, 'metadata')
+
+    def test_lookup_by_attrs(self):
+        """
+        Fragments can be found by tag and attributes.
+        """
+        chapter = load_fragment(
+            self.filename, tag='chapter', attrs={'display_name': 'Intro'})
+        self.assertEqual(chapter.get('url_name_orig'), 'Intro_chapter')
+        about = load_fragment(
+            self.filename, tag='file', attrs={'filename': 'overview.html'})
+        self.assertEqual(about.text, 'hello overview')
+        with self.assertRaises(KeyError):
+            load_fragment(
+                self.filename, tag='chapter', attrs={'display_name': 'x'})
+
+    def test_stale_index(self):
+        """
+        An index no longer matching its file is rebuilt.
+        """
+        self.bundle.course.find('chapter').set(
+            'display_name', 'A much longer name')
+        with open(self.filename, 'w') as output:
+            output.write(str(self.bundle))
+        chapter = load_fragment(
+            self.filename, tag='chapter',
+            attrs={'display_name': 'A much longer name'})
+        self.assertEqual(len(chapter), 2)
+
+        # Same content, new modification time: kept after hashing.
+        mtime = os.stat(index_filename(self.filename)).st_mtime
+        os.utime(self.filename, (1, 1))
+        read_index(self.filename)
+        self.assertEqual(
+            os.stat(index_filename(self.filename)).st_mtime, mtime)
@@ -11,6 +11,7 @@ from tempfile import mkdtemp
 from unittest import TestCase
 
 from xbundle import mkdir
+from xbundle.storage import link_file
 
 
 class TestXBundle(TestCase):
@@ -31,3 +32,25 @@ class TestXBundle(TestCase):
             self.assertTrue(os.path.isdir(new_dir))
         finally:
             rmtree(tempdir)
+
+    def test_link_file(self):
+        """
+        Test link_file makes an identical file, and can replace one.
+        """
+        tempdir = mkdtemp()
+        try:
+            src = os.path.join(tempdir, "src")
+            dst = os.path.join(tempdir, "dst")
+            with open(src, "wb") as output:
+                output.write(b"\x00static\xff" * 1000)
+            with open(dst, "wb") as output:
+                output.write(b"old")
+
+            self.assertIn(
+                link_file(src, dst),
+                ('reflink', 'hardlink', 'copy_file_range', 'copy'))
+            with open(src, "rb") as fsrc, open(dst, "rb") as fdst:
+                self.assertEqual(fsrc.read(), fdst.read())
+            self.assertEqual(link_file(src, src), 'same')
+        finally:
+            rmtree(tempdir)
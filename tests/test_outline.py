@@ -0,0 +1,87 @@
+"""
+Tests for JSON outlines of xbundles.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import io
+import os
+import json
+from unittest import TestCase
+
+import six
+from lxml import etree
+
+from xbundle import XBundle
+from xbundle_outline import load_json, iter_nodes
+
+COURSE = os.path.join("input_testdata", "content-devops-0001")
+
+
+class TestOutline(TestCase):
+    """
+    Tests for XBundle.to_json and load_json.
+    """
+    def setUp(self):
+        self.bundle = XBundle(keep_urls=True)
+        self.bundle.import_from_directory(COURSE)
+
+    def outline(self, flat):
+        """
+        Write the outline of the course and read it back.
+        """
+        stream = io.StringIO()
+        self.bundle.to_json(stream, flat=flat)
+        stream.seek(0)
+        return load_json(stream)
+
+    def test_outline(self):
+        """
+        Both layouts list every element, with its attributes and parent,
+        in document order; policies are parsed.
+        """
+        elements = [
+            elem for elem in self.bundle.course.iter()
+            if isinstance(elem.tag, six.string_types)
+        ]
+        nested = self.outline(flat=False)
+        flat = self.outline(flat=True)
+        self.assertEqual(list(iter_nodes(nested)), list(iter_nodes(flat)))
+
+        nodes = list(iter_nodes(flat))
+        self.assertEqual(len(nodes), len(elements))
+        for node, elem in zip(nodes, elements):
+            self.assertEqual(node['tag'], elem.tag)
+            self.assertEqual(node['attrs'], dict(elem.attrib))
+            parent = elem.getparent()
+            self.assertEqual(
+                node['parent'],
+                None if parent is None else elements.index(parent))
+            if elem.text and elem.text.strip():
+                self.assertEqual(node['text'], elem.text)
+
+        self.assertEqual(nested['course']['tag'], 'course')
+        self.assertEqual(
+            [child['tag'] for child in nested['course']['children']],
+            [child.tag for child in self.bundle.course])
+        policy = nested['metadata']['policies'][0]
+        self.assertEqual(
+            policy['policy'],
+            json.loads(self.bundle.metadata.find('policies/policy').text))
+
+    def test_tail_and_bad_input(self):
+        """
+        Text after an element is kept, and other JSON is refused.
+        """
+        bundle = XBundle()
+        bundle.set_course(etree.XML(
+            '<course url_name="x"><html>a<b>bold</b> tail</html></course>'))
+        stream = io.StringIO()
+        bundle.to_json(stream)
+        stream.seek(0)
+        html = load_json(stream)['course']['children'][0]
+        self.assertEqual(html['text'], 'a')
+        self.assertEqual(html['children'][0]['tail'], ' tail')
+        with self.assertRaises(ValueError):
+            load_json(io.StringIO('{"course": {}}'))
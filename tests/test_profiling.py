@@ -0,0 +1,86 @@
+"""
+Tests for profiling conversions.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import pstats
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from xbundle import XBundle
+from xbundle.profiling import collapsed_stacks, profile
+
+COURSE = os.path.join("input_testdata", "content-devops-0001.out.xml")
+
+
+class TestProfiling(TestCase):
+    """
+    Tests for profile and collapsed_stacks.
+    """
+    def setUp(self):
+        self.tempdir = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.tempdir)
+
+    def test_profile(self):
+        """
+        A profiled export writes a profile, a summary with the hot spots,
+        and collapsed stacks labelled with the course.
+        """
+        filename = os.path.join(self.tempdir, 'export.prof')
+        bundle = XBundle(keep_urls=True)
+        bundle.load(COURSE)
+        with profile(filename, label='devops'):
+            bundle.export_to_directory(os.path.join(self.tempdir, 'out'))
+
+        stats = pstats.Stats(filename)
+        self.assertIn(
+            'make_urlname', [name for _, _, name in stats.stats])
+        with open(filename + '.txt') as summary:
+            hot_spots = summary.read().split('\n\n')[1]
+        self.assertIn('make_urlname', hot_spots)
+        self.assertIn('pp_xml', hot_spots)
+
+        with open(filename + '.collapsed') as collapsed:
+            lines = collapsed.read().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, micros = line.rsplit(' ', 1)
+            self.assertTrue(stack.startswith('devops;'))
+            self.assertTrue(int(micros) > 0)
+        self.assertTrue(any(
+            'export_to_directory' in line and 'make_urlname' in line
+            for line in lines))
+
+    def test_collapsed_stacks(self):
+        """
+        The time of a function called from two places is split between
+        them in proportion to the time each call took.
+        """
+        def func(name):
+            """
+            Return the pstats key of a function.
+            """
+            return ('f.py', 1, name)
+
+        stats = {
+            func('R'): (1, 1, 0.1, 1.0, {}),
+            func('A'): (1, 1, 0.2, 0.4, {func('R'): (1, 1, 0.2, 0.4)}),
+            func('B'): (1, 1, 0.1, 0.5, {func('R'): (1, 1, 0.1, 0.5)}),
+            func('C'): (3, 3, 0.6, 0.6, {
+                func('A'): (1, 1, 0.2, 0.2),
+                func('B'): (2, 2, 0.4, 0.4),
+            }),
+        }
+        self.assertEqual(collapsed_stacks(stats, 'x'), [
+            'x;R (f.py:1) 100000',
+            'x;R (f.py:1);A (f.py:1) 200000',
+            'x;R (f.py:1);A (f.py:1);C (f.py:1) 200000',
+            'x;R (f.py:1);B (f.py:1) 100000',
+            'x;R (f.py:1);B (f.py:1);C (f.py:1) 400000',
+        ])
@@ -0,0 +1,149 @@
+"""
+Tests for progress reporting and cancellation.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from xbundle import XBundle
+from xbundle.progress import CancelToken, Cancelled
+from tests.test_import_export import _read_tree
+
+COURSE = os.path.join("input_testdata", "content-devops-0001")
+
+
+class TestProgress(TestCase):
+    """
+    Tests for the progress callback and CancelToken.
+    """
+    def setUp(self):
+        self.tempdir = mkdtemp()
+        self.reports = []
+
+    def tearDown(self):
+        rmtree(self.tempdir)
+
+    def report(self, progress):
+        """
+        Record what a progress report says.
+        """
+        self.reports.append((
+            progress.phase, progress.discovered, progress.parsed,
+            progress.total, progress.written, progress.chapter,
+            progress.eta,
+        ))
+
+    def test_progress(self):
+        """
+        Imports report files read and exports files written, with the
+        chapter being worked on.
+        """
+        bundle = XBundle(keep_urls=True, progress=self.report)
+        bundle.import_from_directory(COURSE)
+        imported = [report for report in self.reports if report[0] == 'import']
+        self.assertEqual(len(imported), len(self.reports))
+        phase, discovered, parsed, _, _, chapter, eta = imported[-1]
+        self.assertTrue(0 < parsed <= discovered)
+        self.assertEqual(
+            [report[2] for report in imported],
+            sorted(report[2] for report in imported))
+        self.assertIn(
+            chapter, [elem.get('display_name')
+                      for elem in bundle.course.iter('chapter')])
+        self.assertIsNotNone(eta)
+
+        del self.reports[:]
+        bundle.export_to_directory(self.tempdir)
+        phase, _, _, total, written, chapter, eta = self.reports[-1]
+        self.assertEqual(phase, 'export')
+        self.assertEqual(written, total)
+        self.assertEqual(written, len(self.reports))
+        self.assertIsNotNone(chapter)
+        self.assertEqual(eta, 0)
+
+    def test_cancel_import(self):
+        """
+        A cancelled import stops at the next file.
+        """
+        token = CancelToken()
+
+        def cancel(progress):
+            """
+            Cancel after the fifth file.
+            """
+            if progress.parsed >= 5:
+                token.cancel()
+
+        bundle = XBundle(progress=cancel, cancel=token)
+        with self.assertRaises(Cancelled):
+            bundle.import_from_directory(COURSE)
+        self.assertEqual(bundle.progress.parsed, 5)
+
+    def test_cancel_export(self):
+        """
+        A cancelled export or normalization writes nothing; an export
+        which is not cancelled writes as usual.
+        """
+        token = CancelToken()
+        bundle = XBundle(keep_urls=True, cancel=token)
+        bundle.import_from_directory(COURSE)
+        expected = str(bundle)
+
+        def cancel(progress):
+            """
+            Cancel halfway through.
+            """
+            if progress.written * 2 >= progress.total:
+                token.cancel()
+
+        bundle.progress.callback = cancel
+        with self.assertRaises(Cancelled):
+            bundle.export_to_directory(self.tempdir)
+        self.assertEqual(os.listdir(self.tempdir), [])
+        self.assertEqual(str(bundle), expected)
+
+        with self.assertRaises(Cancelled):
+            bundle.normalize_directory(COURSE, self.tempdir)
+        self.assertEqual(os.listdir(self.tempdir), [])
+
+        bundle = XBundle(keep_urls=True, cancel=CancelToken())
+        bundle.import_from_directory(COURSE)
+        bundle.export_to_directory(self.tempdir)
+        self.assertTrue(os.path.exists(os.path.join(
+            self.tempdir, bundle.course.get('course'), 'course.xml')))
+
+    def test_staged_export(self):
+        """
+        A cancellable export writes its files to a staging directory, not
+        to memory, and moves them into place when done, also over an
+        earlier export.
+        """
+        bundle = XBundle(keep_urls=True, cancel=CancelToken())
+        bundle.import_from_directory(COURSE)
+        staged = []
+
+        def check(progress):
+            """
+            Record the directories next to the one exported to.
+            """
+            if progress.written:
+                self.assertEqual(bundle.storage.pending, [])
+                staged.append(os.listdir(self.tempdir))
+
+        bundle.progress.callback = check
+        bundle.export_to_directory(self.tempdir)
+        self.assertTrue(staged)
+        self.assertEqual(len(staged[-1]), 1)
+        self.assertTrue(staged[-1][0].startswith('.'))
+        course = bundle.course.get('course')
+        self.assertEqual(os.listdir(self.tempdir), [course])
+        expected = _read_tree(self.tempdir)
+
+        bundle.export_to_directory(self.tempdir)
+        self.assertEqual(os.listdir(self.tempdir), [course])
+        self.assertEqual(_read_tree(self.tempdir), expected)
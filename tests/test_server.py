@@ -0,0 +1,128 @@
+"""
+Tests for the conversion service.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import json
+import tarfile
+import zipfile
+import threading
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from six.moves import http_client
+
+from xbundle.server import ConversionService, make_server
+
+
+class TestConversionService(TestCase):
+    """
+    Tests for ConversionService and its HTTP front end.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.service = ConversionService(workers=1, queue_size=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.service.close()
+
+    def setUp(self):
+        self.tempdir = mkdtemp()
+        self.course = os.path.abspath(
+            os.path.join("input_testdata", "mitx.01"))
+
+    def tearDown(self):
+        rmtree(self.tempdir)
+
+    def test_convert(self):
+        """
+        Convert a directory and get timings back.
+        """
+        output = os.path.join(self.tempdir, "out.xml")
+        result = self.service.submit(self.course, output)
+        self.assertEqual(result['status'], 'ok')
+        self.assertIsNone(result['error'])
+        self.assertGreaterEqual(result['seconds'], 0)
+        self.assertTrue(os.path.exists(output))
+
+    def test_convert_archive(self):
+        """
+        Convert a tar archive of a directory.
+        """
+        archive = os.path.join(self.tempdir, "course.tar.gz")
+        with tarfile.open(archive, "w:gz") as tfile:
+            tfile.add(self.course, arcname="mitx.01")
+        output = os.path.join(self.tempdir, "out.xml")
+        result = self.service.submit(archive, output)
+        self.assertEqual(result['status'], 'ok')
+        self.assertTrue(os.path.exists(output))
+
+    def test_unsafe_archive(self):
+        """
+        An archive writing outside of where it is extracted is refused.
+        """
+        archive = os.path.join(self.tempdir, "course.tar.gz")
+        with tarfile.open(archive, "w:gz") as tfile:
+            tfile.add(self.course, arcname="mitx.01")
+            tfile.add(
+                os.path.join(self.course, "course.xml"),
+                arcname="../escaped.xml")
+        output = os.path.join(self.tempdir, "out.xml")
+        result = self.service.submit(archive, output)
+        self.assertEqual(result['status'], 'error')
+        self.assertIn("../escaped.xml", result['error'])
+        self.assertFalse(os.path.exists(output))
+
+        archive = os.path.join(self.tempdir, "course.zip")
+        with zipfile.ZipFile(archive, "w") as zfile:
+            zfile.writestr("../escaped.xml", "<course/>")
+        self.assertEqual(
+            self.service.submit(archive, output)['status'], 'error')
+
+    def test_error(self):
+        """
+        A failed conversion reports its error.
+        """
+        result = self.service.submit(
+            os.path.join(self.tempdir, "missing"),
+            os.path.join(self.tempdir, "out.xml"))
+        self.assertEqual(result['status'], 'error')
+        self.assertIn("missing", result['error'])
+        self.assertGreaterEqual(self.service.status()['failed'], 1)
+
+    def test_http(self):
+        """
+        Request a conversion over HTTP.
+        """
+        server = make_server(self.service, port=0)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            conn = http_client.HTTPConnection(
+                '127.0.0.1', server.server_address[1])
+            output = os.path.join(self.tempdir, "out.xml")
+            conn.request('POST', '/convert', json.dumps(
+                {'input': self.course, 'output': output}))
+            response = conn.getresponse()
+            self.assertEqual(response.status, 200)
+            result = json.loads(response.read().decode('utf-8'))
+            self.assertEqual(result['status'], 'ok')
+
+            conn.request('POST', '/convert', '{"input": "x"}')
+            response = conn.getresponse()
+            self.assertEqual(response.status, 400)
+            response.read()
+
+            conn.request('GET', '/status')
+            response = conn.getresponse()
+            status = json.loads(response.read().decode('utf-8'))
+            self.assertEqual(status['workers'], 1)
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
@@ -0,0 +1,115 @@
+"""
+Tests for exporting a course on a pool of processes.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from lxml import etree
+
+from xbundle import XBundle
+from xbundle.shards import can_shard, export_shards
+from xbundle.storage import FileStorage, MemoryStorage
+from tests.test_import_export import _read_tree
+
+DEVOPS = os.path.join("input_testdata", "content-devops-0001")
+
+
+def export_in_worker(path):
+    """
+    Export the devops course with workers from a pool worker, which is
+    a daemonic process.
+    """
+    bundle = XBundle()
+    bundle.import_from_directory(DEVOPS)
+    bundle.export_to_directory(path, workers=2)
+    return can_shard(bundle)
+
+
+class TestShards(TestCase):
+    """
+    Tests for export_to_directory with workers.
+    """
+    def setUp(self):
+        self.tempdir = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.tempdir)
+
+    def test_same_files(self):
+        """
+        Exporting with workers writes the same files as a serial export.
+        """
+        for options in [
+                {'keep_urls': True},
+                {'force_studio_format': True, 'stable_urls': True},
+                {'passthrough': True, 'no_overwrite': ['course']},
+        ]:
+            bundle = XBundle(**options)
+            bundle.import_from_directory(DEVOPS)
+            serial_dir = os.path.join(self.tempdir, 'serial')
+            bundle.export_to_directory(serial_dir)
+            sharded_dir = os.path.join(self.tempdir, 'sharded')
+            bundle.export_to_directory(sharded_dir, workers=2)
+
+            expected = _read_tree(serial_dir)
+            self.assertTrue(expected)
+            self.assertEqual(expected, _read_tree(sharded_dir))
+            rmtree(serial_dir)
+            rmtree(sharded_dir)
+
+    def test_daemon_process(self):
+        """
+        A daemonic process, which can't start workers, exports serially.
+        """
+        from multiprocessing import Pool
+        sharded_dir = os.path.join(self.tempdir, 'sharded')
+        pool = Pool(1)
+        try:
+            self.assertFalse(pool.apply(export_in_worker, (sharded_dir,)))
+        finally:
+            pool.terminate()
+            pool.join()
+        serial_dir = os.path.join(self.tempdir, 'serial')
+        bundle = XBundle()
+        bundle.import_from_directory(DEVOPS)
+        bundle.export_to_directory(serial_dir)
+        self.assertEqual(_read_tree(serial_dir), _read_tree(sharded_dir))
+
+    def test_serial_fallback(self):
+        """
+        Chapters are only sharded when workers can write them all to the
+        filesystem without writing the same file.
+        """
+        course = etree.XML(
+            '<course semester="2014" org="MITx" course="d">'
+            '<chapter display_name="A"><html url_name_orig="shared">a</html>'
+            '</chapter><chapter display_name="B">'
+            '<html url_name_orig="shared">b</html></chapter></course>')
+        bundle = XBundle(keep_urls=True)
+        bundle.set_course(course)
+        bundle.export = bundle.make_descriptor(bundle.course, '2014')
+        bundle.export.append(bundle.course)
+        bundle.add_descriptors(bundle.course)
+        self.assertFalse(export_shards(bundle, 2))
+
+        class LoggedStorage(FileStorage):
+            """
+            Storage writing files differently from FileStorage.
+            """
+        self.assertTrue(can_shard(XBundle()))
+        self.assertFalse(can_shard(XBundle(storage=LoggedStorage())))
+
+        bundle = XBundle(keep_urls=True, storage=MemoryStorage())
+        bundle.set_course(course)
+        bundle.export_to_directory('out', workers=2)
+        sharded = bundle.storage.files
+        bundle.storage = MemoryStorage()
+        bundle.export_to_directory('out')
+        self.assertEqual(sharded, bundle.storage.files)
+        self.assertIn('out/d/html/shared.xml', sharded)
@@ -0,0 +1,115 @@
+"""
+Tests for storage backends.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import tarfile
+import zipfile
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from xbundle import XBundle
+from xbundle.storage import ArchiveStorage, MemoryStorage
+from tests.test_import_export import _read_tree
+
+COURSE = os.path.join("input_testdata", "content-devops-0001")
+
+
+class TestStorage(TestCase):
+    """
+    Tests for MemoryStorage and ArchiveStorage.
+    """
+    def setUp(self):
+        self.tempdir = mkdtemp()
+        self.files = dict(
+            (os.path.join('course', name), data)
+            for name, data in _read_tree(COURSE).items()
+        )
+        bundle = XBundle(keep_urls=True, keep_static=True)
+        bundle.import_from_directory(COURSE)
+        self.expected = str(bundle)
+        self.expected_files = self.export(bundle)
+
+    def tearDown(self):
+        rmtree(self.tempdir)
+
+    @staticmethod
+    def export(bundle):
+        """
+        Export bundle to /nonexistent in its storage, or in memory if it
+        uses the filesystem, and return the files written by name.
+        """
+        if not isinstance(bundle.storage, MemoryStorage):
+            bundle.storage = MemoryStorage()
+        bundle.export_to_directory('/nonexistent')
+        return dict(
+            (os.path.relpath(name, '/nonexistent'), data)
+            for name, data in bundle.storage.files.items()
+            if name.startswith('/nonexistent/')
+        )
+
+    def check_import(self, storage):
+        """
+        Importing from storage, and exporting to it, gives the same as
+        with the filesystem.
+        """
+        bundle = XBundle(keep_urls=True, keep_static=True, storage=storage)
+        bundle.import_from_directory('course')
+        self.assertEqual(
+            str(bundle).replace('root="course"', 'root="{0}"'.format(
+                os.path.abspath(COURSE))),
+            self.expected)
+        self.assertEqual(self.export(bundle), self.expected_files)
+
+    def test_memory(self):
+        """
+        Import and export entirely in memory.
+        """
+        self.assertIn('0.001/course.xml', self.expected_files)
+        self.assertIn('0.001/static/boot.js', self.expected_files)
+        self.check_import(MemoryStorage(self.files))
+        self.assertFalse(os.path.exists('/nonexistent'))
+
+    def test_archives(self):
+        """
+        Import from and export to zip and tar archives.
+        """
+        zname = os.path.join(self.tempdir, 'course.zip')
+        with zipfile.ZipFile(zname, 'w') as zfile:
+            for name, data in self.files.items():
+                zfile.writestr(name, data)
+        self.check_import(ArchiveStorage(zname))
+
+        tname = os.path.join(self.tempdir, 'course.tar.gz')
+        with tarfile.open(tname, 'w:gz') as tfile:
+            tfile.add(COURSE, arcname='course')
+        self.check_import(ArchiveStorage(tname))
+
+        bundle = XBundle(keep_urls=True)
+        bundle.import_from_directory(COURSE)
+        out = os.path.join(self.tempdir, 'out.zip')
+        bundle.storage = ArchiveStorage(out, mode='w')
+        bundle.export_to_directory('')
+        with zipfile.ZipFile(out) as zfile:
+            self.assertIn('0.001/course.xml', zfile.namelist())
+
+    def test_memory_listing(self):
+        """
+        glob and walk behave as on the filesystem.
+        """
+        storage = MemoryStorage({
+            'a/b.json': b'1', 'a/c.json': b'2', 'a/d/e.txt': b'3'})
+        self.assertEqual(storage.glob('a/*.json'), ['a/b.json', 'a/c.json'])
+        self.assertEqual(
+            storage.glob('./a/*'), ['a/b.json', 'a/c.json', 'a/d'])
+        self.assertTrue(storage.isdir('a/d'))
+        self.assertEqual(list(storage.walk('a')), [
+            ('a', ['d'], ['b.json', 'c.json']), ('a/d', [], ['e.txt'])])
+        self.assertEqual(list(storage.walk('missing')), [])
+        self.assertEqual(storage.getsize('a/d/e.txt'), 1)
+        with self.assertRaises(IOError):
+            storage.read('a/x')
@@ -0,0 +1,145 @@
+"""
+Tests for converting a course one chapter at a time.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import io
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from lxml import etree
+
+from xbundle import XBundle
+from tests.test_import_export import _read_tree
+from tests.util import clean_xml
+
+DEVOPS = os.path.join("input_testdata", "content-devops-0001")
+MITX = os.path.join("input_testdata", "mitx.01")
+SECTIONS = os.path.join("input_testdata", "sections")
+
+
+class TestStreaming(TestCase):
+    """
+    Tests for stream_from_directory and stream_to_directory.
+    """
+    def setUp(self):
+        self.tempdir = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.tempdir)
+
+    def test_stream_from_directory(self):
+        """
+        The streamed xbundle has the same content as an import followed
+        by a save.
+        """
+        filename = os.path.join(self.tempdir, 'xbundle.xml')
+        for path, options in [
+                (MITX, {}),
+                (SECTIONS, {}),
+                (DEVOPS, {'keep_urls': True}),
+                (DEVOPS, {'passthrough': True}),
+        ]:
+            bundle = XBundle(**options)
+            bundle.import_from_directory(path)
+            expected = str(bundle)
+
+            XBundle(**options).stream_from_directory(path, filename)
+            with io.open(filename, encoding='utf-8') as streamed:
+                self.assertEqual(
+                    clean_xml(expected), clean_xml(streamed.read()))
+
+    def test_written_while_read(self):
+        """
+        The metadata is written before any chapter is read, and each
+        chapter before the next one; a failed conversion leaves no file.
+        """
+        output = io.BytesIO()
+        seen = []
+
+        def report(progress):
+            """
+            Record the chapters written when each chapter is read.
+            """
+            if progress.chapter and progress.chapter not in seen:
+                written = output.getvalue()
+                self.assertIn(b'</metadata>', written)
+                self.assertEqual(written.count(b'<chapter'), len(seen))
+                seen.append(progress.chapter)
+
+        bundle = XBundle(progress=report)
+        bundle.stream_from_directory(DEVOPS, file_handle=output)
+        self.assertEqual(len(seen), 3)
+        self.assertEqual(len(bundle.course), 0)
+
+        filename = os.path.join(self.tempdir, 'xbundle.xml')
+        with self.assertRaises(IOError):
+            XBundle().stream_from_directory(self.tempdir, filename)
+        self.assertFalse(os.path.exists(filename))
+
+    def test_stream_to_directory(self):
+        """
+        Streaming an xbundle to a directory writes the same files as
+        loading it and exporting it.
+        """
+        for path, options in [
+                (MITX, {'keep_urls': True}),
+                (DEVOPS, {'force_studio_format': True}),
+                (DEVOPS, {'stable_urls': True, 'passthrough': True}),
+        ]:
+            filename = os.path.join(self.tempdir, 'xbundle.xml')
+            bundle = XBundle(**options)
+            bundle.import_from_directory(path)
+            bundle.save(filename)
+
+            expected_dir = os.path.join(self.tempdir, 'expected')
+            bundle = XBundle(**options)
+            bundle.load(filename)
+            bundle.export_to_directory(expected_dir)
+
+            streamed_dir = os.path.join(self.tempdir, 'streamed')
+            bundle = XBundle(**options)
+            bundle.stream_to_directory(filename, streamed_dir)
+            # Only pointers to the chapters written are kept.
+            self.assertFalse([child for child in bundle.course if len(child)])
+
+            expected = _read_tree(expected_dir)
+            self.assertTrue(expected)
+            self.assertEqual(expected, _read_tree(streamed_dir))
+            rmtree(expected_dir)
+            rmtree(streamed_dir)
+
+    def test_metadata_after_course(self):
+        """
+        The metadata is exported also when it follows the course, and a
+        file without a course is refused.
+        """
+        bundle = XBundle(keep_urls=True)
+        bundle.import_from_directory(MITX)
+        xml = etree.Element('xbundle')
+        xml.append(bundle.course)
+        xml.append(bundle.metadata)
+        filename = os.path.join(self.tempdir, 'xbundle.xml')
+        with open(filename, 'wb') as output:
+            output.write(etree.tostring(xml))
+
+        expected_dir = os.path.join(self.tempdir, 'expected')
+        bundle = XBundle(keep_urls=True)
+        bundle.load(filename)
+        bundle.export_to_directory(expected_dir)
+        streamed_dir = os.path.join(self.tempdir, 'streamed')
+        XBundle(keep_urls=True).stream_to_directory(filename, streamed_dir)
+
+        expected = _read_tree(expected_dir)
+        self.assertIn(
+            os.path.join('mitx.01', 'about', 'overview.html'), expected)
+        self.assertEqual(expected, _read_tree(streamed_dir))
+
+        with open(filename, 'wb') as output:
+            output.write(b'<xbundle><metadata/></xbundle>')
+        with self.assertRaises(ValueError):
+            XBundle().stream_to_directory(filename, streamed_dir)
@@ -0,0 +1,168 @@
+"""
+Tests for checking OLX directories and xbundle files.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+from shutil import rmtree, copytree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from xbundle import XBundle
+from xbundle.validate import validate, ERROR, WARNING
+
+
+def kinds(problems):
+    """
+    Return the (severity, kind) of each problem.
+    """
+    return [(problem.severity, problem.kind) for problem in problems]
+
+
+class TestValidate(TestCase):
+    """
+    Tests for validate.
+    """
+    def setUp(self):
+        self.tempdir = mkdtemp()
+
+    def tearDown(self):
+        rmtree(self.tempdir)
+
+    def write(self, filename, content):
+        """
+        Write a file in the temporary directory.
+        """
+        filename = os.path.join(self.tempdir, filename)
+        with open(filename, "w") as output:
+            output.write(content)
+        return filename
+
+    def test_valid(self):
+        """
+        The test courses and their xbundles have no problems.
+        """
+        for path in ("mitx.01", "content-devops-0001",
+                     "content-devops-0001.out.xml"):
+            self.assertEqual(
+                validate(os.path.join("input_testdata", path)), [])
+
+    def test_legacy_section(self):
+        """
+        <section> is reported as a warning.
+        """
+        problems = validate(os.path.join("input_testdata", "sections"))
+        self.assertEqual(kinds(problems), [(WARNING, 'legacy_section')])
+        self.assertEqual(
+            problems[0].filename, os.path.join("chapter", "Intro_chapter.xml"))
+
+    def test_directory_problems(self):
+        """
+        Every problem in a directory is reported, not just the first.
+        """
+        path = os.path.join(self.tempdir, "mitx.01")
+        copytree(os.path.join("input_testdata", "mitx.01"), path)
+        self.write(
+            os.path.join(path, "chapter", "Intro_chapter.xml"),
+            '<chapter display_name="Intro">'
+            '<sequential url_name="broken"/>'
+            '<sequential url_name="missing"/>'
+            '<sequential display_name="Overview">'
+            '<html url_name="Overview_text_html"/>'
+            '<html url_name="Overview_text_html"/>'
+            '<problem filename="gone"/>'
+            '</sequential></chapter>'
+        )
+        os.mkdir(os.path.join(path, "sequential"))
+        self.write(
+            os.path.join(path, "sequential", "broken.xml"), "<sequential>")
+
+        problems = validate(path)
+        self.assertEqual(kinds(problems), [
+            (ERROR, 'unparseable'),
+            (ERROR, 'missing_file'),
+            (WARNING, 'duplicate_url_name'),
+            (ERROR, 'missing_file'),
+        ])
+        self.assertEqual(
+            problems[1].filename, os.path.join("sequential", "missing.xml"))
+        self.assertEqual(
+            problems[3].filename, os.path.join("problem", "gone.xml"))
+
+    def test_xbundle_problems(self):
+        """
+        Every problem in an xbundle file is reported.
+        """
+        filename = self.write(
+            "xbundle.xml",
+            '<xbundle><metadata/><course semester="x">'
+            '<chapter url_name="a"><section/></chapter>'
+            '<chapter url_name_orig="a"/>'
+            '</course><course semester="y"/></xbundle>'
+        )
+        self.assertEqual(kinds(validate(filename)), [
+            (WARNING, 'legacy_section'),
+            (WARNING, 'duplicate_url_name'),
+            (ERROR, 'missing_course'),
+        ])
+
+        filename = self.write("broken.xml", "<xbundle><metadata>")
+        self.assertEqual(
+            kinds(validate(filename)), [(ERROR, 'unparseable')])
+
+    def test_inline_filename(self):
+        """
+        An html element with both a url_name and a filename is read from
+        its filename when there is no file for its url_name.
+        """
+        path = os.path.join(self.tempdir, "course")
+        for dname in ("course", "html"):
+            os.makedirs(os.path.join(path, dname))
+        self.write(
+            os.path.join(path, "course.xml"),
+            '<course url_name="2014" org="MITx" course="inline"/>')
+        self.write(
+            os.path.join(path, "course", "2014.xml"),
+            '<course><chapter display_name="Ch"><sequential>'
+            '<html url_name="h1" filename="h1" display_name="H"/>'
+            '<html url_name="h2" filename="h2" display_name="H2"/>'
+            '</sequential></chapter></course>')
+        self.write(os.path.join(path, "html", "h1.html"), '<p>H</p>')
+        problems = validate(path)
+        self.assertEqual(kinds(problems), [(ERROR, 'missing_file')])
+        self.assertEqual(problems[0].filename, os.path.join("html", "h2.html"))
+
+    def test_shared_content(self):
+        """
+        Content shared between sequentials is a warning, both in the
+        directory and in the xbundle saved from it with keep_urls.
+        """
+        path = os.path.join(self.tempdir, "course")
+        for dname in ("course", "vertical"):
+            os.makedirs(os.path.join(path, dname))
+        self.write(
+            os.path.join(path, "course.xml"),
+            '<course url_name="2014" org="MITx" course="shared"/>')
+        self.write(
+            os.path.join(path, "course", "2014.xml"),
+            '<course><chapter display_name="Ch">'
+            '<sequential display_name="A"><vertical url_name="common"/>'
+            '</sequential><sequential display_name="B">'
+            '<vertical url_name="common"/></sequential>'
+            '</chapter></course>')
+        self.write(
+            os.path.join(path, "vertical", "common.xml"),
+            '<vertical display_name="Common"/>')
+        self.assertEqual(
+            kinds(validate(path)), [(WARNING, 'duplicate_url_name')])
+
+        bundle = XBundle(keep_urls=True)
+        bundle.import_from_directory(path)
+        filename = os.path.join(self.tempdir, "shared.xml")
+        bundle.save(filename)
+        problems = validate(filename)
+        self.assertTrue(problems)
+        self.assertEqual(
+            set(kinds(problems)), {(WARNING, 'duplicate_url_name')})
@@ -0,0 +1,168 @@
+"""
+Tests for keeping an xbundle in sync with an OLX directory.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+from shutil import rmtree, copytree
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from xbundle import XBundle
+from xbundle.watch import Watcher
+from tests.util import clean_xml
+
+
+class TestWatcher(TestCase):
+    """
+    Tests for Watcher.
+    """
+    def setUp(self):
+        self.tempdir = mkdtemp()
+        self.path = os.path.join(self.tempdir, "mitx.01")
+        copytree(os.path.join("input_testdata", "mitx.01"), self.path)
+        self.output = os.path.join(self.tempdir, "xbundle.xml")
+        self.watcher = Watcher(self.path, self.output, debounce=0)
+        self.watcher.start()
+
+    def tearDown(self):
+        rmtree(self.tempdir)
+
+    def write(self, filename, content):
+        """
+        Replace the content of a file in the watched directory.
+        """
+        with open(os.path.join(self.path, filename), "w") as output:
+            output.write(content)
+
+    def read_output(self):
+        """
+        Read the xbundle written by the watcher.
+        """
+        with open(self.output) as xbundle:
+            return xbundle.read()
+
+    def test_unchanged(self):
+        """
+        Nothing is rewritten if nothing changed.
+        """
+        self.assertIn("hello world", self.read_output())
+        self.assertFalse(self.watcher.poll())
+
+    def test_patch_html(self):
+        """
+        A changed html file is re-imported on its own.
+        """
+        sequential = self.watcher.bundle.course.find(".//sequential")
+        self.write(
+            os.path.join("html", "Overview_text_html.xml"),
+            '<html display_name="Overview text">hello again watcher</html>'
+        )
+        self.assertTrue(self.watcher.poll())
+        self.assertIn("hello again watcher", self.read_output())
+        self.assertNotIn("hello world", self.read_output())
+        # The rest of the tree was left alone.
+        self.assertIs(
+            sequential, self.watcher.bundle.course.find(".//sequential"))
+
+        # The new element is tracked in turn.
+        self.write(
+            os.path.join("html", "Overview_text_html.xml"),
+            '<html display_name="Overview text">and once more</html>'
+        )
+        self.assertTrue(self.watcher.poll())
+        self.assertIn("and once more", self.read_output())
+
+    def test_patch_descriptor(self):
+        """
+        A changed descriptor file re-imports the element and its children.
+        """
+        self.write(
+            os.path.join("chapter", "Intro_chapter.xml"),
+            '<chapter display_name="Renamed">'
+            '<sequential display_name="Overview">'
+            '<html url_name="Overview_text_html"/>'
+            '</sequential></chapter>'
+        )
+        self.assertTrue(self.watcher.poll())
+        output = self.read_output()
+        self.assertIn('display_name="Renamed"', output)
+        self.assertIn("hello world", output)
+
+    def test_patch_keeps_children(self):
+        """
+        A changed descriptor file is parsed on its own: the descriptors it
+        still refers to keep what they were imported as.
+        """
+        path = os.path.join(self.tempdir, "content-devops-0001")
+        copytree(os.path.join("input_testdata", "content-devops-0001"), path)
+        watcher = Watcher(path, self.output, debounce=0)
+        watcher.start()
+        bundle = watcher.bundle
+        sequentials = bundle.course.find(
+            "chapter[@display_name='Content/problem tests']").findall(
+                "sequential")
+        parsed = bundle.import_stats['parsed']
+
+        filename = os.path.join(
+            path, "chapter", "4695c7a6558c4e839c4bfd2e80ae810b.xml")
+        with open(filename) as source:
+            content = source.read()
+        with open(filename, "w") as output:
+            output.write(content.replace(
+                'display_name="', 'display_name="Renamed ', 1))
+        self.assertTrue(watcher.poll())
+
+        self.assertEqual(bundle.import_stats['parsed'], parsed + 1)
+        chapter = bundle.course.find(
+            "chapter[@display_name='Renamed Content/problem tests']")
+        self.assertEqual(chapter.findall("sequential"), sequentials)
+        expected = XBundle()
+        expected.import_from_directory(path)
+        self.assertEqual(clean_xml(str(expected)), clean_xml(str(bundle)))
+
+    def test_metadata(self):
+        """
+        A changed policy file reloads the metadata.
+        """
+        self.write(
+            os.path.join("policies", "2013_Spring", "policy.json"), "x:12")
+        self.assertTrue(self.watcher.poll())
+        self.assertIn("x:12", self.read_output())
+
+    def test_broken_file(self):
+        """
+        A file which can't be parsed leaves the previous xbundle in place,
+        until it is fixed.
+        """
+        self.write(
+            os.path.join("html", "Overview_text_html.xml"), "<html>broken")
+        self.assertFalse(self.watcher.poll())
+        self.assertIn("hello world", self.read_output())
+        self.assertIn("hello world", str(self.watcher.bundle))
+
+        # Once the file is fixed, the change is applied.
+        self.write(
+            os.path.join("html", "Overview_text_html.xml"),
+            '<html display_name="Overview text">fixed</html>'
+        )
+        self.assertTrue(self.watcher.poll())
+        expected = XBundle()
+        expected.import_from_directory(self.path)
+        self.assertIn("fixed", self.read_output())
+        self.assertEqual(
+            clean_xml(str(expected)), clean_xml(str(self.watcher.bundle)))
+
+    def test_cycle(self):
+        """
+        A descriptor which comes to include itself is refused.
+        """
+        self.write(
+            os.path.join("chapter", "Intro_chapter.xml"),
+            '<chapter display_name="Loop"><sequential>'
+            '<chapter url_name="Intro_chapter"/></sequential></chapter>'
+        )
+        self.assertFalse(self.watcher.poll())
+        self.assertNotIn("Loop", str(self.watcher.bundle))
@@ -5,13 +5,16 @@ Misc tests for XBundle object.
 from __future__ import unicode_literals
 from __future__ import print_function
 
+import io
 import os
+import sys
 from lxml import etree
 from shutil import rmtree
 from tempfile import mkdtemp
 from unittest import TestCase
 
 from xbundle import XBundle
+from xbundle.storage import MemoryStorage
 from tests.util import clean_xml, file_from_string
 from tests.data import input as input_data, expected as expected_data
 
@@ -153,3 +156,153 @@ class TestXBundle(TestCase):
         # Section element should be removed.
         expected = expected_data.MISSING_SECTION
         self.assertEqual(clean_xml(expected), clean_xml(str(bundle)))
+
+    def test_deep_import(self):
+        """
+        Test importing content nested deeper than the recursion limit,
+        old section and name attributes included.
+        """
+        depth = sys.getrecursionlimit() + 100
+        files = {
+            'course.xml': b'<course url_name="2014" org="MITx" course="d"/>',
+            'course/2014.xml': (
+                b'<course><chapter name="Ch"><section><sequential>'
+                b'<vertical url_name="v0"/></sequential></section>'
+                b'</chapter></course>'),
+        }
+        for level in range(depth):
+            files['vertical/v{0}.xml'.format(level)] = (
+                '<vertical><vertical url_name="v{0}"/>'
+                '</vertical>'.format(level + 1).encode('utf-8'))
+        files['vertical/v{0}.xml'.format(depth)] = b'<vertical/>'
+        bundle = XBundle(storage=MemoryStorage(files))
+        bundle.import_from_directory('.')
+
+        chapter = bundle.course[0]
+        self.assertEqual(chapter.get('display_name'), 'Ch')
+        self.assertEqual(chapter[0].tag, 'sequential')
+        vertical = chapter[0][0]
+        for level in range(depth):
+            self.assertEqual(vertical.get('display_name'), 'v{0}'.format(
+                level))
+            vertical = vertical[0]
+        self.assertEqual(len(vertical), 0)
+
+    def test_cyclic_import(self):
+        """
+        Test that a descriptor including itself is refused, rather than
+        imported without end.
+        """
+        files = {
+            'course.xml': b'<course url_name="2014" org="MITx" course="d"/>',
+            'course/2014.xml': (
+                b'<course><chapter display_name="Ch">'
+                b'<sequential url_name="B"/></chapter></course>'),
+            'sequential/B.xml': (
+                b'<sequential><vertical><sequential url_name="B"/>'
+                b'</vertical></sequential>'),
+        }
+        bundle = XBundle(storage=MemoryStorage(files))
+        with self.assertRaises(ValueError) as context:
+            bundle.import_from_directory('.')
+        self.assertIn('url_name="B"', str(context.exception))
+        with self.assertRaises(ValueError):
+            XBundle(storage=MemoryStorage(files)).stream_from_directory(
+                '.', file_handle=io.BytesIO())
+
+    def test_shared_descriptors(self):
+        """
+        Test that a descriptor used in many places is parsed once, with
+        the same result as parsing it every time.
+        """
+        files = {
+            'course.xml': b'<course url_name="2014" org="MITx" course="d"/>',
+            'course/2014.xml': (
+                b'<course><chapter display_name="Ch">' +
+                b''.join(
+                    '<sequential display_name="S{0}">'
+                    '<vertical url_name="shared"/></sequential>'.format(
+                        idx).encode('utf-8')
+                    for idx in range(20)) +
+                b'</chapter></course>'),
+            'vertical/shared.xml': (
+                b'<vertical name="Shared"><html url_name="intro"/>'
+                b'<problem url_name="p1"/><section><sequential>'
+                b'<html url_name="intro"/></sequential></section>'
+                b'</vertical>'),
+            'html/intro.xml': b'<html filename="intro"/>',
+            'html/intro.html': b'<p>Hello</p>',
+            'problem/p1.xml': b'<problem><p>Why?</p></problem>',
+        }
+
+        bundle = XBundle(keep_urls=True, storage=MemoryStorage(files))
+        bundle.sources = {}  # parses every file where it is used
+        bundle.import_from_directory('.')
+        expected = str(bundle)
+        self.assertEqual(bundle.import_stats['reused'], 0)
+
+        bundle = XBundle(keep_urls=True, storage=MemoryStorage(files))
+        bundle.import_from_directory('.')
+        self.assertEqual(str(bundle), expected)
+        # course, vertical, problem, and html with its body.
+        self.assertEqual(bundle.import_stats, {
+            'parsed': 5, 'reused': 19 + 1, 'saved': 19 * 4 + 2})
+        vertical = bundle.course.find('.//vertical')
+        self.assertEqual(vertical.get('display_name'), 'shared')
+        self.assertEqual(vertical[2].tag, 'sequential')
+
+    def test_stable_urls(self):
+        """
+        Test that stable_urls keeps the file names of unchanged elements
+        when content is inserted ahead of them.
+        """
+        def export_files(course):
+            """
+            Export course and return the set of files written.
+            """
+            bundle = XBundle(stable_urls=True, force_studio_format=True)
+            bundle.set_course(course)
+            tempdir = mkdtemp()
+            try:
+                bundle.export_to_directory(tempdir, xml_only=True)
+                root = os.path.join(tempdir, "mitx.01")
+                return set(
+                    os.path.relpath(os.path.join(dname, fname), root)
+                    for dname, _, fnames in os.walk(root)
+                    for fname in fnames
+                )
+            finally:
+                rmtree(tempdir)
+
+        before = export_files(etree.XML(input_data.STABLE_URLS_COURSE))
+        self.assertEqual(
+            before,
+            export_files(etree.XML(input_data.STABLE_URLS_COURSE)))
+
+        course = etree.XML(input_data.STABLE_URLS_COURSE)
+        added = etree.XML('<html display_name="Added">new</html>')
+        course.find('.//sequential').insert(0, added)
+        after = export_files(course)
+
+        # Only the sequential, whose list of children changed, is renamed.
+        removed = before - after
+        self.assertEqual(len(removed), 1)
+        self.assertTrue(removed.pop().startswith("sequential/"))
+        # The new html, its vertical and the renamed sequential.
+        self.assertEqual(len(after - before), 3)
+
+    def test_stable_urls_identical(self):
+        """
+        Test that identical siblings, which share a digest, are told apart
+        by a counter after it, which leaves the digest itself alone.
+        """
+        vertical = etree.XML(
+            '<vertical display_name="Unit">'
+            '<html display_name="Notes">same</html>'
+            '<html display_name="Notes">same</html>'
+            '</vertical>'
+        )
+        bundle = XBundle(stable_urls=True)
+        first, second = [bundle.make_urlname(html) for html in vertical]
+        self.assertTrue(first.startswith("Notes_html_"))
+        self.assertEqual(second, first + "-1")
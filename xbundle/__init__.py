@@ -8,13 +8,21 @@ includes the following sub-elements:
   <policies semester=...>: <policy> and <gradingpolicy>
                            each contain the JSON for the corresponding file
   <about>: <file filename=...> </about>
+  <static root=...>: <file filename=... size=...>, references to static
+                     files, only with keep_static
 </metadata>
 <course semester="...">: course XML </course>
 
+With passthrough, html and problem files are held as text rather than
+XML: <html xbundle_raw="html/..."> and <problem xbundle_raw="problem/...">
+contain the file content verbatim.
+
 The XBundle class represents an xbundle file; it can read and write
 the file, and it can import and export to standard edX (unbundled) format.
 """
 
+# pylint: disable=too-many-lines
+
 from __future__ import unicode_literals
 from __future__ import print_function
 
@@ -22,17 +30,26 @@ import six
 import os
 import re
 import logging
-from glob import glob
-import subprocess
+from copy import deepcopy
 from os.path import join, exists, basename
 
 from lxml import etree
 import unicodedata
-log = logging.getLogger()  # pylint: disable=invalid-name
-logging.basicConfig()
-log.setLevel(logging.DEBUG)
+
+# Modules only some code paths need (glob, hashlib, subprocess) are
+# imported where they are used, to keep importing xbundle cheap.
+
+__version__ = '0.3.1'
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+log.addHandler(logging.NullHandler())
 
 POLICY_TAG_MAP = {'policy': 'policy', 'gradingpolicy': 'grading_policy'}
+URL_NAME_ATTRS = {'url_name', 'url_name_orig'}
+# Directories of files which are carried along, rather than imported.
+STATIC_DIRS = ('static', 'assets', 'lti')
+# Marks the end of an element on the stack of XBundle.import_tree.
+MEMO = object()
 
 # star-args aren't offensive, and pylint has a lot of trouble with
 # members in the lxml package.
@@ -46,7 +63,7 @@ DESCRIPTOR_TAGS = {
 }
 
 
-# pylint: disable=too-many-instance-attributes
+# pylint: disable=too-many-instance-attributes, too-many-public-methods
 class XBundle(object):
     """
     An XBundle is defined by two elements: course and metadata.
@@ -55,7 +72,9 @@ class XBundle(object):
     def __init__(
             self, keep_urls=False, force_studio_format=False,
             skip_hidden=False, keep_studio_urls=False,
-            no_overwrite=None, preserve_url_name=False,
+            no_overwrite=None, preserve_url_name=False, stable_urls=False,
+            keep_static=False, passthrough=False, storage=None,
+            progress=None, cancel=None,
     ):  # pylint: disable=too-many-arguments
         """
         if keep_urls=True then the original url_name attributes are kept upon
@@ -69,6 +88,31 @@ class XBundle(object):
 
         no_overwrite: optional list of xml tags for which files should not
                       be overwritten (eg course)
+
+        if stable_urls=True, url_names generated on export are derived
+        from the position and content of each element (see
+        xbundle.digest.stable_digest)
+        instead of the order in which elements are reached, so unchanged
+        elements keep their file names from one export to the next.
+
+        if keep_static=True, the files in the static, assets and lti
+        directories are listed in the metadata on import, and linked or
+        copied into place on export (see xbundle.storage.link_file).
+
+        if passthrough=True, html and problem files are imported as text,
+        without being parsed, and written back verbatim on export (see
+        read_raw).
+
+        storage: where OLX directories are imported from and exported to;
+        by default the filesystem (see xbundle.storage).
+
+        progress: optional function called with an xbundle.progress.Progress
+        after each file is read or written.
+
+        cancel: optional xbundle.progress.CancelToken; once cancelled, the
+        import or export raises Cancelled at the next file, and an export
+        writes nothing (its files are written to a temporary directory,
+        moved into place once it completes; see xbundle.progress).
         """
         self.course = etree.Element('course')
         self.metadata = etree.Element('metadata')
@@ -80,11 +124,132 @@ class XBundle(object):
         self.skip_hidden = skip_hidden
         self.keep_studio_urls = keep_studio_urls
         self.preserve_url_name = preserve_url_name
-        self.no_overwrite = no_overwrite or []
+        self.no_overwrite = list(no_overwrite or [])
+        self.stable_urls = stable_urls
+        self.keep_static = keep_static
+        self.passthrough = passthrough
+        if storage is None:
+            from xbundle.storage import FileStorage
+            storage = FileStorage()
+        self.storage = storage
+        from xbundle.progress import Progress
+        self.progress = Progress(progress)
+        self.cancel = cancel
         self.path = ""
         self.semester = ""
         self.export = None
         self.policy = {}
+        # Set to a dict to have imports record, for each file read, the
+        # (descriptor, resolved element) pairs it contributed to.
+        self.sources = None
+        self._elements = None  # see the elements property
+        self._fingerprints = None  # see the fingerprints property
+        # Files parsed by imports, descriptors imported by copying an
+        # earlier import of the same one, and the parses that saved.
+        self.import_stats = {'parsed': 0, 'reused': 0, 'saved': 0}
+
+    @property
+    def elements(self):
+        """
+        Index of the course elements by url_name, tag and display_name,
+        with methods to query and edit them (see xbundle.elements).  It is
+        built on first use after the course is loaded, imported or set.
+        """
+        if self._elements is None or self._elements.root is not self.course:
+            from xbundle.elements import ElementIndex
+            self._elements = ElementIndex(self.course, on_change=self.changed)
+        return self._elements
+
+    @property
+    def fingerprints(self):
+        """
+        Merkle digests of the course elements, computed on demand and
+        cached (see xbundle.fingerprint).
+        """
+        if self._fingerprints is None or \
+                self._fingerprints.root is not self.course:
+            from xbundle.fingerprint import Fingerprints
+            self._fingerprints = Fingerprints(self.course)
+        return self._fingerprints
+
+    def changed(self, elem):
+        """
+        Drop the cached fingerprints of elem and its ancestors, after elem
+        was edited other than through self.elements.
+        """
+        if self._fingerprints is not None:
+            self._fingerprints.invalidate(elem)
+
+    def refresh_index(self, elem):
+        """
+        Index elem again after a change, if the course it is part of is
+        indexed.
+        """
+        if self._elements is not None and \
+                self._elements.root is self.course:
+            self._elements.refresh(elem)
+
+    def reindex(self):
+        """
+        Drop the element index and fingerprints, after the course was
+        edited other than through the index; they are rebuilt when next
+        used.
+        """
+        self._elements = None
+        self._fingerprints = None
+
+    def step(self, parsed=0, written=0, chapter=None):
+        """
+        Report files read or written, stopping here if the conversion was
+        cancelled.
+        """
+        if self.cancel is not None:
+            self.cancel.check()
+        self.progress.update(parsed=parsed, written=written, chapter=chapter)
+
+    def count_files(self, path):
+        """
+        Return the number of files which may be imported from path, for
+        progress reports.  Static files and hidden directories are left
+        out.
+        """
+        if self.progress.callback is None:
+            return 0
+        count = 0
+        top = True
+        for _, dnames, fnames in self.storage.walk(path):
+            dnames[:] = [
+                name for name in dnames
+                if not name.startswith('.') and
+                not (top and name in STATIC_DIRS)
+            ]
+            top = False
+            count += len(fnames)
+        return count
+
+    def track_writes(self):
+        """
+        Have self.storage count the files written, holding them back until
+        flushed if the conversion may be cancelled.  Returns the storage
+        replaced, to be put back with untrack_writes when done.
+        """
+        from xbundle.progress import TrackedStorage
+        from xbundle.storage import FileStorage
+        storage = self.storage
+        on_disk = isinstance(storage, FileStorage)
+        self.storage = TrackedStorage(
+            storage, lambda count: self.step(written=count),
+            buffered=self.cancel is not None and not on_disk,
+            staged=self.cancel is not None and on_disk)
+        return storage
+
+    def untrack_writes(self, storage):
+        """
+        Put back the storage replaced by track_writes, dropping what was
+        held back and not flushed.
+        """
+        self.storage.discard()
+        self.storage = storage
 
     def set_course(self, xml):
         """
@@ -104,17 +269,14 @@ class XBundle(object):
         self.course = xml
         # Fill up self.urlnames with existing ones if keep_urls.
         if self.keep_urls:
-            def walk(xml):
-                """
-                Recursively walk XML and gather url names.
-                """
-                url_name = xml.get('url_name', '')
+            stack = [xml]
+            while stack:
+                elem = stack.pop()
+                url_name = elem.get('url_name', '')
                 if url_name:
                     self.urlnames.append(url_name)
-                if xml.tag in DESCRIPTOR_TAGS:
-                    for child in xml:
-                        walk(child)
-            walk(xml)
+                if elem.tag in DESCRIPTOR_TAGS:
+                    stack.extend(reversed(elem))
 
     def add_policies(self, policies):
         """add a policies XML subtree to the metadata"""
@@ -137,30 +299,59 @@ class XBundle(object):
         else:
             abfile.text = filedata
 
-    def load(self, filename):
+    def load(self, filename, course_id=None, semester=None):
         """
-        Load from xbundle.xml file
+        Load from xbundle.xml file.
+
+        Given a course_id (and optionally a semester), filename is instead
+        a container of many xbundles (see xbundle.container), and only
+        that course is read from it and parsed.
         """
-        self.xml = etree.parse(filename).getroot()
+        if course_id is not None:
+            from xbundle.container import XBundleContainer
+            with XBundleContainer(filename, create=False) as container:
+                self.xml = etree.fromstring(
+                    container.read(course_id, semester))
+        else:
+            self.xml = etree.parse(filename).getroot()
         self.course = self.xml.find('course')
         self.metadata = self.xml.find('metadata')
         log.debug("course id = %s", self.course.get('course', ''))
 
-    def save(self, filename='xbundle.xml', file_handle=None):
+    def save(self, filename='xbundle.xml', file_handle=None, index=False):
         """
         Save to xbundle.xml file.
+
+        With index=True, also write a sidecar index of the byte range of
+        each chapter, sequential and metadata entry (see xbundle.index).
         """
+        if index:
+            from xbundle.index import write_index
+            data = str(self).encode('utf-8')
+            with open(filename, 'wb') as output:
+                output.write(data)
+            write_index(filename, data)
+            return
         if file_handle is None:
             with open(filename, 'w') as output:
                 output.write(str(self))
             return
         file_handle.write(str(self))
 
+    def to_json(self, stream, flat=False):
+        """
+        Write an outline of the metadata and course as JSON to a text
+        stream; with flat=True, the course is a table of elements with
+        their parent ids rather than a tree (see xbundle.outline).
+        """
+        from xbundle.outline import write_json
+        write_json(self, stream, flat=flat)
+
     def __str__(self):
+        # Serialize copies, leaving metadata and course where they are.
         xml = etree.Element('xbundle')
-        self.xml = xml
-        xml.append(self.metadata)
-        xml.append(self.course)
+        xml.append(deepcopy(self.metadata))
+        xml.append(deepcopy(self.course))
         return pp_xml(xml)
 
     def import_from_directory(self, path='./'):
@@ -170,6 +361,8 @@ class XBundle(object):
         and also normalize url_name filenames (and make them
         meaningfully human readable).
         """
+        self.progress.start('import', discovered=self.count_files(path))
+        self.import_stats = dict.fromkeys(self.import_stats, 0)
         self.metadata = etree.Element('metadata')
         self.import_metadata_from_directory(path)
         self.import_course_from_directory(path)
@@ -178,63 +371,243 @@ class XBundle(object):
         """
         Load policies.
         """
-        for pdir in sorted(glob(join(path, 'policies/*'))):
+        storage = self.storage
+        for pdir in sorted(storage.glob(join(path, 'policies/*'))):
             policies = etree.Element('policies')
             policies.set('semester', basename(pdir))
             policy_files = ["grading_policy.json", "policy.json"]
-            for filename in sorted(glob(join(pdir, '*.json'))):
+            for filename in sorted(storage.glob(join(pdir, '*.json'))):
                 if basename(filename) not in policy_files:
                     continue
                 elem = etree.SubElement(policies, basename(
                     filename).replace('_', '').replace('.json', ''))
-                with open(filename, "rb") as data:
-                    elem.text = data.read().decode('utf-8')
+                elem.text = storage.read(filename).decode('utf-8')
+                self.step(parsed=1)
             self.add_policies(policies)
 
         # Load "about" files.
-        for afn in sorted(glob(join(path, 'about/*'))):
+        for afn in sorted(storage.glob(join(path, 'about/*'))):
             try:
-                with open(afn, "rb") as data:
-                    self.add_about_file(
-                        basename(afn), data.read().decode("utf-8"))
+                self.add_about_file(
+                    basename(afn), storage.read(afn).decode("utf-8"))
+                self.step(parsed=1)
             except ValueError as err:
                 log.warning("Failed to add file %s, error=%s", afn, err)
 
+        if self.keep_static:
+            self.import_static_from_directory(path)
+
+    def import_static_from_directory(self, path):
+        """
+        List static files in the metadata, by reference to the directory
+        they were found in; their content is not read.
+        """
+        static = etree.SubElement(self.metadata, 'static')
+        static.set('root', self.storage.abspath(path))
+        for sdir in STATIC_DIRS:
+            for dname, dnames, fnames in self.storage.walk(join(path, sdir)):
+                dnames.sort()
+                for fname in sorted(fnames):
+                    filename = join(dname, fname)
+                    sfile = etree.SubElement(static, 'file')
+                    sfile.set(
+                        'filename',
+                        os.path.relpath(filename, path).replace(os.sep, '/'))
+                    sfile.set('size', str(self.storage.getsize(filename)))
+
     def import_course_from_directory(self, path):
         """
         Load course tree, removing intermediate descriptors with url_name.
         """
-        elem = etree.parse(join(path, 'course.xml')).getroot()
+        elem = self.storage.parse(join(path, 'course.xml'))
+        self.step(parsed=1)
         semester = elem.get(
             'url_name',
             '')		# the url_name of <course> is special - the semester
-        cxml = self.import_xml_removing_descriptor(path, elem)
+        cxml = self.import_tree(path, elem)
         cxml.set('semester', semester)
         self.course = cxml
-        self.fix_old_course_section()
-        self.fix_old_descriptor_name(self.course)
+        log.debug(
+            "Parsed %(parsed)d file(s); reused %(reused)d import(s), "
+            "saving %(saved)d parse(s)", self.import_stats)
+
+    def import_tree(
+            self, path, xml, resolve=True, normalize=True, memo=None):
+        """
+        Import xml and everything under it in a single pass, without
+        recursion: follow and remove intermediate descriptors (see
+        resolve_descriptor) and, with normalize, also remove <section>
+        (see fix_old_course_section) and turn name into display_name (see
+        fix_old_descriptor_name).  resolve=False skips the first.
+
+        Each descriptor is imported once: where the same one is used
+        again, a copy of what it was imported as is put in its place.
+        memo holds these imports, by descriptor, and may be shared by
+        imports from the same path; it isn't used when self.sources is
+        set, which needs the files read for each descriptor.
+
+        Returns the imported element, which takes the place of xml.
+        Raises ValueError if a descriptor includes itself.
+        """
+        if self.sources is not None:
+            memo = None
+        elif memo is None:
+            memo = {}
+        root = xml
+        sections = []
+        # (element, its parent, whether to resolve it, whether its
+        # ancestors are all descriptors, the (tag, url_name) of the
+        # descriptors resolved above it), in document order when popped;
+        # or (MEMO, key, element, files parsed before it), once everything
+        # under an element is imported.
+        stack = [(xml, None, resolve, True, ())]
+        while stack:
+            item = stack.pop()
+            if item[0] is MEMO:
+                # (MEMO, key, element, files parsed before it)
+                memo[item[1]] = (
+                    item[2], self.import_stats['parsed'] - item[3])
+                continue
+            elem, parent, resolve, chain, including = item
+            if resolve:
+                # From here on, resolve is whether to resolve its children.
+                including = self.include_descriptor(elem, including)
+                elem, resolve, after = self.resolve_memoized(
+                    path, elem, parent, chain, memo)
+                if parent is None:
+                    root = elem
+                if after is MEMO:
+                    # A copy of an earlier import, complete already.
+                    if normalize:
+                        sections.extend(elem.iter('section'))
+                    continue
+                if after is not None:
+                    stack.append(after)
+            if normalize:
+                chain = self.normalize_import(elem, chain, sections)
+            stack.extend(
+                (child, elem, resolve, chain, including)
+                for child in reversed(elem))
+        # Once everything under them is imported, in document order.
+        while sections:
+            self.flatten_section(sections.pop(0))
+        return root
+
+    @staticmethod
+    def include_descriptor(elem, including):
+        """
+        Add the (tag, url_name) of elem, if it is a descriptor, to
+        including, those of the descriptors being resolved above it.
+
+        Raises ValueError if elem is one of them: it includes itself, and
+        resolving it would never end.
+        """
+        url_name = elem.get('url_name')
+        if elem.tag not in DESCRIPTOR_TAGS or not url_name:
+            return including
+        key = (elem.tag, url_name)
+        if key in including:
+            raise ValueError(
+                "<{0} url_name=\"{1}\"> includes itself".format(*key))
+        return including + (key,)
+
+    def normalize_import(self, elem, chain, sections):
+        """
+        Normalize elem for import_tree: turn its name into display_name if
+        it and its ancestors (chain) are all descriptors, and add it to
+        sections if it is a <section>, to be flattened later.
+
+        Returns whether elem and its ancestors are all descriptors.
+        """
+        if elem.tag == 'section':
+            sections.append(elem)
+        # A <section> is a sequential to be.
+        chain = chain and (
+            elem.tag in DESCRIPTOR_TAGS or elem.tag == 'section')
+        if chain:
+            self.fix_old_name(elem)
+        return chain
+
+    def resolve_memoized(self, path, elem, parent, chain, memo):
+        """
+        Resolve elem for import_tree, or copy its earlier import from
+        memo, and put the result in its place under parent.
+
+        Returns the imported element, whether to expand its children, and
+        what import_tree is to do once they are imported: MEMO for a copy,
+        which has nothing left to import; the (MEMO, key, element, files
+        parsed before it) item recording the import in memo; or None.
+        """
+        key = None
+        if memo is not None and (
+                elem.get('url_name') or elem.get('filename')):
+            key = (chain, etree.tostring(elem, with_tail=False))
+        after = None
+        if key is not None and key in memo:
+            resolved, expand, after = self.reuse_import(memo[key]), False, MEMO
+        else:
+            parsed = self.import_stats['parsed']
+            resolved, expand = self.resolve_descriptor(path, elem)
+            if key is not None and resolved is not elem:
+                after = (MEMO, key, resolved, parsed)
+        if parent is not None and resolved is not elem:
+            # Replace descriptor with contents.
+            elem.addprevious(resolved)
+            parent.remove(elem)
+        return resolved, expand, after
+
+    def reuse_import(self, entry):
+        """
+        Return a copy of an element imported before, from the memo of
+        import_tree, counting the files it saves parsing again.
+        """
+        done, parsed = entry
+        self.import_stats['reused'] += 1
+        self.import_stats['saved'] += parsed
+        copy = deepcopy(done)
+        copy.tail = None
+        return copy
 
     def fix_old_descriptor_name(self, xml):
         """
         Turn name -> display_name on descriptor tags.
         """
-        if xml.tag in DESCRIPTOR_TAGS:
-            if 'name' in xml.attrib and not xml.get('display_name', ''):
-                xml.set('display_name', xml.get('name'))
-                xml.attrib.pop('name')
-            for child in xml:
-                self.fix_old_descriptor_name(child)
+        stack = [xml]
+        while stack:
+            elem = stack.pop()
+            if elem.tag in DESCRIPTOR_TAGS:
+                self.fix_old_name(elem)
+                stack.extend(elem)
 
-    def fix_old_course_section(self):
+    @staticmethod
+    def fix_old_name(xml):
         """
-        Remove <section>
+        Turn name -> display_name on one descriptor tag.
         """
-        for sect in self.course.findall('.//section'):
-            for seq in sect.findall('.//sequential'):
-                for k in seq:
-                    seq.addprevious(k)
-                sect.remove(seq)		# remove sequential from inside section
-            sect.tag = 'sequential'
+        if 'name' in xml.attrib and not xml.get('display_name', ''):
+            xml.set('display_name', xml.get('name'))
+            xml.attrib.pop('name')
+
+    def fix_old_course_section(self, xml=None):
+        """
+        Remove <section>, from xml or by default from the whole course.
+        """
+        if xml is None:
+            xml = self.course
+        for sect in list(xml.iter('section')):
+            self.flatten_section(sect)
+
+    @staticmethod
+    def flatten_section(sect):
+        """
+        Turn a <section> into a <sequential>, putting the content of the
+        sequentials it holds in their place.
+        """
+        for seq in sect.findall('sequential'):
+            for k in seq:
+                seq.addprevious(k)
+            sect.remove(seq)		# remove sequential from inside section
+        sect.tag = 'sequential'
 
     def is_not_random_urlname(self, url_name):
         """
@@ -265,15 +638,27 @@ class XBundle(object):
                 if xml.get(key, None) is None:
                     xml.set(key, str(val))
 
-    # pylint: disable=too-many-branches, too-many-statements
     def import_xml_removing_descriptor(self, path, xml):
         """
-        Load XML file, recursively following and removing intermediate
-        descriptors with url_name.
+        Load XML file, following and removing intermediate descriptors
+        with url_name (see import_tree).
 
         If element is a DescriptorTag element, and display_name is missing,
         then use its url_name, if that is available.
         """
+        return self.import_tree(path, xml, normalize=False)
+
+    # pylint: disable=too-many-branches, too-many-statements
+    def resolve_descriptor(self, path, xml):
+        """
+        Replace xml by the content of the files it refers to, if any,
+        without following references in its children.
+
+        Returns the resulting element, and whether its children should be
+        imported in turn (they are not for elements skipped as hidden).
+        """
+        pointer = xml
+        files_read = []
         url_name = xml.get('url_name', '')
         if xml.tag in DESCRIPTOR_TAGS and \
                 'url_name' in xml.attrib and url_name:
@@ -284,10 +669,15 @@ class XBundle(object):
                 ") is in xml.attrib;")
             unfn = url_name.replace(':', '/')
             filename = join(path, xml.tag, (unfn + '.xml'))
-            if exists(filename):
+            if self.storage.exists(filename):
                 try:
                     log.debug("and filename " + filename + " exists; parsing.")
-                    dxml = etree.parse(filename).getroot()
+                    dxml = None
+                    if self.passthrough and xml.tag == 'problem':
+                        dxml = self.read_raw(path, filename, xml.tag)
+                    if dxml is None:
+                        dxml = self.storage.parse(filename)
+                    files_read.append(filename)
                     log.debug("dxml is:  " + str(dxml))
                 except Exception as err:
                     log.error("Error parsing xml for %s", filename)
@@ -350,13 +740,19 @@ class XBundle(object):
                     filename += '.xml'
                 options = {}
 
-            if not exists(join(path, xml.tag, filename)):
+            if not self.storage.exists(join(path, xml.tag, filename)):
                 if '-' in filename:
                     filename = '{0}/{1}'.format(
                         filename.split('-', 1)[0], filename)
             try:
-                dxml = etree.parse(
-                    join(path, xml.tag, filename), **options).getroot()
+                dxml = None
+                if self.passthrough:
+                    dxml = self.read_raw(
+                        path, join(path, xml.tag, filename), xml.tag)
+                if dxml is None:
+                    dxml = self.storage.parse(
+                        join(path, xml.tag, filename), **options)
+                files_read.append(join(path, xml.tag, filename))
             except ValueError as err:
                 msg = "Error!  Can't load and parse HTML file %s, error: %s"
                 log.error(msg, join(path, xml.tag, filename), err)
@@ -364,34 +760,126 @@ class XBundle(object):
             if dxml is not None:
                 if 'xmlns' in dxml.attrib:
                     dxml.attrib.pop('xmlns')
+                raw = dxml.get('xbundle_raw')
                 dxml.attrib.update(xml.attrib)
                 dxml.attrib.pop('filename')
+                if raw:
+                    dxml.set('xbundle_raw', raw)
                 if dxml.tag in DESCRIPTOR_TAGS and dxml.get(
                         'display_name') is None:
                     dxml.set('display_name', url_name)
                 xml = dxml
 
+        if files_read:
+            self.import_stats['parsed'] += len(files_read)
+            self.step(
+                parsed=len(files_read),
+                chapter=xml.get('display_name') if xml.tag == 'chapter'
+                else None)
+
+        if self.sources is not None:
+            for filename in files_read:
+                self.sources.setdefault(os.path.normpath(filename), []).append(
+                    (pointer, xml))
+
         if self.skip_hidden:
             self.update_metadata_from_policy(xml)
             if xml.get('hide_from_toc', '') == 'true':
                 log.debug(
                     "[xbundle] Skipping %s (%s), it has hide_from_toc=true",
                     xml.tag, xml.get('display_name', '<noname>'))
-                return xml
-
-        for child in xml:
-            # Calls self recursively.
-            dchild = self.import_xml_removing_descriptor(path, child)
-            if not dchild == child:
-                child.addprevious(dchild)  # replace descriptor with contents
-                xml.remove(child)
+                return xml, False
+        return xml, True
+
+    def read_raw(self, path, filename, tag):
+        """
+        Return a <tag> element holding the content of filename verbatim,
+        for passthrough mode, or None if it can't be held as XML text.
+
+        Its xbundle_raw attribute is the file name relative to path.  A
+        problem also gets the attributes of the root element of its file,
+        which is parsed no further.
+        """
+        body = self.storage.read(filename)
+        xml = etree.Element(tag)
+        try:
+            text = body.decode('utf-8')
+            xml.text = text if ']]>' in text else etree.CDATA(text)
+        except ValueError as err:  # also raised for undecodable bytes
+            log.warning(
+                "Can't pass %s through, parsing it instead: %s", filename, err)
+            return None
+        if tag == 'problem':
+            from xbundle.storage import root_attributes
+            for key, val in root_attributes(body).items():
+                if not key.startswith('xmlns') and ':' not in key:
+                    xml.set(key, val)
+        xml.set(
+            'xbundle_raw',
+            os.path.relpath(filename, path).replace(os.sep, '/'))
         return xml
 
-    def export_to_directory(self, exdir='./', xml_only=False, newfmt=True):
+    def export_to_directory(
+            self, exdir='./', xml_only=False, newfmt=True, workers=None):
         """
         Export xbundle to edX xml directory
         First insert all the intermediate descriptors needed.
         Do about and XML separately.
+
+        This works on a copy of the course, and on a copy of the url_names
+        given out so far, leaving both as they were: a bundle can be
+        exported and saved any number of times, with the same result.
+
+        With workers=N, once every url_name has been given out, the
+        chapters are written by a pool of N processes (see xbundle.shards),
+        with the same result; the export is serial if they can't be.
+        """
+        course, urlnames = self.course, self.urlnames
+        self.course, self.urlnames = deepcopy(course), list(urlnames)
+        storage = self.track_writes()
+        try:
+            coursex = self.make_course_pointer(newfmt)
+            semester = coursex.get('url_name')
+
+            self.export = self.make_descriptor(self.course, semester)
+            self.export.append(self.course)
+            self.add_descriptors(self.course)
+            self.progress.start(
+                'export', total=self.count_exported(xml_only))
+
+            self.path = self.storage.stage(
+                join(exdir, self.course.get('course', '')))
+            if not xml_only:
+                self.export_meta_to_directory()
+            if workers and workers > 1:
+                from xbundle.shards import export_shards
+                export_shards(self, workers)
+            self.export_xml_to_directory(self.export[0], dowrite=True)
+
+            # Write out top-level course.xml.
+            self.write_xml_file(join(self.path, 'course.xml'), coursex)
+            self.storage.flush()
+        finally:
+            self.course, self.urlnames = course, urlnames
+            self.untrack_writes(storage)
+
+    def count_exported(self, xml_only=False):
+        """
+        Return the number of files export_to_directory is to write, for
+        progress reports.
+        """
+        # The course file and course.xml, besides one per descriptor.
+        count = len(self.export.findall('.//descriptor')) + 2
+        if not xml_only:
+            count += len(self.metadata.findall('policies/*'))
+            count += len(self.metadata.findall('about/file'))
+            count += len(self.metadata.findall('static/file'))
+        return count
+
+    def make_course_pointer(self, newfmt=True):
+        """
+        Return the <course> element of the top-level course.xml, which
+        points to the course by its semester.
         """
         coursex = etree.Element('course')
         semester = self.course.get('semester', '')
@@ -408,34 +896,228 @@ class XBundle(object):
                 self.course.get(
                     'number',
                     ''))  # backwards compatibility
+        return coursex
 
-        self.export = self.make_descriptor(self.course, semester)
-        self.export.append(self.course)
-        self.add_descriptors(self.course)
+    def normalize_directory(
+            self, path, exdir='./', xml_only=False, newfmt=True):
+        """
+        Import the edX directory at path and export it to exdir, one child
+        of the course (normally a chapter) at a time: each is imported,
+        written out and dropped before the next one is read.
 
-        self.path = mkdir(join(exdir, self.course.get('course', '')))
+        This writes the same files as import_from_directory followed by
+        export_to_directory, without ever holding the whole course in
+        memory or serializing it.
+        """
+        self.progress.start('normalize', discovered=self.count_files(path))
+        self.import_stats = dict.fromkeys(self.import_stats, 0)
+        storage = self.track_writes()
+        try:
+            self.normalize_into(path, exdir, xml_only, newfmt)
+        finally:
+            self.untrack_writes(storage)
+
+    def normalize_into(self, path, exdir, xml_only, newfmt):
+        """
+        Do the work of normalize_directory.
+        """
+        self.metadata = etree.Element('metadata')
+        self.import_metadata_from_directory(path)
+        children, expand = self.open_course(path)[1:]
+        coursex = self.start_export(exdir, xml_only, newfmt)
+        for idx, child in enumerate(children):
+            children[idx] = self.export_child(
+                self.import_tree(path, child, resolve=expand))
+        self.finish_export(coursex, children)
+
+    def start_export(self, exdir, xml_only, newfmt):
+        """
+        Start exporting self.course, without its children, which are
+        exported one at a time by export_child; write the metadata.
+
+        Returns the <course> element of the top-level course.xml.
+        """
+        coursex = self.make_course_pointer(newfmt)
+        self.export = self.make_descriptor(
+            self.course, coursex.get('url_name'))
+        self.export.append(self.course)
+        self.path = self.storage.stage(
+            join(exdir, self.course.get('course', '')))
         if not xml_only:
             self.export_meta_to_directory()
-        self.export_xml_to_directory(self.export[0], dowrite=True)
+        return coursex
+
+    def export_child(self, child):
+        """
+        Write the files of one child of the course being exported.
+
+        Returns what is left of it for the course file: a pointer to the
+        files just written, or the child itself if it is not a descriptor.
+        """
+        course = self.export[0]
+        course.append(child)
+        self.add_descriptors(course)
+        self.export_xml_to_directory(course)
+        child = course[0]
+        course.remove(child)
+        return child
 
-        # Write out top-level course.xml.
+    def finish_export(self, coursex, children):
+        """
+        Write the course file, with what export_child left of its
+        children, and the top-level course.xml.
+        """
+        course = self.export[0]
+        for child in children:
+            course.append(child)
+        self.export_xml_to_directory(course, dowrite=True)
         self.write_xml_file(join(self.path, 'course.xml'), coursex)
+        self.storage.flush()
+
+    def stream_to_directory(
+            self, filename, exdir='./', xml_only=False, newfmt=True):
+        """
+        Export the xbundle file filename to an edX directory, one child of
+        the course (normally a chapter) at a time: the file is read with
+        iterparse, and each child is written out and dropped as soon as
+        it has been read, before the rest of the file is.
+
+        This writes the same files as load followed by export_to_directory.
+        Afterwards the bundle holds the metadata and the course element,
+        with pointers in place of the children written out.
+        """
+        self.progress.start('export')
+        storage = self.track_writes()
+        try:
+            self.stream_out(filename, exdir, xml_only, newfmt)
+        finally:
+            self.untrack_writes(storage)
+
+    def stream_out(self, filename, exdir, xml_only, newfmt):
+        """
+        Do the work of stream_to_directory.
+        """
+        self.metadata = None
+        coursex, children = None, []
+        for event, elem in etree.iterparse(
+                filename, events=('start', 'end', 'comment', 'pi')):
+            parent = elem.getparent()
+            if parent is None or event == 'start' and elem.tag != 'course':
+                continue
+            if parent.tag == 'course' and \
+                    parent.getparent().getparent() is None:
+                # A child of the course, read to its end.
+                parent.remove(elem)
+                children.append(self.export_child(elem))
+            elif parent.getparent() is not None:
+                continue
+            elif event == 'start':
+                self.course = etree.Element(elem.tag, elem.attrib)
+                coursex = self.start_export(exdir, True, newfmt)
+                if self.metadata is not None and not xml_only:
+                    self.export_meta_to_directory()
+            elif elem.tag == 'course':
+                self.course.text = elem.text
+            elif elem.tag == 'metadata':
+                self.metadata = elem
+                # The metadata may also come after the course.
+                if coursex is not None and not xml_only:
+                    self.export_meta_to_directory()
+
+        if coursex is None:
+            raise ValueError("No course found in {0}".format(filename))
+        if self.metadata is None:
+            self.metadata = etree.Element('metadata')
+            if not xml_only:
+                self.export_meta_to_directory()
+        self.finish_export(coursex, children)
+
+    def open_course(self, path):
+        """
+        Read the course element of the edX directory at path, for its
+        children to be imported one at a time.
+
+        Returns the course, without its children, the children, still to
+        be imported, and whether they are to be expanded.
+        """
+        course = self.storage.parse(join(path, 'course.xml'))
+        self.step(parsed=1)
+        semester = course.get('url_name', '')
+        course, expand = self.resolve_descriptor(path, course)
+        course.set('semester', semester)
+        children = list(course)
+        for child in children:
+            course.remove(child)
+        self.course = course
+        self.fix_old_descriptor_name(course)
+        return course, children, expand
+
+    def stream_from_directory(
+            self, path, filename='xbundle.xml', file_handle=None):
+        """
+        Convert the edX directory at path to an xbundle file, one child of
+        the course (normally a chapter) at a time: each is imported,
+        written out and dropped before the next one is read.
+
+        The file has the same content as import_from_directory followed by
+        save would write, indented by lxml rather than xmllint.  Its
+        metadata is written before the course is read, and the file is
+        removed again if the conversion fails.  Afterwards the bundle
+        holds the metadata and the course element, without children.
+        """
+        self.progress.start('import', discovered=self.count_files(path))
+        self.import_stats = dict.fromkeys(self.import_stats, 0)
+        self.metadata = etree.Element('metadata')
+        if file_handle is not None:
+            self.stream_into(path, file_handle)
+            return
+        try:
+            self.stream_into(path, filename)
+        except BaseException:
+            if exists(filename):
+                os.remove(filename)
+            raise
+
+    def stream_into(self, path, output):
+        """
+        Do the work of stream_from_directory.
+        """
+        with etree.xmlfile(output, encoding='utf-8') as xfile:
+            with xfile.element('xbundle'):
+                self.import_metadata_from_directory(path)
+                xfile.write('\n')
+                xfile.write(self.metadata, pretty_print=True)
+                xfile.flush()
+                course, children, expand = self.open_course(path)
+                with xfile.element(course.tag, course.attrib):
+                    xfile.write('\n')
+                    while children:
+                        # Popped, so that nothing holds on to the chapter.
+                        child = self.import_tree(
+                            path, children.pop(0), resolve=expand)
+                        child.tail = None
+                        xfile.write(child, pretty_print=True)
+                        xfile.flush()
+                xfile.write('\n')
+        log.debug(
+            "Parsed %(parsed)d file(s); reused %(reused)d import(s), "
+            "saving %(saved)d parse(s)", self.import_stats)
 
     def export_meta_to_directory(self):
         """
         Write out metadata (about and policy) to directory.
         """
-        pdir = mkdir(join(self.path, 'policies'))
+        storage = self.storage
+        pdir = storage.mkdir(join(self.path, 'policies'))
         for pxml in self.metadata.findall('policies'):
             semester = pxml.get('semester')
-            path = mkdir(join(pdir, semester))
+            path = storage.mkdir(join(pdir, semester))
             for k in pxml:
                 filename = POLICY_TAG_MAP.get(k.tag, k.tag) + '.json'
                 # Write out content to policy directory file.
-                with open(join(path, filename), 'wb') as output:
-                    output.write(k.text.encode('utf-8'))
+                storage.write(join(path, filename), k.text.encode('utf-8'))
 
-        adir = mkdir(join(self.path, 'about'))
+        adir = storage.mkdir(join(self.path, 'about'))
         for fxml in self.metadata.findall('about/file'):
             filename = fxml.get('filename')
             try:
@@ -446,24 +1128,78 @@ class XBundle(object):
                         to_write = fxml.text.encode("utf-8")
                     except UnicodeEncodeError:
                         to_write = fxml.text
-                    with open(join(adir, filename), 'wb') as output:
-                        output.write(to_write)
+                    storage.write(join(adir, filename), to_write)
             except IOError as err:
                 log.error(
                     'failed to write about file %s, error %s',
                     join(adir, filename), err
                 )
+        if self.keep_static:
+            self.export_static_to_directory()
+
+    def export_static_to_directory(self):
+        """
+        Copy the static files listed in the metadata to directory.
+
+        Files which are not within their root, or would not be within the
+        directory, are left out: the list may come from any xbundle.
+        """
+        for sxml in self.metadata.findall('static'):
+            root = sxml.get('root', '')
+            for fxml in sxml.findall('file'):
+                filename = fxml.get('filename', '')
+                src = join(root, *filename.split('/'))
+                dst = join(self.path, *filename.split('/'))
+                if not (is_within(src, root) and is_within(dst, self.path)):
+                    log.error(
+                        'static file %s is outside of %s, not copied',
+                        filename, root)
+                    continue
+                try:
+                    self.storage.mkdir(os.path.dirname(dst))
+                    self.storage.copy_in(src, dst)
+                except (IOError, OSError) as err:
+                    log.error(
+                        'failed to write static file %s, error %s', dst, err)
 
     def write_xml_file(self, filename, xml, force_overwrite=False):
         """
-        Write an XML file to disk.
+        Write an XML file to storage.
         """
         if (not force_overwrite) and (
-                xml.tag in self.no_overwrite) and exists(filename):
+                xml.tag in self.no_overwrite) and \
+                self.storage.exists(filename):
             log.debug("Not overwriting %s for %s", filename, xml)
             filename = filename + '.new'
-        with open(filename, 'w') as output:
-            output.write(pp_xml(xml))
+        self.storage.write(filename, pp_xml(xml).encode('utf-8'))
+
+    def write_raw(self, edir, url_name, xml):
+        """
+        Write out an element imported in passthrough mode: a problem as
+        its file, verbatim but for the attributes of its root element,
+        which are those of the element (attributes may have come from the
+        descriptor pointing to it, or have been edited since), and html as
+        its body, verbatim, with a descriptor pointing to it.
+        """
+        data = (xml.text or '').encode('utf-8')
+        if xml.tag == 'html':
+            pointer = etree.Element('html')
+            for key, val in xml.attrib.items():
+                if key != 'xbundle_raw':
+                    pointer.set(key, val)
+            pointer.set('filename', url_name)
+            self.write_xml_file(join(edir, url_name + '.xml'), pointer)
+            filename = join(edir, url_name + '.html')
+        else:
+            from xbundle.storage import set_root_attributes
+            filename = join(edir, url_name + '.xml')
+            data = set_root_attributes(data, dict(
+                (key, val) for key, val in xml.attrib.items()
+                if key != 'xbundle_raw'))
+        if xml.tag in self.no_overwrite and self.storage.exists(filename):
+            log.debug("Not overwriting %s for %s", filename, xml)
+            filename = filename + '.new'
+        self.storage.write(filename, data)
 
     def export_xml_to_directory(self, elem, dowrite=False):
         """
@@ -480,11 +1216,16 @@ class XBundle(object):
             elem.attrib.pop('url_name')
             if 'url_name_orig' in elem.attrib and self.keep_urls:
                 elem.attrib.pop('url_name_orig')
-            edir = mkdir(join(self.path, element.tag))
-            self.write_xml_file(join(edir, url_name + '.xml'), element)
+            edir = self.storage.mkdir(join(self.path, element.tag))
+            if element.get('xbundle_raw'):
+                self.write_raw(edir, url_name, element)
+            else:
+                self.write_xml_file(join(edir, url_name + '.xml'), element)
             return url_name
 
         if elem.tag == 'descriptor':
+            if elem.get('tag') == 'chapter':
+                self.progress.chapter = elem[0].get('display_name')
             # Recurse on children, depth first.
             self.export_xml_to_directory(elem[0], dowrite=True)
             # Change descriptor to point to new elem.
@@ -534,18 +1275,30 @@ class XBundle(object):
                     'NFKD', val).encode('ascii', 'ignore')
                 display_name = display_name.replace(char_bytes, val_bytes)
 
-        if name and display_name in self.urlnames and parent:
+        if self.stable_urls:
+            from xbundle.digest import stable_digest
+            display_name += "_{0}".format(
+                stable_digest(xml)[:10]).encode('ascii')
+        elif name and display_name in self.urlnames and parent:
             display_name = "{0}_{1}".format(display_name, parent)
         try:
             # Sometimes it's bytes, sometimes a string...
             display_name = display_name.decode("utf-8")
         except AttributeError:
             pass
-        while display_name in self.urlnames:
-            key = re.match('(.+?)([0-9]*)$', display_name)
-            display_name, idx = key.groups()
-            idx = int(idx or 0)
-            display_name += str(idx + 1)
+        if self.stable_urls:
+            # Identical siblings share a digest: count them after a
+            # separator, rather than changing the digest's own digits.
+            base, idx = display_name, 0
+            while display_name in self.urlnames:
+                idx += 1
+                display_name = "{0}-{1}".format(base, idx)
+        else:
+            while display_name in self.urlnames:
+                key = re.match('(.+?)([0-9]*)$', display_name)
+                display_name, idx = key.groups()
+                idx = int(idx or 0)
+                display_name += str(idx + 1)
         self.urlnames.append(display_name)
         return display_name
 
@@ -566,6 +1319,7 @@ class XBundle(object):
             url_name = self.make_urlname(xml, parent=parent)
         descriptor.set('url_name', url_name)
         xml.set('url_name', url_name)
+        self.refresh_index(xml)
         return descriptor
 
     def add_descriptors(self, xml, parent=''):
@@ -582,8 +1336,9 @@ class XBundle(object):
                     # Move child into vertical.
                     vert = etree.Element('vertical')
                     elem.addprevious(vert)
-                    vert.set('url_name', self.make_urlname(vert))
                     vert.append(elem)
+                    vert.set('url_name', self.make_urlname(vert))
+                    self.refresh_index(vert)
                     # Continue processing on the vertical.
                     elem = vert
             if elem.tag in DESCRIPTOR_TAGS:
@@ -597,6 +1352,43 @@ class XBundle(object):
                 self.add_descriptors(elem, desc.get('url_name', ''))
 
 
+def convert(input_path, output_path, stream=False, workers=None, **options):
+    """
+    Convert an xbundle file to an edX directory, or an edX directory to
+    an xbundle file, depending on which of the two is the .xml file.
+
+    With stream=True, the course is converted one chapter at a time (see
+    stream_to_directory and stream_from_directory); workers is passed on
+    to export_to_directory otherwise.  options are passed on to XBundle.
+    Returns the XBundle used.
+    """
+    bundle = XBundle(**options)
+    if input_path.endswith('.xml') and stream:
+        bundle.stream_to_directory(input_path, output_path)
+    elif input_path.endswith('.xml'):
+        bundle.load(input_path)
+        bundle.export_to_directory(output_path, workers=workers)
+    elif output_path.endswith('.xml') and stream:
+        bundle.stream_from_directory(input_path, output_path)
+    elif output_path.endswith('.xml'):
+        bundle.import_from_directory(input_path)
+        bundle.save(output_path)
+    else:
+        raise ValueError(
+            "Either the input or the output must be an xbundle .xml file")
+    return bundle
+
+
+def normalize_directory(path, exdir, **options):
+    """
+    Sanitize the edX directory at path into exdir, one chapter at a time;
+    see XBundle.normalize_directory.  options are passed on to XBundle.
+    """
+    bundle = XBundle(**options)
+    bundle.normalize_directory(path, exdir)
+    return bundle
+
+
 def mkdir(path):
     """
     Make a directory only if it's missing.
@@ -606,18 +1398,29 @@ def mkdir(path):
     return path
 
 
+def is_within(path, directory):
+    """
+    Check whether path, once links and ".." are resolved, is below
+    directory.
+    """
+    directory = os.path.realpath(directory)
+    return os.path.realpath(path).startswith(directory + os.sep)
+
+
 def pp_xml(xml):
     """
     Pretty-print XML.
     """
+    import subprocess
     try:
+        # close_fds, so that xmllint processes started by other threads
+        # don't hold this one's stdin open; communicate, so that a large
+        # output can't fill the pipe while the input is still being sent.
         proc = subprocess.Popen(
             ['xmllint', '--format', '-'],
-            stdin=subprocess.PIPE, stdout=subprocess.PIPE
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, close_fds=True,
         )
-        proc.stdin.write(etree.tostring(xml))
-        proc.stdin.close()
-        xml = proc.stdout.read()
+        xml = proc.communicate(etree.tostring(xml))[0]
     except OSError as ex:
         log.warning("xmllint not found on system: %s", ex)
         xml = etree.tostring(xml, pretty_print=True)
@@ -0,0 +1,179 @@
+"""
+Resumable conversion of many courses at once.
+
+A batch converts every course in a directory, keeping a journal of one
+JSON record per course converted: its input, a hash of the input's
+content, the output, the options, the status, how long it took and the
+error, if any.  Records are appended and flushed as each course finishes,
+so the journal survives the batch being killed.  Run again, the batch
+skips the courses whose last record shows them converted, with the same
+content, output and options, to an output still in place.
+
+A course that fails is recorded as such and the batch goes on with the
+next one.  Outputs are written under a temporary name and renamed into
+place, so an interrupted conversion never leaves a partial output where a
+complete one is expected.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import json
+import time
+import logging
+from os.path import join, exists, isdir, basename, dirname
+from shutil import rmtree
+
+from xbundle.conversion import ARCHIVE_SUFFIXES, input_hash, run_conversion
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+JOURNAL_NAME = 'journal.jsonl'
+
+
+def find_jobs(input_dir, output_dir):
+    """
+    Return the (input, output) pairs of a batch: each course directory
+    (or archive of one) in input_dir is converted to an xbundle in
+    output_dir, and each xbundle file to a course directory.
+    """
+    jobs = []
+    for name in sorted(os.listdir(input_dir)):
+        path = join(input_dir, name)
+        if isdir(path):
+            if exists(join(path, 'course.xml')):
+                jobs.append((path, join(output_dir, name + '.xml')))
+        elif name.endswith('.xml'):
+            jobs.append((path, join(output_dir, name[:-len('.xml')])))
+        elif name.endswith(ARCHIVE_SUFFIXES):
+            stem = name
+            for suffix in ARCHIVE_SUFFIXES:
+                if stem.endswith(suffix):
+                    stem = stem[:-len(suffix)]
+                    break
+            jobs.append((path, join(output_dir, stem + '.xml')))
+    return jobs
+
+
+class Journal(object):
+    """
+    Append-only record of the courses converted by a batch.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        # The last record of each input.
+        self.latest = {}
+        if exists(filename):
+            with open(filename) as journal:
+                for line in journal:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # The last line may be cut short by a crash.
+                        log.warning("Skipping bad journal line: %r", line)
+                        continue
+                    self.latest[record['input']] = record
+
+    def is_done(self, input_path, output_path, digest, options):
+        """
+        Check whether the journal shows input_path converted to
+        output_path with the given content and options, and the output is
+        still there.
+        """
+        record = self.latest.get(input_path)
+        return (
+            record is not None and record['status'] == 'ok' and
+            record['hash'] == digest and record['output'] == output_path and
+            record['options'] == options and exists(output_path)
+        )
+
+    def append(self, record):
+        """
+        Add a record, making sure it is on disk before going on.
+        """
+        with open(self.filename, 'a') as journal:
+            journal.write(json.dumps(record, sort_keys=True) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+        self.latest[record['input']] = record
+
+
+def replace_output(tmp, output_path):
+    """
+    Move a finished output into place, replacing any previous one.
+    """
+    if isdir(output_path):
+        rmtree(output_path)
+    os.rename(tmp, output_path)
+
+
+def remove_output(path):
+    """
+    Remove an output file or directory, if there is one.
+    """
+    if isdir(path):
+        rmtree(path)
+    elif exists(path):
+        os.remove(path)
+
+
+def run_batch(jobs, journal_filename, **options):
+    """
+    Convert each (input, output) pair of jobs not already converted
+    according to the journal, recording every conversion in it.
+
+    options are passed on to XBundle.  Returns a list with, for each job,
+    its journal record, or a record with status "skipped".
+    """
+    journal = Journal(journal_filename)
+    # Compare options as they come back from the journal.
+    options = json.loads(json.dumps(options))
+    results = []
+    for input_path, output_path in jobs:
+        try:
+            digest = input_hash(input_path)
+        except (IOError, OSError) as err:
+            digest = None
+            log.error("Can't read %s: %s", input_path, err)
+        if digest and journal.is_done(
+                input_path, output_path, digest, options):
+            log.info("%s is up to date", output_path)
+            results.append({
+                'input': input_path, 'output': output_path,
+                'status': 'skipped',
+            })
+            continue
+
+        log.info("Converting %s to %s", input_path, output_path)
+        # The temporary output keeps the .xml suffix, if any, which tells
+        # convert() which way to go.
+        tmp = join(dirname(output_path), '.tmp-' + basename(output_path))
+        remove_output(tmp)
+        if digest is None:
+            result = {
+                'started': time.time(), 'seconds': 0,
+                'error': "Can't read {0}".format(input_path),
+            }
+        else:
+            if dirname(tmp) and not isdir(dirname(tmp)):
+                os.makedirs(dirname(tmp))
+            result = run_conversion(input_path, tmp, options)
+        if result['error']:
+            log.error("Converting %s failed: %s", input_path, result['error'])
+            remove_output(tmp)
+        else:
+            replace_output(tmp, output_path)
+        record = {
+            'input': input_path,
+            'output': output_path,
+            'hash': digest,
+            'options': options,
+            'status': 'error' if result['error'] else 'ok',
+            'started': result['started'],
+            'seconds': result['seconds'],
+            'error': result['error'],
+        }
+        journal.append(record)
+        results.append(record)
+    return results
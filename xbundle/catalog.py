@@ -0,0 +1,279 @@
+"""
+SQLite catalog of many courses, for queries across all of them.
+
+A catalog holds, for each course ingested (from an OLX directory or an
+xbundle file):
+
+    courses: id, source (the absolute path ingested), hash (of its
+             content), course, org, semester
+    elements: course_id, id (position in document order), parent (id),
+              tag, url_name (or url_name_orig), display_name
+    attributes: course_id, element_id, name, value
+    policies: course_id, semester, name (policy or grading_policy),
+              content
+    about: course_id, filename, content
+
+Elements include everything in the course, down to the response types
+of problems, and are indexed by tag, url_name and display_name, and
+attributes by name and value, so that e.g. finding every course with an
+<optionresponse> doesn't scan the catalog:
+
+    catalog = Catalog('library.db')
+    catalog.ingest_all(['/courses'])
+    catalog.courses_with('optionresponse')
+    catalog.find('video', semester='2014_Fall')
+
+Ingesting a source again only reads it if its content changed since.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import time
+import logging
+import sqlite3
+
+import six
+
+from xbundle import XBundle, POLICY_TAG_MAP
+from xbundle.conversion import input_hash
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS courses (
+    id INTEGER PRIMARY KEY,
+    source TEXT UNIQUE NOT NULL,
+    hash TEXT NOT NULL,
+    course TEXT,
+    org TEXT,
+    semester TEXT,
+    ingested REAL
+);
+CREATE TABLE IF NOT EXISTS elements (
+    course_id INTEGER NOT NULL REFERENCES courses (id) ON DELETE CASCADE,
+    id INTEGER NOT NULL,
+    parent INTEGER,
+    tag TEXT NOT NULL,
+    url_name TEXT,
+    display_name TEXT,
+    PRIMARY KEY (course_id, id)
+);
+CREATE INDEX IF NOT EXISTS elements_tag ON elements (tag);
+CREATE INDEX IF NOT EXISTS elements_url_name ON elements (url_name);
+CREATE INDEX IF NOT EXISTS elements_display_name
+    ON elements (display_name);
+CREATE TABLE IF NOT EXISTS attributes (
+    course_id INTEGER NOT NULL REFERENCES courses (id) ON DELETE CASCADE,
+    element_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS attributes_name_value
+    ON attributes (name, value);
+CREATE INDEX IF NOT EXISTS attributes_element
+    ON attributes (course_id, element_id);
+CREATE TABLE IF NOT EXISTS policies (
+    course_id INTEGER NOT NULL REFERENCES courses (id) ON DELETE CASCADE,
+    semester TEXT,
+    name TEXT NOT NULL,
+    content TEXT
+);
+CREATE INDEX IF NOT EXISTS policies_course ON policies (course_id);
+CREATE TABLE IF NOT EXISTS about (
+    course_id INTEGER NOT NULL REFERENCES courses (id) ON DELETE CASCADE,
+    filename TEXT NOT NULL,
+    content TEXT
+);
+CREATE INDEX IF NOT EXISTS about_course ON about (course_id);
+"""
+
+
+def find_sources(path):
+    """
+    Return the courses under path: path itself if it is an OLX directory
+    or an xbundle file, else the OLX directories and xbundle files in it.
+    """
+    if path.endswith('.xml') or \
+            os.path.exists(os.path.join(path, 'course.xml')):
+        return [path]
+    sources = []
+    for name in sorted(os.listdir(path)):
+        source = os.path.join(path, name)
+        if name.endswith('.xml') or \
+                os.path.exists(os.path.join(source, 'course.xml')):
+            sources.append(source)
+    return sources
+
+
+class Catalog(object):
+    """
+    A catalog database.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.db = sqlite3.connect(filename)  # pylint: disable=invalid-name
+        self.db.execute('PRAGMA foreign_keys = ON')
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Close the database.
+        """
+        self.db.close()
+
+    def ingest(self, source, **options):
+        """
+        Add the course at source, an OLX directory or an xbundle file, to
+        the catalog, replacing what it had from source before; options are
+        passed on to XBundle.  Does nothing if source is unchanged since it
+        was last ingested.
+
+        Returns whether the course was (re)ingested.
+        """
+        source = os.path.abspath(source)
+        digest = input_hash(source)
+        row = self.db.execute(
+            'SELECT hash FROM courses WHERE source = ?', (source,)).fetchone()
+        if row is not None and row[0] == digest:
+            log.debug("%s is up to date", source)
+            return False
+
+        options.setdefault('keep_urls', True)
+        bundle = XBundle(**options)
+        if source.endswith('.xml'):
+            bundle.load(source)
+        else:
+            bundle.import_from_directory(source)
+
+        log.info("Ingesting %s", source)
+        with self.db:
+            self.db.execute('DELETE FROM courses WHERE source = ?', (source,))
+            course = bundle.course
+            course_id = self.db.execute(
+                'INSERT INTO courses '
+                '(source, hash, course, org, semester, ingested) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (source, digest, course.get('course'), course.get('org'),
+                 course.get('semester'), time.time())
+            ).lastrowid
+            self.insert_elements(course_id, course)
+            self.insert_metadata(course_id, bundle.metadata)
+        return True
+
+    def insert_elements(self, course_id, course):
+        """
+        Add the elements of a course, and their attributes.
+        """
+        ids = {}
+        elements = []
+        attributes = []
+        for elem in course.iter():
+            if not isinstance(elem.tag, six.string_types):
+                continue
+            elem_id = len(ids)
+            ids[elem] = elem_id
+            elements.append((
+                course_id, elem_id, ids.get(elem.getparent()), elem.tag,
+                elem.get('url_name') or elem.get('url_name_orig'),
+                elem.get('display_name'),
+            ))
+            attributes.extend(
+                (course_id, elem_id, key, val)
+                for key, val in elem.attrib.items())
+        self.db.executemany(
+            'INSERT INTO elements VALUES (?, ?, ?, ?, ?, ?)', elements)
+        self.db.executemany(
+            'INSERT INTO attributes VALUES (?, ?, ?, ?)', attributes)
+
+    def insert_metadata(self, course_id, metadata):
+        """
+        Add the policies and about files of a course.
+        """
+        self.db.executemany(
+            'INSERT INTO policies VALUES (?, ?, ?, ?)', [
+                (course_id, pxml.get('semester'),
+                 POLICY_TAG_MAP.get(elem.tag, elem.tag), elem.text)
+                for pxml in metadata.findall('policies') for elem in pxml
+            ])
+        self.db.executemany(
+            'INSERT INTO about VALUES (?, ?, ?)', [
+                (course_id, fxml.get('filename'), fxml.text)
+                for fxml in metadata.findall('about/file')
+            ])
+
+    def ingest_all(self, paths, **options):
+        """
+        Ingest every course found under paths (see find_sources), going
+        on past the ones that fail.  Returns the sources ingested, skipped
+        as unchanged, and failed, as three lists.
+        """
+        ingested, skipped, failed = [], [], []
+        for path in paths:
+            for source in find_sources(path):
+                try:
+                    if self.ingest(source, **options):
+                        ingested.append(source)
+                    else:
+                        skipped.append(source)
+                except Exception as err:  # pylint: disable=broad-except
+                    log.error("Failed to ingest %s: %s", source, err)
+                    failed.append(source)
+        return ingested, skipped, failed
+
+    def remove(self, source):
+        """
+        Remove the course ingested from source.
+        """
+        with self.db:
+            self.db.execute(
+                'DELETE FROM courses WHERE source = ?',
+                (os.path.abspath(source),))
+
+    def find(self, tag=None, semester=None, course=None, **attrs):
+        """
+        Return the elements with the given tag and attributes, in courses
+        with the given semester and course number, as (source, tag,
+        url_name, display_name) rows.
+        """
+        sql = [
+            'SELECT c.source, e.tag, e.url_name, e.display_name '
+            'FROM elements e JOIN courses c ON c.id = e.course_id'
+        ]
+        where, params = [], []
+        if tag is not None:
+            where.append('e.tag = ?')
+            params.append(tag)
+        if semester is not None:
+            where.append('c.semester = ?')
+            params.append(semester)
+        if course is not None:
+            where.append('c.course = ?')
+            params.append(course)
+        for idx, (name, value) in enumerate(sorted(attrs.items())):
+            alias = 'a{0}'.format(idx)
+            sql.append(
+                'JOIN attributes {0} ON {0}.course_id = e.course_id '
+                'AND {0}.element_id = e.id'.format(alias))
+            where.append('{0}.name = ? AND {0}.value = ?'.format(alias))
+            params.extend([name, value])
+        if where:
+            sql.append('WHERE ' + ' AND '.join(where))
+        sql.append('ORDER BY c.source, e.id')
+        return self.db.execute(' '.join(sql), params).fetchall()
+
+    def courses_with(self, tag):
+        """
+        Return the sources of the courses having an element with tag.
+        """
+        return [row[0] for row in self.db.execute(
+            'SELECT source FROM courses WHERE id IN '
+            '(SELECT course_id FROM elements WHERE tag = ?) '
+            'ORDER BY source', (tag,))]
@@ -0,0 +1,210 @@
+"""
+Container file holding many xbundles, with an index of their offsets.
+
+A container is two files: the data file, holding the xbundle documents
+one after the other, and next to it an index file (the same name plus
+.idx) of fixed-size records giving the course id, semester, offset and
+length of each document.  Readers map the index into memory, find the
+course they want and read and parse only its slice of the data file.
+
+Both files are only ever appended to.  Replacing a course appends the
+new document and a new index record; the latest record for a course wins.
+The index record is written after the document, so a container stays
+consistent if a writer dies part way through.  There should be only one
+writer at a time.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import io
+import os
+import mmap
+import struct
+
+from lxml import etree
+
+MAGIC = b'XBUNDLES1\n'
+INDEX_MAGIC = b'XBIDX001'
+RECORD = struct.Struct('<128s64sQQ')
+
+
+def index_filename(filename):
+    """
+    Return the name of the index file of a container.
+    """
+    return filename + '.idx'
+
+
+def course_key(data):
+    """
+    Return the course id and semester of a serialized xbundle, reading
+    no further than its <course> start tag.
+    """
+    events = etree.iterparse(
+        io.BytesIO(data), events=('start',), tag='course')
+    for _, elem in events:
+        return elem.get('course', ''), elem.get('semester', '')
+    raise ValueError("No <course> element found")
+
+
+class XBundleContainer(object):
+    """
+    A file of many xbundles, indexed by course id and semester.
+    """
+    def __init__(self, filename, create=True):
+        """
+        Open the container in filename, creating it if it doesn't exist;
+        with create=False, as for reading, a missing container raises
+        IOError instead.
+        """
+        self.filename = filename
+        self.index_filename = index_filename(filename)
+        if create and not os.path.exists(filename):
+            with open(filename, 'wb') as data:
+                data.write(MAGIC)
+            with open(self.index_filename, 'wb') as index:
+                index.write(INDEX_MAGIC)
+        with open(filename, 'rb') as data:
+            if data.read(len(MAGIC)) != MAGIC:
+                raise ValueError(
+                    "{0} is not an xbundle container".format(filename))
+        self.index = None
+        self.reload()
+
+    def reload(self):
+        """
+        Map the index into memory again, to see records appended since.
+        """
+        self.close()
+        with open(self.index_filename, 'rb') as index:
+            self.index = mmap.mmap(
+                index.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.index[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+            raise ValueError(
+                "{0} is not an xbundle container index".format(
+                    self.index_filename))
+
+    def close(self):
+        """
+        Release the index.
+        """
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def records(self):
+        """
+        Yield (course_id, semester, offset, length) for each index record,
+        latest first.
+        """
+        count = (len(self.index) - len(INDEX_MAGIC)) // RECORD.size
+        for idx in range(count - 1, -1, -1):
+            course_id, semester, offset, length = RECORD.unpack_from(
+                self.index, len(INDEX_MAGIC) + idx * RECORD.size)
+            yield (
+                course_id.rstrip(b'\0').decode('utf-8'),
+                semester.rstrip(b'\0').decode('utf-8'),
+                offset, length,
+            )
+
+    def keys(self):
+        """
+        Return the (course_id, semester) of every course, in the order
+        they were first added.
+        """
+        keys = []
+        for course_id, semester, _, _ in self.records():
+            if (course_id, semester) not in keys:
+                keys.append((course_id, semester))
+        return keys[::-1]
+
+    def find(self, course_id, semester=None):
+        """
+        Return the (offset, length) of the latest copy of a course, or
+        None.  Without a semester, the course last added in any semester
+        is found.
+        """
+        for rec_course, rec_semester, offset, length in self.records():
+            if rec_course == course_id and semester in (None, rec_semester):
+                return offset, length
+        return None
+
+    def read(self, course_id, semester=None):
+        """
+        Return the serialized xbundle of a course.
+        """
+        found = self.find(course_id, semester)
+        if found is None:
+            raise KeyError((course_id, semester))
+        offset, length = found
+        with open(self.filename, 'rb') as data:
+            data.seek(offset)
+            return data.read(length)
+
+    def add(self, bundle, course_id=None, semester=None):
+        """
+        Append a course, which must not be in the container yet.
+
+        bundle is an XBundle or a serialized xbundle.  course_id and
+        semester default to those of its <course> element.
+        """
+        data, course_id, semester = self._prepare(bundle, course_id, semester)
+        if self.find(course_id, semester) is not None:
+            raise KeyError(
+                "{0} {1} is already in the container".format(
+                    course_id, semester))
+        self._append(data, course_id, semester)
+
+    def replace(self, bundle, course_id=None, semester=None):
+        """
+        Append a new version of a course which is in the container.
+        """
+        data, course_id, semester = self._prepare(bundle, course_id, semester)
+        if self.find(course_id, semester) is None:
+            raise KeyError((course_id, semester))
+        self._append(data, course_id, semester)
+
+    @staticmethod
+    def _prepare(bundle, course_id, semester):
+        """
+        Serialize bundle and fill in its key.
+        """
+        if isinstance(bundle, bytes):
+            data = bundle
+        else:
+            data = str(bundle).encode('utf-8')
+        if course_id is None or semester is None:
+            key = course_key(data)
+            course_id = key[0] if course_id is None else course_id
+            semester = key[1] if semester is None else semester
+        return data, course_id, semester
+
+    def _append(self, data, course_id, semester):
+        """
+        Append data to the data file, then its record to the index.
+        """
+        if len(course_id.encode('utf-8')) > 128 or \
+                len(semester.encode('utf-8')) > 64:
+            raise ValueError("Course id or semester too long for the index")
+        with open(self.filename, 'ab') as output:
+            output.seek(0, os.SEEK_END)
+            offset = output.tell()
+            output.write(data)
+            output.write(b'\n')
+            output.flush()
+            os.fsync(output.fileno())
+        record = RECORD.pack(
+            course_id.encode('utf-8'), semester.encode('utf-8'),
+            offset, len(data))
+        with open(self.index_filename, 'ab') as index:
+            index.write(record)
+            index.flush()
+            os.fsync(index.fileno())
+        self.reload()
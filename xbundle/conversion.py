@@ -0,0 +1,119 @@
+"""
+Conversion of single courses, as run by the conversion service and by
+batches: run_conversion converts an edX directory, an archive of one or
+an xbundle file, extracting archives with extract_archive, and
+input_hash tells whether an input changed since it was last converted.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import time
+import hashlib
+import tarfile
+import zipfile
+import traceback
+from os.path import join, isdir
+from shutil import rmtree
+from tempfile import mkdtemp
+
+from xbundle import convert
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2')
+
+
+def check_members(archive, dest, names):
+    """
+    Raise ValueError unless every member name of an archive is a path
+    within dest.
+    """
+    root = os.path.realpath(dest)
+    for name in names:
+        target = os.path.realpath(os.path.join(root, name))
+        if target != root and not target.startswith(root + os.sep):
+            raise ValueError(
+                "{0} has a member outside of it: {1}".format(archive, name))
+
+
+def extract_archive(archive, dest):
+    """
+    Extract an archive of an edX directory into dest, and return the
+    directory within it that holds course.xml.
+
+    Archives come from elsewhere, so one with members which would be
+    written outside of dest, or with links or device files, is refused.
+    """
+    if archive.endswith('.zip'):
+        with zipfile.ZipFile(archive) as zfile:
+            check_members(archive, dest, zfile.namelist())
+            zfile.extractall(dest)
+    else:
+        with tarfile.open(archive) as tfile:
+            members = tfile.getmembers()
+            check_members(archive, dest, [member.name for member in members])
+            for member in members:
+                if not (member.isfile() or member.isdir()):
+                    raise ValueError("{0} has a link or device: {1}".format(
+                        archive, member.name))
+            if hasattr(tarfile, 'data_filter'):
+                tfile.extractall(dest, filter='data')
+            else:
+                tfile.extractall(dest)
+    for dname, _, fnames in os.walk(dest):
+        if 'course.xml' in fnames:
+            return dname
+    raise ValueError("No course.xml found in {0}".format(archive))
+
+
+def run_conversion(input_path, output_path, options):
+    """
+    Run one conversion in a worker process.
+
+    Returns a dict with the time the conversion started and how long it
+    took, and the error if it failed.
+    """
+    started = time.time()
+    result = {'started': started, 'error': None}
+    tempdir = None
+    try:
+        if input_path.endswith(ARCHIVE_SUFFIXES):
+            tempdir = mkdtemp()
+            input_path = extract_archive(input_path, tempdir)
+        convert(input_path, output_path, **options)
+    except Exception as err:  # pylint: disable=broad-except
+        result['error'] = "{0}: {1}".format(type(err).__name__, err)
+        result['traceback'] = traceback.format_exc()
+    finally:
+        if tempdir is not None:
+            rmtree(tempdir)
+    result['seconds'] = time.time() - started
+    return result
+
+
+def input_hash(path):
+    """
+    Return a SHA-1 of the content of a file, or of the names and content
+    of all the files in a directory.
+    """
+    digest = hashlib.sha1()
+
+    def update_file(filename):
+        """
+        Feed the content of a file to the digest.
+        """
+        with open(filename, 'rb') as data:
+            for chunk in iter(lambda: data.read(1 << 20), b''):
+                digest.update(chunk)
+
+    if not isdir(path):
+        update_file(path)
+        return digest.hexdigest()
+    for dname, dnames, fnames in os.walk(path):
+        dnames.sort()
+        for fname in sorted(fnames):
+            filename = join(dname, fname)
+            digest.update(
+                os.path.relpath(filename, path).encode('utf-8') + b'\0')
+            update_file(filename)
+    return digest.hexdigest()
@@ -0,0 +1,108 @@
+"""
+A converter which can be shared between threads.
+
+An XBundle holds the state of one conversion (the course, the url_names
+given out, the export path, the policy) as well as its options, so it is
+not to be used by two threads at once.  A Converter holds only the
+options, which it never changes, and makes a new XBundle, the context of
+the run, for each conversion; one Converter can then serve any number of
+conversions at the same time, e.g. on a thread pool:
+
+    converter = Converter(keep_urls=True)
+    with ThreadPoolExecutor(4) as pool:
+        for src, dst in jobs:
+            pool.submit(converter.convert, src, dst)
+
+The storage given in the options is shared by the runs; the default, the
+filesystem, keeps nothing in memory.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+from xbundle import XBundle
+
+
+class Converter(object):
+    """
+    XBundle options, from which to run conversions.
+    """
+    def __init__(self, **options):
+        """
+        options are passed on to XBundle for each run, except progress
+        and cancel, which are given per run.
+        """
+        for name in ('progress', 'cancel'):
+            if name in options:
+                raise TypeError(
+                    "{0} is given per conversion, not to Converter".format(
+                        name))
+        if options.get('no_overwrite') is not None:
+            options['no_overwrite'] = tuple(options['no_overwrite'])
+        self.options = options
+        # Fail now on options XBundle doesn't know.
+        XBundle(**options)
+
+    def bundle(self, progress=None, cancel=None):
+        """
+        Return a new XBundle with these options, for one run.
+        """
+        return XBundle(progress=progress, cancel=cancel, **self.options)
+
+    def load(self, filename, **run):
+        """
+        Return an XBundle loaded from an xbundle file.  run is passed on to
+        bundle().
+        """
+        bundle = self.bundle(**run)
+        bundle.load(filename)
+        return bundle
+
+    def import_directory(self, path, **run):
+        """
+        Return an XBundle imported from an edX directory.
+        """
+        bundle = self.bundle(**run)
+        bundle.import_from_directory(path)
+        return bundle
+
+    def export_directory(self, source, exdir, **run):
+        """
+        Export the course of another XBundle to an edX directory.
+
+        source is only read, so it can be exported by several threads at
+        once, as long as none of them edits it.
+        """
+        bundle = self.bundle(**run)
+        bundle.course = source.course
+        bundle.metadata = source.metadata
+        bundle.semester = source.semester
+        bundle.urlnames = list(source.urlnames)
+        bundle.export_to_directory(exdir)
+        return bundle
+
+    def convert(self, input_path, output_path, **run):
+        """
+        Convert an xbundle file to an edX directory, or an edX directory
+        to an xbundle file, like xbundle.convert.  Returns the XBundle
+        used.
+        """
+        if input_path.endswith('.xml'):
+            bundle = self.load(input_path, **run)
+            bundle.export_to_directory(output_path)
+            return bundle
+        if output_path.endswith('.xml'):
+            bundle = self.import_directory(input_path, **run)
+            bundle.save(output_path)
+            return bundle
+        raise ValueError(
+            "Either the input or the output must be an xbundle .xml file")
+
+    def normalize(self, path, exdir, **run):
+        """
+        Sanitize an edX directory into exdir, like
+        xbundle.normalize_directory.
+        """
+        bundle = self.bundle(**run)
+        bundle.normalize_directory(path, exdir)
+        return bundle
@@ -0,0 +1,75 @@
+"""
+Digests of course content.
+
+update and update_attrs feed strings and attributes to a hashlib
+digest, for the content digests of stable url_names (stable_digest) and
+of fingerprints (see xbundle.fingerprint).
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import hashlib
+
+import six
+
+from xbundle import DESCRIPTOR_TAGS, URL_NAME_ATTRS
+
+
+def update(digest, *parts):
+    """
+    Feed strings to a digest, keeping their boundaries.
+    """
+    for part in parts:
+        digest.update((part or '').encode('utf-8') + b'\0')
+
+
+def update_attrs(digest, elem, skip=()):
+    """
+    Feed the attributes of elem, other than those in skip, to a digest,
+    in a fixed order.
+    """
+    for key, val in sorted(elem.attrib.items()):
+        if key not in skip:
+            update(digest, key, val)
+
+
+def stable_digest(xml):
+    """
+    Return a hex digest identifying xml by its position and content,
+    for use in stable url_names.
+
+    The position is the chain of tags and display_names of its
+    ancestors below the course.  The content is the element's own tag,
+    attributes and text, all of its non-descriptor children, and the
+    tag and display_name of its descriptor children; a change inside
+    a descriptor child therefore does not rename its parent.
+    url_name attributes are ignored.
+    """
+    digest = hashlib.sha1()
+
+    ancestors = [
+        anc for anc in xml.iterancestors()
+        if anc.tag not in ('descriptor', 'course')
+    ]
+    for anc in reversed(ancestors):
+        update(digest, 'ancestor', anc.tag, anc.get('display_name', ''))
+
+    update(digest, 'element', xml.tag, (xml.text or '').strip())
+    update_attrs(digest, xml, URL_NAME_ATTRS)
+    for child in xml:
+        if child.tag in DESCRIPTOR_TAGS:
+            update(digest, 'child', child.tag, child.get('display_name', ''))
+        else:
+            for node in child.iter():
+                tag = node.tag
+                if not isinstance(tag, six.string_types):
+                    # Comments and processing instructions.
+                    tag = '#' + type(node).__name__
+                update(
+                    digest, 'node', tag, str(len(node)),
+                    (node.text or '').strip(), (node.tail or '').strip(),
+                )
+                update_attrs(digest, node, URL_NAME_ATTRS)
+        update(digest, 'tail', (child.tail or '').strip())
+    return digest.hexdigest()
@@ -0,0 +1,215 @@
+"""
+Index of the elements of a course by url_name, tag and display_name.
+
+XBundle.elements holds one, built the first time it is used after the
+course is loaded, imported or set, so that a lookup costs a dict access
+rather than a scan of the whole tree.  Edits made through the index
+(replace, remove, insert, set) keep it up to date; so do the url_names
+given out by XBundle.add_descriptors.  After editing the tree by other
+means, call XBundle.reindex().
+
+Lookups check that what they return is still in the course and still
+has the tag and attribute it was found by, so an element removed or
+renamed behind the index's back is never returned; it is just not
+found under its new name until the index is rebuilt.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+from collections import OrderedDict
+
+from lxml import etree
+
+from xbundle import URL_NAME_ATTRS
+
+
+class ElementIndex(object):
+    """
+    Elements under a root, by url_name (or url_name_orig), tag and
+    display_name.
+
+    Each table maps a value to the elements having it, in the order they
+    were indexed: document order, for elements indexed together.
+    """
+    def __init__(self, root, on_change=None):
+        """
+        root: element whose descendants are indexed
+        on_change: optional function called with each element edited
+                   through the index (the parent, for replace, remove
+                   and insert)
+        """
+        self.root = root
+        self.on_change = on_change
+        self.tables = {'url_name': {}, 'tag': {}, 'display_name': {}}
+        # The (table, value) pairs each element was indexed under.
+        self.keys = {}
+        self.add(root)
+
+    @staticmethod
+    def element_keys(elem):
+        """
+        Return the (table, value) pairs elem is to be indexed under.
+        """
+        keys = [('tag', elem.tag)]
+        for attr in sorted(URL_NAME_ATTRS):
+            value = elem.get(attr)
+            if value and ('url_name', value) not in keys:
+                keys.append(('url_name', value))
+        display_name = elem.get('display_name')
+        if display_name:
+            keys.append(('display_name', display_name))
+        return keys
+
+    @staticmethod
+    def matches(elem, table, value):
+        """
+        Check whether elem still has the given value.
+        """
+        if table == 'tag':
+            return elem.tag == value
+        if table == 'url_name':
+            return value in (elem.get(attr) for attr in URL_NAME_ATTRS)
+        return elem.get(table) == value
+
+    def add(self, xml):
+        """
+        Index xml and all the elements under it.
+        """
+        for elem in xml.iter(etree.Element):
+            self.refresh(elem)
+
+    def discard_one(self, elem):
+        """
+        Forget elem, but not the elements under it.
+        """
+        for table, value in self.keys.pop(elem, ()):
+            entries = self.tables[table][value]
+            entries.pop(elem, None)
+            if not entries:
+                del self.tables[table][value]
+
+    def discard(self, xml):
+        """
+        Forget xml and all the elements under it.
+        """
+        for elem in xml.iter(etree.Element):
+            self.discard_one(elem)
+
+    def refresh(self, elem):
+        """
+        Index elem again after its tag or attributes changed.
+        """
+        self.discard_one(elem)
+        keys = self.element_keys(elem)
+        self.keys[elem] = keys
+        for table, value in keys:
+            self.tables[table].setdefault(value, OrderedDict())[elem] = None
+
+    def is_attached(self, elem):
+        """
+        Check whether elem is still under the root.
+        """
+        while elem is not None:
+            if elem is self.root:
+                return True
+            elem = elem.getparent()
+        return False
+
+    def lookup(self, table, value):
+        """
+        Yield the elements indexed under value in table, dropping those
+        which no longer match or were removed from the tree.
+        """
+        entries = self.tables[table].get(value)
+        if not entries:
+            return
+        stale = []
+        try:
+            for elem in list(entries):
+                if self.matches(elem, table, value) and \
+                        self.is_attached(elem):
+                    yield elem
+                else:
+                    stale.append(elem)
+        finally:
+            for elem in stale:
+                self.discard_one(elem)
+
+    def get(self, url_name, tag=None, default=None):
+        """
+        Return the element with the given url_name (or url_name_orig),
+        and tag if given, or default.
+        """
+        for elem in self.lookup('url_name', url_name):
+            if tag is None or elem.tag == tag:
+                return elem
+        return default
+
+    def iter(self, tag=None, display_name=None):
+        """
+        Yield the elements with the given tag and/or display_name.
+        """
+        if tag is None and display_name is None:
+            raise ValueError("Give a tag or a display_name")
+        if tag is None:
+            candidates = self.lookup('display_name', display_name)
+        else:
+            candidates = self.lookup('tag', tag)
+        for elem in candidates:
+            if display_name is None or \
+                    elem.get('display_name') == display_name:
+                yield elem
+
+    def replace(self, old, new):
+        """
+        Put new in place of old, in the tree and in the index.
+        """
+        parent = old.getparent()
+        new.tail = old.tail
+        parent.replace(old, new)
+        self.discard(old)
+        self.add(new)
+        self.changed(parent)
+
+    def remove(self, elem):
+        """
+        Remove elem from the tree and the index, keeping the text after
+        it.
+        """
+        parent = elem.getparent()
+        if elem.tail:
+            previous = elem.getprevious()
+            if previous is not None:
+                previous.tail = (previous.tail or '') + elem.tail
+            else:
+                parent.text = (parent.text or '') + elem.tail
+        parent.remove(elem)
+        self.discard(elem)
+        self.changed(parent)
+
+    def insert(self, parent, elem, index=None):
+        """
+        Add elem to the children of parent, at index or at the end.
+        """
+        if index is None:
+            parent.append(elem)
+        else:
+            parent.insert(index, elem)
+        self.add(elem)
+        self.changed(parent)
+
+    def set(self, elem, attr, value):
+        """
+        Set an attribute of elem.
+        """
+        elem.set(attr, value)
+        self.refresh(elem)
+        self.changed(elem)
+
+    def changed(self, elem):
+        """
+        Report an edit to on_change, if given.
+        """
+        if self.on_change is not None:
+            self.on_change(elem)
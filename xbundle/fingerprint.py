@@ -0,0 +1,251 @@
+"""
+Merkle fingerprints of course elements, for finding what changed.
+
+Each element has two digests: its own, over its tag, attributes, text,
+comments and the text after each child, and its full digest, over
+its own digest and the full digests of its children.  Two elements with
+the same full digest have the same content, whitespace around text
+aside, so comparing two courses only descends into the subtrees which
+differ.
+
+Digests are computed on demand and cached.  XBundle.fingerprints holds
+the fingerprints of the course; edits made through XBundle.elements
+drop the cached digests of the edited element and its ancestors only,
+and XBundle.changed(elem) does the same after editing elem directly.
+
+Fingerprints can be kept for a later comparison, in a JSON sidecar
+(save, then diff against load) or as attributes of the elements
+(annotate).
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import json
+import hashlib
+
+import six
+
+from xbundle.digest import update, update_attrs
+
+FINGERPRINT_ATTR = 'fingerprint'
+
+
+def child_keys(elem):
+    """
+    Return (key, child) for each child element of elem.  The key is
+    tag[url_name] if the child has a url_name (or url_name_orig), and
+    tag[n] for the n-th child with that tag otherwise.
+    """
+    keys = []
+    counts = {}
+    for child in elem:
+        if not isinstance(child.tag, six.string_types):
+            continue
+        url_name = child.get('url_name') or child.get('url_name_orig')
+        if url_name:
+            key = '{0}[{1}]'.format(child.tag, url_name)
+        else:
+            count = counts.get(child.tag, 0)
+            counts[child.tag] = count + 1
+            key = '{0}[{1}]'.format(child.tag, count)
+        keys.append((key, child))
+    return keys
+
+
+class Fingerprints(object):
+    """
+    Cached digests of the elements under a root.
+    """
+    def __init__(self, root):
+        self.root = root
+        # (own digest, full digest) by element.
+        self.cache = {}
+
+    def digests(self, elem):
+        """
+        Return the own and full digests of elem, computing those of its
+        descendants first as needed.
+        """
+        cached = self.cache.get(elem)
+        if cached is not None:
+            return cached
+        # Post-order, without recursion, so deep courses are fine.
+        stack = [(elem, False)]
+        while stack:
+            node, ready = stack.pop()
+            if node in self.cache:
+                continue
+            children = [
+                child for child in node
+                if isinstance(child.tag, six.string_types)
+            ]
+            if not ready:
+                stack.append((node, True))
+                stack.extend(
+                    (child, False) for child in reversed(children)
+                    if child not in self.cache)
+                continue
+            own = self.own_digest(node)
+            full = hashlib.sha1(own.encode('ascii'))
+            for child in children:
+                full.update(self.cache[child][1].encode('ascii'))
+            self.cache[node] = (own, full.hexdigest())
+        return self.cache[elem]
+
+    @staticmethod
+    def own_digest(elem):
+        """
+        Return the digest of the content of elem itself.
+        """
+        digest = hashlib.sha1()
+        update(digest, 'element', elem.tag, (elem.text or '').strip())
+        update_attrs(digest, elem, (FINGERPRINT_ATTR,))
+        # Child elements are left to the full digest, so that adding or
+        # removing one doesn't change this one; only text after them does.
+        position = 0
+        for child in elem:
+            if isinstance(child.tag, six.string_types):
+                position += 1
+            else:
+                # Comments and processing instructions.
+                update(digest, '#' + type(child).__name__, child.text)
+            tail = (child.tail or '').strip()
+            if tail:
+                update(digest, 'tail', str(position), tail)
+        return digest.hexdigest()
+
+    def digest(self, elem=None):
+        """
+        Return the full digest of elem, by default of the root.
+        """
+        return self.digests(self.root if elem is None else elem)[1]
+
+    def invalidate(self, elem):
+        """
+        Forget the digests of elem and its ancestors, after elem changed.
+        """
+        while elem is not None:
+            self.cache.pop(elem, None)
+            elem = elem.getparent()
+
+    def clear(self):
+        """
+        Forget all digests.
+        """
+        self.cache = {}
+
+    def paths(self):
+        """
+        Return, by path from the root, the digests and child paths of
+        every element, as saved in a sidecar.
+        """
+        entries = {}
+        stack = [(self.root.tag, self.root)]
+        while stack:
+            path, elem = stack.pop()
+            own, full = self.digests(elem)
+            children = [
+                ('{0}/{1}'.format(path, key), child)
+                for key, child in child_keys(elem)
+            ]
+            entries[path] = {
+                'own': own,
+                'digest': full,
+                'children': [child_path for child_path, _ in children],
+            }
+            stack.extend(children)
+        return entries
+
+    def save(self, filename):
+        """
+        Write the digests of every element to a JSON sidecar.
+        """
+        with open(filename, 'w') as output:
+            json.dump(self.paths(), output, sort_keys=True)
+
+    @staticmethod
+    def load(filename):
+        """
+        Read a sidecar written by save, for use with diff.
+        """
+        with open(filename) as sidecar:
+            return json.load(sidecar)
+
+    def annotate(self, attr=FINGERPRINT_ATTR):
+        """
+        Set an attribute holding its full digest on every element.  The
+        attribute is left out of the digests themselves.
+        """
+        for elem in self.root.iter():
+            if isinstance(elem.tag, six.string_types):
+                elem.set(attr, self.digest(elem))
+
+    def entry(self, elem):
+        """
+        Return the sidecar entry of elem, with elements for children.
+        """
+        own, full = self.digests(elem)
+        return {'own': own, 'digest': full, 'children': child_keys(elem)}
+
+    @staticmethod
+    def old_entry(other, path, elem):
+        """
+        Return the entry at path in other, as for diff, and the paths of
+        its children in document order, each with the element at that
+        path in other.
+
+        elem is the element at path in other, found by the caller while
+        walking down; there are no elements in a sidecar, only None.
+        """
+        if isinstance(other, Fingerprints):
+            if elem is None:
+                return None, []
+            entry = other.entry(elem)
+            return entry, [
+                ('{0}/{1}'.format(path, key), child)
+                for key, child in entry['children']
+            ]
+        entry = other.get(path)
+        if entry is None:
+            return None, []
+        return entry, [(child, None) for child in entry['children']]
+
+    def diff(self, other):
+        """
+        Return the differences between other and these fingerprints, as a
+        list of (kind, path) in document order; kind is 'added',
+        'removed' or 'changed', the last for elements whose own content
+        changed.
+
+        other is another Fingerprints, or the sidecar of earlier ones.
+        Only the subtrees whose digests differ are visited.
+        """
+        start = other.root if isinstance(other, Fingerprints) else None
+        changes = []
+        stack = [(self.root.tag, self.root, start)]
+        while stack:
+            path, elem, old_elem = stack.pop()
+            old, old_children = self.old_entry(other, path, old_elem)
+            own, full = self.digests(elem)
+            if old is None:
+                changes.append(('added', path))
+                continue
+            if old['digest'] == full:
+                continue
+            if old['own'] != own:
+                changes.append(('changed', path))
+            children = [
+                ('{0}/{1}'.format(path, key), child)
+                for key, child in child_keys(elem)
+            ]
+            current = set(child_path for child_path, _ in children)
+            changes.extend(
+                ('removed', child_path) for child_path, _ in old_children
+                if child_path not in current)
+            old_children = dict(old_children)
+            stack.extend(
+                (child_path, child, old_children.get(child_path))
+                for child_path, child in reversed(children)
+            )
+        return changes
@@ -0,0 +1,204 @@
+"""
+Sidecar index giving the byte range of each part of an xbundle file.
+
+XBundle.save(filename, index=True) writes next to the xbundle a JSON file
+(the same name plus .idx) listing where each chapter, sequential and
+metadata entry lies in it.  load_fragment() then seeks to the part asked
+for and parses only that, instead of the whole document.
+
+The index records the size, modification time and SHA-1 of the file it
+describes.  A file whose size and modification time still match is
+trusted; otherwise it is hashed, and if the hash differs too, the index is
+rebuilt from the file before use.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import json
+import hashlib
+import logging
+from xml.parsers import expat
+
+from lxml import etree
+
+from xbundle.storage import START_TAG
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+INDEX_VERSION = 1
+
+# Elements given an entry, by the tag of their parent.
+INDEXED_TAGS = {
+    'xbundle': {'metadata', 'course'},
+    'metadata': {'policies', 'about', 'static'},
+    'about': {'file'},
+    'static': {'file'},
+    'course': {'chapter'},
+    'chapter': {'sequential', 'section'},
+}
+
+# Attributes copied into entries, to look them up by.
+KEY_ATTRS = (
+    'url_name', 'url_name_orig', 'display_name', 'semester', 'filename')
+
+
+def index_filename(filename):
+    """
+    Return the name of the sidecar index of an xbundle file.
+    """
+    return filename + '.idx'
+
+
+def file_digest(filename):
+    """
+    Return the SHA-1 of a file's content.
+    """
+    digest = hashlib.sha1()
+    with open(filename, 'rb') as data:
+        for chunk in iter(lambda: data.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_index(data):
+    """
+    Return the index entries of a serialized xbundle, in document order.
+
+    Each entry is a dict with the element's tag, its path from the root
+    (e.g. "course/chapter[0]/sequential[2]", counting siblings of the
+    same tag), its key attributes, and the start and end of its byte
+    range.
+    """
+    entries = []
+    # One (entry or None, tag, path, counts of children by tag) per open
+    # element.
+    stack = []
+    parser = expat.ParserCreate()
+
+    def start(tag, attrs):
+        """
+        Open an entry if the element is indexed.
+        """
+        entry = None
+        if not stack:
+            path = tag
+        else:
+            parent_entry, parent_tag, parent_path, counts = stack[-1]
+            position = counts.get(tag, 0)
+            counts[tag] = position + 1
+            path = '{0}/{1}[{2}]'.format(parent_path, tag, position)
+            if parent_tag == 'xbundle':
+                path = tag
+            if parent_entry is not None and \
+                    tag in INDEXED_TAGS.get(parent_tag, ()):
+                entry = {
+                    'tag': tag,
+                    'path': path,
+                    'attrs': dict(
+                        (attr, attrs[attr])
+                        for attr in KEY_ATTRS if attr in attrs
+                    ),
+                    'start': parser.CurrentByteIndex,
+                }
+                entries.append(entry)
+        if not stack:
+            entry = {}  # the root, to let its children be indexed
+        stack.append((entry, tag, path, {}))
+
+    def end(_):
+        """
+        Close the entry of the element, if any.
+        """
+        entry = stack.pop()[0]
+        if not entry:
+            return
+        tag = START_TAG.match(data, entry['start'])
+        if tag.group(1):
+            # An empty element, <tag/>: its start tag is all of it.
+            entry['end'] = tag.end()
+        else:
+            entry['end'] = data.index(b'>', parser.CurrentByteIndex) + 1
+
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.Parse(data, True)
+    return entries
+
+
+def write_index(filename, data=None):
+    """
+    Write the sidecar index of an xbundle file, and return its entries.
+
+    data is the content of the file, if the caller has it at hand.
+    """
+    if data is None:
+        with open(filename, 'rb') as xbundle:
+            data = xbundle.read()
+    stat = os.stat(filename)
+    index = {
+        'version': INDEX_VERSION,
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'sha1': hashlib.sha1(data).hexdigest(),
+        'entries': build_index(data),
+    }
+    with open(index_filename(filename), 'w') as output:
+        json.dump(index, output, sort_keys=True)
+    return index['entries']
+
+
+def read_index(filename):
+    """
+    Return the index entries of an xbundle file, rebuilding its index if
+    it is missing or out of date.
+    """
+    try:
+        with open(index_filename(filename)) as idx:
+            index = json.load(idx)
+    except (IOError, ValueError):
+        index = {}
+    if index.get('version') == INDEX_VERSION:
+        stat = os.stat(filename)
+        if stat.st_size == index['size']:
+            if stat.st_mtime == index['mtime'] or \
+                    file_digest(filename) == index['sha1']:
+                return index['entries']
+    log.info("Index of %s is missing or stale, rebuilding it", filename)
+    return write_index(filename)
+
+
+def find_entry(entries, path=None, tag=None, attrs=None):
+    """
+    Return the first entry with the given path, or with the given tag and
+    key attributes, or None.
+    """
+    attrs = attrs or {}
+    for entry in entries:
+        if path is not None and entry['path'] != path:
+            continue
+        if tag is not None and entry['tag'] != tag:
+            continue
+        if all(entry['attrs'].get(attr) == value
+               for attr, value in attrs.items()):
+            return entry
+    return None
+
+
+def load_fragment(filename, path=None, tag=None, attrs=None):
+    """
+    Parse and return one element of an xbundle file, read from its byte
+    range alone.
+
+    The element is given by its path in the index, or by its tag and key
+    attributes, e.g. load_fragment(filename, tag='chapter',
+    attrs={'display_name': 'Intro'}).  Raises KeyError if there is no
+    such element.
+    """
+    entry = find_entry(read_index(filename), path=path, tag=tag, attrs=attrs)
+    if entry is None:
+        raise KeyError(path or (tag, attrs))
+    with open(filename, 'rb') as xbundle:
+        xbundle.seek(entry['start'])
+        return etree.fromstring(xbundle.read(entry['end'] - entry['start']))
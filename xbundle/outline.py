@@ -0,0 +1,147 @@
+"""
+JSON outline of an xbundle, for tools which only need its structure and
+attributes and shouldn't have to parse XML.
+
+write_json streams the metadata and course of an XBundle as JSON:
+
+    {"format": "xbundle-outline", "version": 1,
+     "metadata": {"policies": [{"semester": ..., "policy": {...},
+                                "gradingpolicy": {...}}],
+                  "about": [{"filename": ..., "text": ...}],
+                  "static": [{"root": ..., "files": [{"filename": ...,
+                                                      "size": ...}]}]},
+     "course": {"tag": "course", "attrs": {...},
+                "children": [{"tag": "chapter", ...}, ...]}}
+
+Each element is an object with its tag, attributes, children, and text
+and tail when they are not blank.  With flat=True, "course" is replaced
+by "nodes", a list of the same objects without children but with an id
+(their index in the list, in document order) and the id of their parent
+(null for the course).  Policies are given as parsed JSON, or as text if
+they don't parse.  Comments and processing instructions are left out.
+
+Outlines are read back by xbundle_outline, a module outside of this
+package which needs only json, so that reading one loads neither xbundle
+nor lxml; load_json and iter_nodes are also importable from here.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import json
+
+import six
+
+# load_json and iter_nodes, for those who have xbundle loaded already.
+from xbundle_outline import (  # pylint: disable=unused-import
+    FORMAT, VERSION, load_json, iter_nodes)
+
+
+def dumps(value):
+    """
+    Return value as compact JSON.
+    """
+    return json.dumps(value, separators=(',', ':'), sort_keys=True)
+
+
+def node_fields(elem):
+    """
+    Return the tag, attributes, and non-blank text and tail of elem.
+    """
+    fields = {'tag': elem.tag, 'attrs': dict(elem.attrib)}
+    if elem.text and elem.text.strip():
+        fields['text'] = elem.text
+    if elem.tail and elem.tail.strip():
+        fields['tail'] = elem.tail
+    return fields
+
+
+def metadata_outline(metadata):
+    """
+    Return the metadata of an xbundle as a dict.
+    """
+    policies = []
+    for pxml in metadata.findall('policies'):
+        policy = {'semester': pxml.get('semester')}
+        for elem in pxml:
+            try:
+                policy[elem.tag] = json.loads(elem.text or '')
+            except ValueError:
+                policy[elem.tag] = elem.text
+        policies.append(policy)
+    return {
+        'policies': policies,
+        'about': [
+            {'filename': fxml.get('filename'), 'text': fxml.text or ''}
+            for fxml in metadata.findall('about/file')
+        ],
+        'static': [
+            {
+                'root': sxml.get('root'),
+                'files': [
+                    {'filename': fxml.get('filename'),
+                     'size': int(fxml.get('size', 0))}
+                    for fxml in sxml.findall('file')
+                ],
+            }
+            for sxml in metadata.findall('static')
+        ],
+    }
+
+
+def write_nested(course, stream):
+    """
+    Write the course tree as nested objects.
+    """
+    from lxml import etree
+    # Whether the next element written is the first among its siblings.
+    first = [True]
+    for event, elem in etree.iterwalk(course, events=('start', 'end')):
+        if not isinstance(elem.tag, six.string_types):
+            continue
+        if event == 'start':
+            fields = node_fields(elem)
+            fields.pop('tail', None)  # written after the children
+            stream.write(
+                ('' if first[-1] else ',') + dumps(fields)[:-1] +
+                ',"children":[')
+            first[-1] = False
+            first.append(True)
+        else:
+            first.pop()
+            stream.write(']')
+            if elem.tail and elem.tail.strip():
+                stream.write(',"tail":' + dumps(elem.tail))
+            stream.write('}')
+
+
+def write_flat(course, stream):
+    """
+    Write the course tree as a list of nodes with parent ids.
+    """
+    ids = {}
+    for elem in course.iter():
+        if not isinstance(elem.tag, six.string_types):
+            continue
+        fields = node_fields(elem)
+        fields['id'] = len(ids)
+        fields['parent'] = ids.get(elem.getparent())
+        stream.write(('' if not ids else ',') + dumps(fields))
+        ids[elem] = fields['id']
+
+
+def write_json(bundle, stream, flat=False):
+    """
+    Write an outline of an XBundle to a text stream, without holding it
+    all in memory.
+    """
+    stream.write('{{"format":{0},"version":{1},"metadata":{2},'.format(
+        dumps(FORMAT), VERSION, dumps(metadata_outline(bundle.metadata))))
+    if flat:
+        stream.write('"nodes":[')
+        write_flat(bundle.course, stream)
+        stream.write(']}')
+    else:
+        stream.write('"course":')
+        write_nested(bundle.course, stream)
+        stream.write('}')
@@ -0,0 +1,203 @@
+"""
+Profiling of conversions.
+
+    with profile('course.prof', label='mitx.01'):
+        xbundle.convert('mitx.01', 'mitx.01.xml')
+
+runs the block under cProfile and writes:
+
+    course.prof            the profile, for pstats, snakeviz, etc.
+    course.prof.txt        the time spent in the hot spots of a conversion
+                           (HOT_SPOTS), then the functions which took
+                           longest, by cumulative time
+    course.prof.collapsed  collapsed stacks ("a;b;c microseconds" lines),
+                           for flamegraph.pl, speedscope, inferno, etc.
+
+Every stack in the collapsed file starts with the label, so the files of
+several courses can be concatenated into one flame graph with a tower
+per course.  With memory=True, a tracemalloc snapshot taken at the end
+of the block is also written to course.prof.mem, and its largest
+allocations listed in course.prof.txt (tracemalloc needs Python 3).
+
+cProfile only records callers and callees, not whole stacks; the time
+of each function is split between the stacks reaching it in proportion
+to the time each of its callers spent calling it.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import io
+import logging
+import pstats
+import cProfile
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+# Functions whose time is reported first, by name.
+HOT_SPOTS = (
+    'import_tree', 'resolve_descriptor', 'read_raw', 'make_urlname',
+    'stable_digest', 'add_descriptors', 'export_xml_to_directory',
+    'write_xml_file', 'pp_xml', 'link_file',
+)
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 20
+# Stacks taking less time are left out of collapsed stack files.
+MIN_SECONDS = 1e-5
+
+
+def frame_name(func):
+    """
+    Return a readable name for a pstats function key.
+    """
+    filename, line, name = func
+    if filename == '~':
+        return name  # a builtin, e.g. <built-in method ...>
+    return '{0} ({1}:{2})'.format(name, filename.rsplit('/', 1)[-1], line)
+
+
+def callee_map(stats):
+    """
+    Return the callees of each function in pstats stats, with the time
+    each spent under it.
+    """
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, (_, _, _, edge_ct) in callers.items():
+            callees.setdefault(caller, []).append((func, edge_ct))
+    return callees
+
+
+def callee_frames(stats, callees, frame):
+    """
+    Return the stack entries for the callees of the function in frame,
+    an entry as made by collapsed_stacks, leaving out recursive calls.
+    """
+    func, names, seen, share = frame
+    frames = []
+    for callee, edge_ct in sorted(callees.get(func, ())):
+        callee_total = stats[callee][3]
+        if callee in seen or not callee_total:
+            continue  # recursion is folded into the outer call
+        frames.append((callee, names, seen, share * edge_ct / callee_total))
+    return frames
+
+
+def collapsed_stacks(stats, label=None):
+    """
+    Return the lines of a collapsed stack file for pstats stats.
+    """
+    callees = callee_map(stats)
+    roots = [func for func, row in stats.items() if not row[4]]
+
+    totals = {}
+    prefix = [label.replace(';', ':')] if label else []
+    # (function, stack of names above it, functions on that stack,
+    # share of the function's time which goes through this stack)
+    stack = [
+        (func, prefix, frozenset(), 1.0) for func in sorted(roots)
+    ]
+    while stack:
+        func, names, seen, share = stack.pop()
+        _, _, own, total, _ = stats[func]
+        if total * share < MIN_SECONDS:
+            continue  # too little to show, and maybe many more paths
+        names = names + [frame_name(func).replace(';', ':')]
+        micros = int(round(own * share * 1e6))
+        if micros:
+            key = ';'.join(names)
+            totals[key] = totals.get(key, 0) + micros
+        stack.extend(callee_frames(
+            stats, callees, (func, names, seen | {func}, share)))
+    return [
+        '{0} {1}'.format(key, micros)
+        for key, micros in sorted(totals.items())
+    ]
+
+
+def write_summary(stats, output, label=None):
+    """
+    Write the time spent in HOT_SPOTS, then the top functions.
+    """
+    if label:
+        output.write('Profile of {0}\n\n'.format(label))
+    output.write('Hot spots (calls, own seconds, cumulative seconds):\n')
+    by_name = {}
+    for (_, _, name), (_, calls, own, total, _) in stats.stats.items():
+        if name in HOT_SPOTS:
+            counts = by_name.setdefault(name, [0, 0.0, 0.0])
+            counts[0] += calls
+            counts[1] += own
+            counts[2] += total
+    for name in HOT_SPOTS:
+        if name in by_name:
+            output.write('    {0:<24} {1:>8} {2:>10.3f} {3:>10.3f}\n'.format(
+                name, *by_name[name]))
+    output.write('\n')
+    stats.stream = output
+    stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+
+
+@contextmanager
+def profile(filename, label=None, memory=False):
+    """
+    Profile the block, writing the files described above next to
+    filename, also when the block raises.
+    """
+    tracemalloc = None
+    if memory:
+        try:
+            import tracemalloc
+        except ImportError:
+            log.warning("tracemalloc needs Python 3; not profiling memory")
+        else:
+            tracemalloc.start()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        snapshot = None
+        if tracemalloc is not None:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+        write_profile(profiler, filename, label, snapshot)
+
+
+def write_profile(profiler, filename, label=None, snapshot=None):
+    """
+    Write the files of a profile, and of a tracemalloc snapshot if given.
+    """
+    profiler.dump_stats(filename)
+    stats = pstats.Stats(profiler)
+    with io.open(filename + '.collapsed', 'w', encoding='utf-8') as output:
+        for line in collapsed_stacks(stats.stats, label):
+            output.write(line + '\n')
+    with io.open(filename + '.txt', 'w', encoding='utf-8') as output:
+        summary = TextStream(output)
+        write_summary(stats, summary, label)
+        if snapshot is not None:
+            snapshot.dump(filename + '.mem')
+            summary.write('\nLargest allocations:\n')
+            for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+                summary.write('    {0}\n'.format(stat))
+    log.info("Profile written to %s", filename)
+
+
+class TextStream(object):
+    """
+    Text file which also takes the byte strings pstats writes on
+    Python 2.
+    """
+    def __init__(self, output):
+        self.output = output
+
+    def write(self, text):
+        """
+        Write text, decoding it if needed.
+        """
+        if isinstance(text, bytes):
+            text = text.decode('utf-8')
+        self.output.write(text)
@@ -0,0 +1,268 @@
+"""
+Progress reporting and cancellation of conversions.
+
+XBundle(progress=callback) calls callback with a Progress after each file
+read or written, giving the counts so far, the chapter being worked on
+and an estimate of the time left.  XBundle(cancel=token), with a
+CancelToken, stops the conversion at the next file once token.cancel()
+is called, from any thread, by raising Cancelled.
+
+Files exported by a cancellable conversion are written to a temporary
+directory next to the one exported to, and moved into place once the
+export completes, so a cancelled export leaves nothing written.  With
+storages other than the filesystem, which hold their files in memory
+anyway, they are held back in memory instead.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+
+from xbundle.storage import Storage
+
+
+class Cancelled(Exception):
+    """
+    Raised in a conversion which was cancelled.
+    """
+
+
+class CancelToken(object):
+    """
+    Flag telling a conversion to stop.
+    """
+    def __init__(self):
+        self.event = threading.Event()
+
+    def cancel(self):
+        """
+        Ask the conversion to stop.
+        """
+        self.event.set()
+
+    @property
+    def cancelled(self):
+        """
+        Whether cancel() was called.
+        """
+        return self.event.is_set()
+
+    def check(self):
+        """
+        Raise Cancelled if cancel() was called.
+        """
+        if self.event.is_set():
+            raise Cancelled()
+
+
+class Progress(object):  # pylint: disable=too-many-instance-attributes
+    """
+    Where a conversion is at.
+
+    phase: "import", "export" or "normalize"
+    discovered: files found to import
+    parsed: files read so far
+    total: files expected to be written
+    written: files written so far
+    chapter: display_name of the chapter being imported or exported
+    """
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.start('')
+
+    def start(self, phase, discovered=0, total=0):
+        """
+        Start counting a new phase.
+        """
+        self.phase = phase
+        self.discovered = discovered
+        self.total = total
+        self.parsed = 0
+        self.written = 0
+        self.chapter = None
+        self.started = time.time()
+
+    def update(self, parsed=0, written=0, chapter=None):
+        """
+        Count files read or written, and report.
+        """
+        self.parsed += parsed
+        self.written += written
+        if chapter is not None:
+            self.chapter = chapter
+        if self.callback is not None:
+            self.callback(self)
+
+    @property
+    def elapsed(self):
+        """
+        Seconds since the phase started.
+        """
+        return time.time() - self.started
+
+    @property
+    def eta(self):
+        """
+        Estimated seconds left in the phase, or None before there is
+        anything to estimate from.
+        """
+        if self.phase == 'export':
+            done, todo = self.written, self.total
+        else:
+            done, todo = self.parsed, self.discovered
+        if not done:
+            return None
+        return self.elapsed * max(todo - done, 0) / done
+
+
+class TrackedStorage(Storage):
+    """
+    Storage which counts the files written to another, and optionally
+    holds them back until flush(): in memory, or in a staging directory on
+    the filesystem.
+    """
+    def __init__(self, target, step, buffered=False, staged=False):
+        """
+        target: the storage written to
+        step: function called with the number of files written
+        buffered: hold writes back in memory until flush()
+        staged: write the directory given to stage() to a temporary
+                sibling, moved into place by flush(); target must be on
+                the filesystem
+        """
+        self.target = target
+        self.step = step
+        self.buffered = buffered
+        self.staged = staged
+        # (method, path, data or source) of the writes held back.
+        self.pending = []
+        self.written = set()
+        # (directory exported to, temporary directory written instead).
+        self.staging = None
+
+    def stage(self, path):
+        """
+        Make path, the directory an export writes to, and return it.
+        """
+        if self.staged:
+            dest = os.path.abspath(path)
+            parent = os.path.dirname(dest)
+            self.target.mkdir(parent)
+            self.staging = (dest, tempfile.mkdtemp(
+                prefix='.{0}.'.format(os.path.basename(dest)), dir=parent))
+        return self.mkdir(path)
+
+    def local(self, path):
+        """
+        Return where path is written to: in the staging directory, if it
+        is in the directory being staged.
+        """
+        if self.staging is None:
+            return path
+        dest, tmp = self.staging
+        rel = os.path.relpath(os.path.abspath(path), dest)
+        if rel == os.curdir:
+            return tmp
+        if rel == os.pardir or rel.startswith(os.pardir + os.sep):
+            return path
+        return os.path.join(tmp, rel)
+
+    def exists(self, path):
+        return path in self.written or self.target.exists(path) or \
+            self.target.exists(self.local(path))
+
+    def isdir(self, path):
+        return self.target.isdir(path)
+
+    def glob(self, pattern):
+        return self.target.glob(pattern)
+
+    def walk(self, path):
+        return self.target.walk(path)
+
+    def getsize(self, path):
+        return self.target.getsize(path)
+
+    def read(self, path):
+        return self.target.read(path)
+
+    def abspath(self, path):
+        return self.target.abspath(path)
+
+    def parse(self, path, parser=None):
+        return self.target.parse(path, parser)
+
+    def mkdir(self, path):
+        if self.buffered:
+            self.pending.append(('mkdir', path, None))
+        else:
+            self.target.mkdir(self.local(path))
+        return path
+
+    def write(self, path, data):
+        self.step(1)
+        if self.buffered:
+            self.pending.append(('write', path, data))
+            self.written.add(path)
+        else:
+            self.target.write(self.local(path), data)
+
+    def copy_in(self, src, dst):
+        self.step(1)
+        if self.buffered:
+            self.pending.append(('copy_in', dst, src))
+            self.written.add(dst)
+        else:
+            self.target.copy_in(src, self.local(dst))
+
+    def flush(self):
+        """
+        Write out what was held back, then flush the target.
+        """
+        for method, path, arg in self.pending:
+            if method == 'mkdir':
+                self.target.mkdir(path)
+            elif method == 'write':
+                self.target.write(path, arg)
+            else:
+                self.target.copy_in(arg, path)
+        self.pending = []
+        self.written = set()
+        if self.staging is not None:
+            dest, tmp = self.staging
+            self.staging = None
+            move_into_place(tmp, dest)
+        self.target.flush()
+
+    def discard(self):
+        """
+        Drop what was held back and not flushed.
+        """
+        self.pending = []
+        self.written = set()
+        if self.staging is not None:
+            shutil.rmtree(self.staging[1], ignore_errors=True)
+            self.staging = None
+
+
+def move_into_place(tmp, dest):
+    """
+    Move the directory tmp to dest: in one step if dest doesn't exist yet,
+    and otherwise file by file, replacing those already there.
+    """
+    if not os.path.exists(dest):
+        os.rename(tmp, dest)
+        return
+    for dname, _, fnames in os.walk(tmp):
+        target = os.path.join(dest, os.path.relpath(dname, tmp))
+        if not os.path.isdir(target):
+            os.makedirs(target)
+        for fname in fnames:
+            os.rename(
+                os.path.join(dname, fname), os.path.join(target, fname))
+    shutil.rmtree(tmp)
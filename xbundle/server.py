@@ -0,0 +1,263 @@
+"""
+Long-running conversion service.
+
+Conversions are run on a pool of worker processes which have xbundle and
+lxml loaded already, so a request pays none of the interpreter start-up
+that a call to xbundle_convert does.  Requests are accepted over HTTP on
+localhost or on a unix socket:
+
+    POST /convert  {"input": ..., "output": ..., "options": {...}}
+    GET /status
+
+The input may also be a .zip or .tar(.gz) archive of an edX directory.
+Each conversion answers with a JSON object giving its status, timings and
+error, if any.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import json
+import time
+import signal
+import socket
+import logging
+import threading
+from multiprocessing import Pool
+
+from six.moves import BaseHTTPServer, socketserver
+
+from xbundle.conversion import run_conversion
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+def init_worker():
+    """
+    Leave interrupts to the parent process, which lets the conversions in
+    flight finish before stopping its workers.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class ConversionService(object):
+    """
+    Run conversions on a pool of warm worker processes, with a bounded
+    queue in front of it.
+    """
+    def __init__(self, workers=2, queue_size=16, **options):
+        """
+        workers: number of conversions run at the same time
+        queue_size: number of further conversions allowed to wait for a
+                    worker; requests beyond that are turned away
+        options: default XBundle options for every conversion
+        """
+        self.workers = workers
+        self.queue_size = queue_size
+        self.options = options
+        self.pool = Pool(workers, initializer=init_worker)
+        self.lock = threading.Condition()
+        self.counts = {'in_flight': 0, 'completed': 0, 'failed': 0}
+        self.closing = False
+
+    def submit(self, input_path, output_path, options=None):
+        """
+        Run a conversion and wait for it to finish.
+
+        Returns a dict describing the outcome; its status is "ok",
+        "error", or "busy" if the queue is full or the service is closing.
+        """
+        submitted = time.time()
+        with self.lock:
+            if self.closing or \
+                    self.counts['in_flight'] >= self.workers + self.queue_size:
+                return {'status': 'busy'}
+            self.counts['in_flight'] += 1
+        try:
+            conversion_options = dict(self.options)
+            conversion_options.update(options or {})
+            result = self.pool.apply_async(
+                run_conversion,
+                (input_path, output_path, conversion_options),
+            ).get()
+        finally:
+            with self.lock:
+                self.counts['in_flight'] -= 1
+                self.lock.notify_all()
+
+        response = {
+            'status': 'error' if result['error'] else 'ok',
+            'input': input_path,
+            'output': output_path,
+            'queued_seconds': result['started'] - submitted,
+            'seconds': result['seconds'],
+            'error': result['error'],
+        }
+        with self.lock:
+            if result['error']:
+                self.counts['failed'] += 1
+                log.error(
+                    "Conversion of %s failed:\n%s",
+                    input_path, result['traceback'])
+            else:
+                self.counts['completed'] += 1
+        return response
+
+    def status(self):
+        """
+        Return counters describing the service.
+        """
+        with self.lock:
+            status = dict(self.counts)
+            status.update({
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'closing': self.closing,
+            })
+            return status
+
+    def close(self):
+        """
+        Stop taking conversions, let those in flight finish, and stop the
+        workers.
+        """
+        with self.lock:
+            self.closing = True
+            while self.counts['in_flight']:
+                self.lock.wait()
+        self.pool.close()
+        self.pool.join()
+
+
+class ConversionHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    HTTP front end of a ConversionService.
+    """
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Report the service status.
+        """
+        if self.path != '/status':
+            self.respond(404, {'status': 'error', 'error': 'Not found'})
+            return
+        self.respond(200, self.server.service.status())
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """
+        Run a conversion.
+        """
+        if self.path != '/convert':
+            self.respond(404, {'status': 'error', 'error': 'Not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length).decode('utf-8'))
+            input_path = request['input']
+            output_path = request['output']
+        except (ValueError, KeyError, TypeError) as err:
+            self.respond(400, {'status': 'error', 'error': str(err)})
+            return
+        result = self.server.service.submit(
+            input_path, output_path, request.get('options'))
+        code = {'ok': 200, 'error': 500, 'busy': 503}[result['status']]
+        self.respond(code, result)
+
+    def respond(self, code, body):
+        """
+        Send a JSON response.
+        """
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        """
+        Unix socket clients have no address.
+        """
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return 'unix'
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """
+        Log requests through logging rather than to stderr.
+        """
+        log.info("%s - %s", self.address_string(), format % args)
+
+
+class HTTPServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    Threaded HTTP server on a TCP port, for service.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, service):
+        BaseHTTPServer.HTTPServer.__init__(self, address, ConversionHandler)
+        self.service = service
+
+
+class UnixHTTPServer(
+        socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Threaded HTTP server on a unix socket, for service.
+    """
+    daemon_threads = True
+
+    def __init__(self, path, service):
+        socketserver.UnixStreamServer.__init__(self, path, ConversionHandler)
+        # Read by the request handler, as on an HTTPServer.
+        self.server_name = socket.gethostname()
+        self.server_port = 0
+        self.service = service
+
+    def server_bind(self):
+        """
+        Bind the socket, replacing the one left by a previous server.
+        """
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        socketserver.UnixStreamServer.server_bind(self)
+
+    def server_close(self):
+        """
+        Close the socket and remove its file.
+        """
+        socketserver.UnixStreamServer.server_close(self)
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+def make_server(service, port=8000, socket_path=None, host='127.0.0.1'):
+    """
+    Create an HTTP server for service, on a unix socket if socket_path
+    is given and on a localhost port otherwise.
+    """
+    if socket_path:
+        return UnixHTTPServer(socket_path, service)
+    return HTTPServer((host, port), service)
+
+
+def serve(service, port=8000, socket_path=None):
+    """
+    Serve conversions until SIGINT or SIGTERM, then finish the
+    conversions in flight and shut down.
+    """
+    server = make_server(service, port=port, socket_path=socket_path)
+
+    def stop(*_):
+        """
+        Shut the server down from outside its request loop.
+        """
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serve_forever()
+    finally:
+        service.close()
+        server.server_close()
@@ -0,0 +1,111 @@
+"""
+Export of a course by a pool of processes, one chapter at a time.
+
+All url_names are given out first, by add_descriptors in the exporting
+process, in the same order as a serial export gives them out.  Each
+descriptor child of the course (normally a chapter) is then a shard,
+named all the way down: a worker process parses it, writes its files
+with export_xml_to_directory and returns.  The exporting process writes
+the metadata, the course file and course.xml itself, so the files written
+are exactly those of a serial export.
+
+Workers write to the filesystem directly, so shards are only exported
+this way with the default storage and without a cancel token.  Nor are
+they from a daemonic process, such as a worker of ConversionService,
+which can't start processes of its own.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import logging
+from os.path import join
+
+from lxml import etree
+
+from xbundle import XBundle
+from xbundle.storage import FileStorage
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+def can_shard(bundle):
+    """
+    Return whether worker processes can write the files of bundle's
+    export: to the filesystem, with nothing held back, from a process
+    allowed to start them.
+    """
+    from multiprocessing import current_process
+    if current_process().daemon:
+        return False
+    storage = getattr(bundle.storage, 'target', bundle.storage)
+    if bundle.cancel is not None or not isinstance(storage, FileStorage):
+        return False
+    # Workers write with a plain FileStorage of their own, which would
+    # bypass whatever a subclass does differently.
+    return storage.__class__ is FileStorage
+
+
+def shard_files(shard):
+    """
+    Return the (tag, url_name) of each file a shard is written to.
+    """
+    return set(
+        (desc.get('tag'), desc.get('url_name'))
+        for desc in shard.iter('descriptor'))
+
+
+def export_shards(bundle, workers):
+    """
+    Write the files of the descriptor children of the course being
+    exported on a pool of worker processes, leaving pointers to them in
+    the course.  Returns False, having written nothing, if the course
+    can't be split up: then the shards are left to a serial export.
+    """
+    course = bundle.export[0]
+    shards = [child for child in course if child.tag == 'descriptor']
+    if len(shards) < 2 or not can_shard(bundle):
+        return False
+    files = set()
+    for shard in shards:
+        names = shard_files(shard)
+        if names & files:
+            # Kept url_names can repeat; the last file written must win.
+            log.debug("Chapters share files, exporting them serially")
+            return False
+        files |= names
+    # Made here, as workers making the same one at once would fail.
+    for tag in set(tag for tag, _ in files):
+        bundle.storage.mkdir(join(bundle.path, tag))
+
+    from multiprocessing import Pool
+    options = {'keep_urls': bundle.keep_urls,
+               'no_overwrite': bundle.no_overwrite}
+    jobs = (
+        (etree.tostring(shard), bundle.path, options) for shard in shards)
+    pool = Pool(min(workers, len(shards)))
+    try:
+        for shard, written in zip(shards, pool.imap(export_shard, jobs)):
+            # As export_xml_to_directory leaves a descriptor written out.
+            shard.tag = shard.attrib.pop('tag')
+            chapter = shard[0].get('display_name')
+            del shard[:]
+            bundle.step(written=written, chapter=chapter)
+    finally:
+        pool.terminate()
+        pool.join()
+    return True
+
+
+def export_shard(job):
+    """
+    Write the files of one shard, in a worker process.  Returns the
+    number written, not counting the raw bodies of passthrough html.
+    """
+    data, path, options = job
+    bundle = XBundle(**options)
+    bundle.path = path
+    shard = etree.fromstring(data)
+    written = len(shard.findall('.//descriptor')) + 1
+    bundle.export_xml_to_directory(shard)
+    return written
@@ -0,0 +1,448 @@
+"""
+Storage backends for the files an XBundle imports and exports.
+
+XBundle(storage=...) reads and writes OLX directories through one of:
+
+    FileStorage: the filesystem (the default)
+    MemoryStorage: a dict of file contents, never touching the disk
+    ArchiveStorage: a .zip or .tar(.gz) archive, read in one pass when
+                    opened and written in one pass by flush()
+
+Paths are built with os.path.join, as for the filesystem; MemoryStorage
+and ArchiveStorage normalize them, so "./course/x.xml" and "course/x.xml"
+are the same file.  Writes may be buffered until flush(), which XBundle
+calls at the end of each export.
+
+Also here: link_file, which FileStorage copies static files with, and
+root_attributes and set_root_attributes, which read and rewrite the root
+element of a file passed through.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import io
+import os
+import re
+import fnmatch
+import posixpath
+
+from lxml import etree
+
+FICLONE = 0x40049409  # Linux ioctl cloning one file into another
+
+# The start tag of an element, from its "<" on.
+START_TAG = re.compile(
+    br'<[^\s/>]+(?:\s+[^\s=/>]+\s*=\s*(?:"[^"]*"|\'[^\']*\'))*\s*(/?)>')
+
+
+class Storage(object):
+    """
+    Interface of storage backends.
+    """
+    def exists(self, path):
+        """
+        Check whether a file or directory exists.
+        """
+        raise NotImplementedError
+
+    def isdir(self, path):
+        """
+        Check whether path is a directory.
+        """
+        raise NotImplementedError
+
+    def glob(self, pattern):
+        """
+        Return the paths matching pattern, which may only have wildcards
+        in its last component.
+        """
+        raise NotImplementedError
+
+    def walk(self, path):
+        """
+        Yield (dirpath, dirnames, filenames) for path and every directory
+        under it, top down, like os.walk.
+        """
+        raise NotImplementedError
+
+    def getsize(self, path):
+        """
+        Return the size of a file in bytes.
+        """
+        raise NotImplementedError
+
+    def read(self, path):
+        """
+        Return the content of a file, as bytes.
+        """
+        raise NotImplementedError
+
+    def write(self, path, data):
+        """
+        Write bytes to a file, replacing it.
+        """
+        raise NotImplementedError
+
+    def mkdir(self, path):
+        """
+        Make a directory and its parents, if missing, and return path.
+        """
+        raise NotImplementedError
+
+    def abspath(self, path):
+        """
+        Return path as recorded in the metadata of static files.
+        """
+        return path
+
+    def copy_in(self, src, dst):
+        """
+        Make dst a copy of src, a static file found by import, either in
+        this storage or on the filesystem.
+        """
+        if self.exists(src):
+            data = self.read(src)
+        else:
+            with open(src, 'rb') as fsrc:
+                data = fsrc.read()
+        self.write(dst, data)
+
+    def parse(self, path, parser=None):
+        """
+        Parse an XML (or, given an HTMLParser, HTML) file, and return its
+        root element.
+        """
+        return etree.fromstring(self.read(path), parser, base_url=path)
+
+    def flush(self):
+        """
+        Complete buffered writes.
+        """
+
+
+class FileStorage(Storage):
+    """
+    The filesystem.
+    """
+    def exists(self, path):
+        return os.path.exists(path)
+
+    def isdir(self, path):
+        return os.path.isdir(path)
+
+    def glob(self, pattern):
+        from glob import glob
+        return glob(pattern)
+
+    def walk(self, path):
+        return os.walk(path)
+
+    def getsize(self, path):
+        return os.path.getsize(path)
+
+    def read(self, path):
+        with open(path, 'rb') as data:
+            return data.read()
+
+    def write(self, path, data):
+        with open(path, 'wb') as output:
+            output.write(data)
+
+    def mkdir(self, path):
+        if not os.path.exists(path):
+            os.makedirs(path)
+        return path
+
+    def abspath(self, path):
+        return os.path.abspath(path)
+
+    def copy_in(self, src, dst):
+        link_file(src, dst)
+
+    def parse(self, path, parser=None):
+        return etree.parse(path, parser).getroot()
+
+
+class MemoryStorage(Storage):
+    """
+    Files held in a dict, by normalized path.
+    """
+    def __init__(self, files=None):
+        """
+        files: optional dict of file contents (bytes) by path
+        """
+        self.files = {}
+        self.dirs = set()
+        for path, data in (files or {}).items():
+            self.write(path, data)
+
+    @staticmethod
+    def key(path):
+        """
+        Return the normalized form of path, used as key.
+        """
+        return posixpath.normpath(path.replace(os.sep, '/'))
+
+    def children(self, path):
+        """
+        Return the names of the files and directories right under path.
+        """
+        parent = self.key(path)
+        return sorted(set(
+            posixpath.basename(key)
+            for key in list(self.files) + list(self.dirs)
+            if key != parent and posixpath.dirname(key) == (
+                '' if parent == '.' else parent)
+        ))
+
+    def exists(self, path):
+        key = self.key(path)
+        return key in self.files or key in self.dirs
+
+    def isdir(self, path):
+        return self.key(path) in self.dirs
+
+    def glob(self, pattern):
+        dirname, basename = posixpath.split(self.key(pattern))
+        return [
+            posixpath.join(dirname, name)
+            for name in self.children(dirname or '.')
+            if fnmatch.fnmatchcase(name, basename)
+        ]
+
+    def walk(self, path):
+        if not self.isdir(path):
+            return
+        stack = [self.key(path)]
+        while stack:
+            dirpath = stack.pop()
+            names = self.children(dirpath)
+            dirnames = [
+                name for name in names
+                if posixpath.join(dirpath, name) in self.dirs
+            ]
+            filenames = [name for name in names if name not in dirnames]
+            yield dirpath, dirnames, filenames
+            # Reversed, to go through dirnames (as sorted by the caller)
+            # in order.
+            stack.extend(
+                posixpath.join(dirpath, name) for name in reversed(dirnames))
+
+    def getsize(self, path):
+        return len(self.files[self.key(path)])
+
+    def read(self, path):
+        try:
+            return self.files[self.key(path)]
+        except KeyError:
+            raise IOError("No such file: {0}".format(path))
+
+    def write(self, path, data):
+        key = self.key(path)
+        parent = posixpath.dirname(key)
+        if parent:
+            self.mkdir(parent)
+        self.files[key] = data
+
+    def mkdir(self, path):
+        key = self.key(path)
+        while key not in ('', '.', '/') and key not in self.dirs:
+            self.dirs.add(key)
+            key = posixpath.dirname(key)
+        return path
+
+
+class ArchiveStorage(MemoryStorage):
+    """
+    A .zip or .tar(.gz, .bz2) archive, read into memory when opened and
+    written out by flush().
+    """
+    def __init__(self, filename, mode='r'):
+        """
+        filename: the archive
+        mode: 'r' to read an existing archive, 'w' to create one
+        """
+        MemoryStorage.__init__(self)
+        self.filename = filename
+        self.mode = mode
+        if mode == 'r':
+            self.load()
+
+    def is_zip(self):
+        """
+        Check whether the archive is a zip file, rather than a tar file.
+        """
+        return self.filename.endswith('.zip')
+
+    def load(self):
+        """
+        Read every file of the archive.
+        """
+        import tarfile
+        import zipfile
+        if self.is_zip():
+            with zipfile.ZipFile(self.filename) as zfile:
+                for info in zfile.infolist():
+                    if info.filename.endswith('/'):
+                        self.mkdir(info.filename)
+                    else:
+                        self.write(info.filename, zfile.read(info))
+            return
+        with tarfile.open(self.filename) as tfile:
+            for info in tfile:
+                if info.isdir():
+                    self.mkdir(info.name)
+                elif info.isfile():
+                    self.write(info.name, tfile.extractfile(info).read())
+
+    def flush(self):
+        """
+        Write the archive, if opened for writing.
+        """
+        import tarfile
+        import zipfile
+        if self.mode != 'w':
+            return
+        if self.is_zip():
+            with zipfile.ZipFile(
+                    self.filename, 'w', zipfile.ZIP_DEFLATED) as zfile:
+                for key in sorted(self.files):
+                    zfile.writestr(key, self.files[key])
+            return
+        mode = 'w'
+        for suffix, compression in (
+                ('.gz', 'gz'), ('.tgz', 'gz'), ('.bz2', 'bz2')):
+            if self.filename.endswith(suffix):
+                mode = 'w:' + compression
+        with tarfile.open(self.filename, mode) as tfile:
+            for key in sorted(self.files):
+                info = tarfile.TarInfo(key)
+                info.size = len(self.files[key])
+                tfile.addfile(info, io.BytesIO(self.files[key]))
+
+
+def root_attributes(data):
+    """
+    Return the attributes of the root element of an XML document, without
+    parsing the rest of it; an empty dict if it can't be read.
+    """
+    from xml.parsers import expat
+    parser = expat.ParserCreate()
+    attributes = {}
+
+    def start(_, attrs):
+        """
+        Keep the attributes of the first element, then stop.
+        """
+        attributes.update(attrs)
+        raise StopIteration
+
+    parser.StartElementHandler = start
+    try:
+        parser.Parse(data, True)
+    except (StopIteration, expat.ExpatError):
+        pass
+    return attributes
+
+
+def set_root_attributes(data, attributes):
+    """
+    Return the XML document data with the attributes of its root element
+    set to attributes, leaving everything else, namespace declarations
+    and prefixed attributes included, byte for byte as it was.
+
+    data is returned unchanged if its root already has those attributes,
+    or if it can't be found.
+    """
+    from xml.parsers import expat
+    from xml.sax.saxutils import quoteattr
+    parser = expat.ParserCreate()
+    parser.ordered_attributes = True
+    root = {}
+
+    def start(name, attrs):
+        """
+        Note the first element and where it starts, then stop.
+        """
+        root.update(
+            name=name, start=parser.CurrentByteIndex,
+            attrs=list(zip(attrs[::2], attrs[1::2])))
+        raise StopIteration
+
+    parser.StartElementHandler = start
+    try:
+        parser.Parse(data, True)
+    except (StopIteration, expat.ExpatError):
+        pass
+    match = root and START_TAG.match(data, root['start'])
+    if not match:
+        return data
+    kept = [
+        (key, val) for key, val in root['attrs']
+        if key.startswith('xmlns') or ':' in key
+    ]
+    if dict(root['attrs']) == dict(kept, **attributes):
+        return data
+    # Attributes of the file in their order, then those added.
+    order = [key for key, _ in root['attrs']]
+    order.extend(sorted(key for key in attributes if key not in order))
+    values = dict(kept, **attributes)
+    entities = {'\n': '&#10;', '\r': '&#13;', '\t': '&#9;'}
+    tag = '<' + root['name'] + ''.join(
+        ' {0}={1}'.format(key, quoteattr(values[key], entities))
+        for key in order if key in values) + match.group(1).decode() + '>'
+    return data[:match.start()] + tag.encode('utf-8') + data[match.end():]
+
+
+def link_file(src, dst):
+    """
+    Make dst a copy of src without reading its content into Python.
+
+    In order of preference, dst is made a reflink (a copy-on-write clone,
+    where the filesystem supports it), a hard link, or a copy made by the
+    kernel with copy_file_range; a plain copy is the last resort.  A hard
+    link shares its content with src, so dst should be replaced rather
+    than edited in place.
+
+    Returns the method used.
+    """
+    import shutil
+    if os.path.exists(dst):
+        if os.path.samefile(src, dst):
+            return 'same'
+        os.remove(dst)
+
+    try:
+        import fcntl
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return 'reflink'
+    except (ImportError, IOError, OSError):
+        if os.path.exists(dst):
+            os.remove(dst)
+
+    try:
+        os.link(src, dst)
+        return 'hardlink'
+    except (AttributeError, OSError):
+        pass
+
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    if copy_file_range is not None:
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = copy_file_range(
+                        fsrc.fileno(), fdst.fileno(), remaining)
+                    if not copied:
+                        break
+                    remaining -= copied
+            if remaining <= 0:
+                return 'copy_file_range'
+        except OSError:
+            pass
+
+    shutil.copyfile(src, dst)
+    return 'copy'
@@ -0,0 +1,270 @@
+"""
+Check OLX directories and xbundle files for problems before converting
+them.
+
+Unlike an import, which stops at the first file it can't parse, the
+checks here report every problem found.  Directories are checked in a
+single pass over the descriptor references, parsing each descriptor
+file once; html bodies are only checked for existence, since they are
+read with a recovering parser anyway.  xbundle files are checked while
+they are being parsed, without building the whole tree.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import six
+from collections import namedtuple
+from os.path import join, relpath, isdir
+
+from lxml import etree
+
+from xbundle import DESCRIPTOR_TAGS
+
+ERROR = 'error'
+WARNING = 'warning'
+
+Problem = namedtuple('Problem', 'severity kind filename message')
+
+
+def validate(path):
+    """
+    Check an OLX directory or an xbundle file, and return the list of
+    problems found.
+    """
+    if isdir(path):
+        return validate_directory(path)
+    return validate_xbundle(path)
+
+
+def is_pointer(xml):
+    """
+    Check whether xml only refers to a file, rather than holding its
+    content inline.
+    """
+    return len(xml) == 0 and not (xml.text or '').strip()
+
+
+class DirectoryChecks(object):
+    """
+    The problems found in an OLX directory so far, and what checking the
+    rest of it needs.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.problems = []
+        self.files = set()
+        for dname, _, fnames in os.walk(path):
+            for fname in fnames:
+                self.files.add(join(dname, fname))
+        # Where each (tag, url_name) was first seen.
+        self.seen = {}
+
+    def report(self, severity, kind, filename, message):
+        """
+        Add a problem to the list.
+        """
+        self.problems.append(Problem(
+            severity, kind, relpath(filename, self.path), message))
+
+    def parse(self, filename):
+        """
+        Parse an XML file, reporting it if it can't be parsed.
+        """
+        try:
+            return etree.parse(filename).getroot()
+        except (etree.XMLSyntaxError, IOError) as err:
+            self.report(ERROR, 'unparseable', filename, str(err))
+            return None
+
+    def check_descriptor(self, xml, source, chain):
+        """
+        Check the descriptor xml, found in source under the descriptors
+        in chain, and the file it refers to.
+
+        Returns the (element, source, chain) to check the children of, or
+        None if there is nothing (more) to check under it.
+        """
+        url_name = xml.get('url_name')
+        key = (xml.tag, url_name)
+        if key in chain:
+            self.report(
+                ERROR, 'cycle', source,
+                "<{0} url_name=\"{1}\"> includes itself".format(*key))
+            return None
+        if key in self.seen:
+            self.report(
+                WARNING, 'duplicate_url_name', source,
+                "<{0} url_name=\"{1}\"> is also used in {2}".format(
+                    xml.tag, url_name, relpath(self.seen[key], self.path)))
+            return None
+        self.seen[key] = source
+        chain += (key,)
+        filename = join(
+            self.path, xml.tag, url_name.replace(':', '/') + '.xml')
+        if filename in self.files:
+            dxml = self.parse(filename)
+            if dxml is None:
+                return None
+            if dxml.tag != xml.tag:
+                self.report(
+                    WARNING, 'tag_mismatch', filename,
+                    "<{0}> expected, found <{1}>".format(xml.tag, dxml.tag))
+            return dxml, filename, chain
+        # <html url_name=... filename=.../> is imported from its filename.
+        has_body = xml.tag in ('html', 'problem') and xml.get('filename')
+        if is_pointer(xml) and not has_body:
+            self.report(
+                ERROR, 'missing_file', filename,
+                "referenced by <{0} url_name=\"{1}\"> in {2}".format(
+                    xml.tag, url_name, relpath(source, self.path)))
+            return None
+        return xml, source, chain
+
+    def check_body(self, xml, source):
+        """
+        Check that the file holding the body of an html or problem exists.
+
+        Returns the (element, source) to check the children of: the
+        problem parsed from its file, if it has one.
+        """
+        body = xml.get('filename', '')
+        if xml.tag not in ('html', 'problem') or not body:
+            return xml, source
+        ext = '.html' if xml.tag == 'html' else '.xml'
+        if not body.endswith(ext):
+            body += ext
+        filename = join(self.path, xml.tag, body)
+        if filename not in self.files and '-' in body:
+            filename = join(self.path, xml.tag, body.split('-', 1)[0], body)
+        if filename not in self.files:
+            self.report(
+                ERROR, 'missing_file', filename,
+                "referenced by <{0} filename=\"{1}\"> in {2}".format(
+                    xml.tag, xml.get('filename'), relpath(source, self.path)))
+        elif xml.tag == 'problem':
+            dxml = self.parse(filename)
+            if dxml is not None:
+                return dxml, filename
+        return xml, source
+
+
+def validate_directory(path):
+    """
+    Check an OLX directory, and return the list of problems found.
+    """
+    checks = DirectoryChecks(path)
+    course_file = join(path, 'course.xml')
+    if course_file not in checks.files:
+        checks.report(
+            ERROR, 'missing_file', course_file, "course.xml not found")
+        return checks.problems
+    root = checks.parse(course_file)
+    if root is None:
+        return checks.problems
+
+    stack = [(root, course_file, ())]
+    while stack:
+        xml, source, chain = stack.pop()
+        if xml.tag == 'section':
+            checks.report(
+                WARNING, 'legacy_section', source,
+                "<section> is a legacy element; it is imported as a "
+                "<sequential>")
+        if xml.tag in DESCRIPTOR_TAGS and xml.get('url_name'):
+            found = checks.check_descriptor(xml, source, chain)
+            if found is None:
+                continue
+            xml, source, chain = found
+        xml, source = checks.check_body(xml, source)
+        # Reversed, so that problems are reported in document order.
+        stack.extend(
+            (child, source, chain) for child in reversed(xml)
+            if isinstance(child.tag, six.string_types)
+        )
+    return checks.problems
+
+
+def check_start(elem, depth, sections, report):
+    """
+    Check the start tag of an element of an xbundle at depth, counting
+    the <metadata> and <course> elements in sections.
+    """
+    if depth == 1 and elem.tag != 'xbundle':
+        report(ERROR, 'not_xbundle', "root element is <{0}>".format(elem.tag))
+    elif depth == 2 and elem.tag in sections:
+        sections[elem.tag] += 1
+        if elem.tag == 'course' and not (
+                elem.get('semester') or elem.get('url_name')):
+            report(ERROR, 'missing_semester', "<course> has no semester", elem)
+
+
+def check_element(elem, seen, report):
+    """
+    Check an element of an xbundle once it has been parsed, recording the
+    line on which each (tag, url_name) was first seen in seen.
+    """
+    if elem.tag == 'section':
+        report(
+            WARNING, 'legacy_section',
+            "<section> is a legacy element; it is imported as a "
+            "<sequential>", elem)
+    if elem.tag not in DESCRIPTOR_TAGS:
+        return
+    url_names = set(filter(None, (
+        elem.get(attr) for attr in ('url_name', 'url_name_orig'))))
+    for url_name in sorted(url_names):
+        key = (elem.tag, url_name)
+        if key in seen:
+            # As in a directory: shared content, imported with keep_urls,
+            # keeps its url_name in every copy.
+            report(
+                WARNING, 'duplicate_url_name',
+                "<{0} url_name=\"{1}\"> is also used on line {2}".format(
+                    elem.tag, url_name, seen[key]), elem)
+        else:
+            seen[key] = elem.sourceline
+
+
+def validate_xbundle(filename):
+    """
+    Check an xbundle file, and return the list of problems found.
+    """
+    problems = []
+
+    def report(severity, kind, message, elem=None):
+        """
+        Add a problem to the list.
+        """
+        if elem is not None:
+            message = "line {0}: {1}".format(elem.sourceline, message)
+        problems.append(Problem(severity, kind, filename, message))
+
+    seen = {}
+    depth = 0
+    sections = {'metadata': 0, 'course': 0}
+    try:
+        events = etree.iterparse(filename, events=('start', 'end'))
+        for event, elem in events:
+            if event == 'start':
+                depth += 1
+                check_start(elem, depth, sections, report)
+                continue
+            depth -= 1
+            check_element(elem, seen, report)
+            if depth > 1:
+                # Drop what has been checked, to keep memory flat.
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+    except etree.XMLSyntaxError as err:
+        report(ERROR, 'unparseable', str(err))
+        return problems
+
+    for tag, count in sorted(sections.items()):
+        if count != 1:
+            report(
+                ERROR, 'missing_' + tag,
+                "expected one <{0}>, found {1}".format(tag, count))
+    return problems
@@ -0,0 +1,290 @@
+"""
+Keep an xbundle file in sync with an OLX directory while it is edited.
+
+The Watcher polls the directory for changed files.  Descriptor, html and
+problem files are re-imported on their own and patched into the course
+tree kept in memory, keeping what the descriptors they refer to were
+imported as; policy and about files reload the metadata; only a change
+to course.xml or the course descriptor re-imports everything.
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import os
+import time
+import logging
+from copy import deepcopy
+from os.path import join, relpath, normpath
+
+from lxml import etree
+
+from xbundle import XBundle, DESCRIPTOR_TAGS
+
+log = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+METADATA_DIRS = ('policies', 'about')
+
+
+class Watcher(object):
+    """
+    Rewrite an xbundle file whenever the OLX directory it came from
+    changes.
+    """
+    def __init__(
+            self, path, output, interval=1.0, debounce=0.5, **options
+    ):  # pylint: disable=too-many-arguments
+        """
+        path: OLX directory to watch
+        output: xbundle file to keep up to date
+        interval: seconds between polls of the directory
+        debounce: seconds the directory must stay unchanged before the
+                  xbundle is rewritten, so a burst of saves costs one update
+        options: passed on to XBundle
+        """
+        self.path = path
+        self.output = output
+        self.interval = interval
+        self.debounce = debounce
+        self.options = options
+        self.bundle = None
+        self.stats = {}
+
+    def scan(self):
+        """
+        Return a dict mapping every file under the directory to its
+        modification time and size.
+        """
+        stats = {}
+        for dname, _, fnames in os.walk(self.path):
+            for fname in fnames:
+                filename = normpath(join(dname, fname))
+                try:
+                    stat = os.stat(filename)
+                except OSError:  # removed while walking
+                    continue
+                stats[filename] = (stat.st_mtime, stat.st_size)
+        return stats
+
+    def start(self):
+        """
+        Import the whole directory and write the xbundle.
+        """
+        self.stats = self.scan()
+        self.rebuild()
+        self.write()
+
+    def rebuild(self):
+        """
+        Import the whole directory from scratch.
+        """
+        bundle = XBundle(**self.options)
+        bundle.sources = {}
+        bundle.import_from_directory(self.path)
+        self.bundle = bundle
+
+    def poll(self):
+        """
+        Check the directory once; if anything changed, wait for it to
+        settle, apply the changes and rewrite the xbundle.
+
+        Return True if the xbundle was rewritten.
+        """
+        current = self.scan()
+        if current == self.stats:
+            return False
+        while True:
+            time.sleep(self.debounce)
+            settled = self.scan()
+            if settled == current:
+                break
+            current = settled
+        changed = set(
+            filename for filename in set(self.stats) | set(current)
+            if self.stats.get(filename) != current.get(filename)
+        )
+        try:
+            self.update(changed)
+        except Exception as err:  # pylint: disable=broad-except
+            # Most likely a file saved half way through an edit; keep the
+            # previous bundle, and the previous stats so that the next
+            # poll tries again.
+            log.error("Failed to update %s: %s", self.output, err)
+            return False
+        self.stats = current
+        self.write()
+        return True
+
+    def update(self, changed):
+        """
+        Patch the in-memory bundle for the given changed files.
+        """
+        sources = self.bundle.sources
+        reload_metadata = False
+        patches = []
+        for filename in sorted(changed):
+            rel = relpath(filename, self.path)
+            top = rel.split(os.sep, 1)[0]
+            if rel == 'course.xml' or top == 'course':
+                log.debug("%s changed, re-importing course", rel)
+                self.rebuild()
+                return
+            if top in METADATA_DIRS:
+                reload_metadata = True
+            elif filename in sources:
+                patches.extend(sources[filename])
+            # Anything else is not referenced from the course (yet); a
+            # new file is picked up once the descriptor using it changes.
+
+        if reload_metadata:
+            metadata = self.bundle.metadata
+            self.bundle.metadata = etree.Element('metadata')
+            try:
+                self.bundle.import_metadata_from_directory(self.path)
+            except Exception:
+                self.bundle.metadata = metadata
+                raise
+
+        patched = 0
+        try:
+            for pointer, result in patches:
+                if not self.is_attached(result):
+                    continue  # already replaced along with an ancestor
+                self.patch(pointer, result)
+                patched += 1
+        finally:
+            if patched:
+                self.bundle.reindex()
+                self.prune_sources()
+        log.debug("Patched %d element(s)", patched)
+
+    def patch(self, pointer, result):
+        """
+        Re-import the element that pointer resolved to, and put it in
+        place of result.
+
+        Only the changed files are parsed again: where the new element
+        refers to a descriptor which result also referred to, what that
+        was imported as is moved over from result.  If its own files
+        changed as well, it is patched in turn.  The course is left as it
+        was unless all of the new element could be imported.
+        """
+        new, moves = self.reimport(pointer, result)
+        for old, placeholder in moves.items():
+            old.tail = placeholder.tail
+            placeholder.getparent().replace(placeholder, old)
+        new.tail = result.tail
+        result.getparent().replace(result, new)
+
+    def reimport(self, pointer, result):
+        """
+        Import the element that pointer resolved to again, apart from the
+        course, as import_tree does but without recursion into what can
+        be moved over from result.
+
+        Returns the new element, and the elements under result to move
+        into it, each with the element it is to replace.  Raises
+        ValueError if a descriptor includes itself.
+        """
+        reusable = self.imported_under(result)
+        moves = {}
+        new = deepcopy(pointer)
+        sections = []
+        stack = [(new, all(
+            anc.tag in DESCRIPTOR_TAGS for anc in result.iterancestors()), ())]
+        while stack:
+            elem, chain, including = stack.pop()
+            including = self.bundle.include_descriptor(elem, including)
+            old = [
+                done for done in reusable.get(
+                    etree.tostring(elem, with_tail=False), ())
+                if self.is_free(done, result, moves)
+            ]
+            if old:
+                moves[old[0]] = elem
+                continue
+            resolved, expand = self.bundle.resolve_descriptor(self.path, elem)
+            if elem is new:
+                new = resolved
+            elif resolved is not elem:
+                resolved.tail = elem.tail
+                elem.getparent().replace(elem, resolved)
+            chain = self.bundle.normalize_import(resolved, chain, sections)
+            if expand:
+                stack.extend(
+                    (child, chain, including) for child in reversed(resolved))
+        while sections:
+            self.bundle.flatten_section(sections.pop(0))
+        return new, moves
+
+    def imported_under(self, result):
+        """
+        Return the elements imported below result from files of their own,
+        as lists in document order, by the pointer they were imported from.
+        """
+        pointers = {}
+        for entries in self.bundle.sources.values():
+            for pointer, done in entries:
+                pointers[done] = pointer
+        found = {}
+        for done in result.iterdescendants():
+            if done in pointers:
+                found.setdefault(etree.tostring(
+                    pointers[done], with_tail=False), []).append(done)
+        return found
+
+    @staticmethod
+    def is_free(elem, ancestor, moves):
+        """
+        Check whether elem, below ancestor, is still there to be moved:
+        neither it nor anything between them is in moves already.
+        """
+        while elem is not ancestor:
+            if elem in moves:
+                return False
+            elem = elem.getparent()
+        return True
+
+    def is_attached(self, elem):
+        """
+        Check whether elem is still part of the course tree.
+        """
+        course = self.bundle.course
+        while elem is not None:
+            if elem is course:
+                return True
+            elem = elem.getparent()
+        return False
+
+    def prune_sources(self):
+        """
+        Forget elements which have been replaced.
+        """
+        sources = self.bundle.sources
+        for filename in list(sources):
+            entries = [
+                entry for entry in sources[filename]
+                if self.is_attached(entry[1])
+            ]
+            if entries:
+                sources[filename] = entries
+            else:
+                del sources[filename]
+
+    def write(self):
+        """
+        Write the xbundle, replacing the previous one in a single step.
+        """
+        tmp = self.output + '.tmp'
+        self.bundle.save(tmp)
+        os.rename(tmp, self.output)
+        log.info("Wrote %s", self.output)
+
+    def run(self):
+        """
+        Build the xbundle, then keep it up to date until interrupted.
+        """
+        self.start()
+        while True:
+            time.sleep(self.interval)
+            self.poll()
@@ -0,0 +1,57 @@
+"""
+Reading JSON outlines of xbundles (see xbundle.outline), with the json
+module only.
+
+This module is outside of the xbundle package, so that analytics jobs
+reading outlines import neither xbundle nor lxml:
+
+    from xbundle_outline import load_json, iter_nodes
+
+    with open('course.json') as stream:
+        outline = load_json(stream)
+    videos = [n for n in iter_nodes(outline) if n['tag'] == 'video']
+"""
+
+from __future__ import unicode_literals
+from __future__ import print_function
+
+import json
+
+FORMAT = 'xbundle-outline'
+VERSION = 1
+
+
+def load_json(stream):
+    """
+    Read an outline written by xbundle.outline.write_json.
+    """
+    outline = json.load(stream)
+    if outline.get('format') != FORMAT:
+        raise ValueError("Not an xbundle outline")
+    if outline.get('version') != VERSION:
+        raise ValueError(
+            "Unsupported outline version {0}".format(outline.get('version')))
+    return outline
+
+
+def iter_nodes(outline):
+    """
+    Yield each element of an outline, nested or flat, in document order,
+    as a dict with id, parent (an id), tag, attrs, and text and tail if
+    not blank.
+    """
+    if 'nodes' in outline:
+        for node in outline['nodes']:
+            yield node
+        return
+    count = 0
+    stack = [(outline['course'], None)]
+    while stack:
+        node, parent = stack.pop()
+        fields = dict(
+            (key, val) for key, val in node.items() if key != 'children')
+        fields['id'] = count
+        fields['parent'] = parent
+        yield fields
+        stack.extend((child, count) for child in reversed(node['children']))
+        count += 1